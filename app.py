@@ -1,12 +1,128 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, session, flash
+import time
+STARTED = time.perf_counter()  # startup timing includes the imports below
+
+from flask import Flask, render_template, request, redirect, url_for, send_from_directory, session, flash, Response, stream_template, jsonify, g, has_app_context
 import sqlite3
 import os
+import base64
+import hashlib
+import json
+import threading
 from functools import wraps
+from catalog import SCHOLARSHIPS, load_catalog, get_catalog_version
+from saved_matches import save_matches, load_matches, rematch_scholarship, record_outcome, OUTCOME_STATUSES
+from matcher import MatchIndex, SqlMatcher, ANSWER_KEYS
+from result_cache import CachedMatcher
+from db import ConnectionPool
+from users_cli import users_cli
+from catalog_cli import catalog_cli
+from ranking_cli import ranking_cli
+from credentials import CredentialHasher, HasherBusy, DEFAULT_ITERATIONS
+from sessions import ServerSessionInterface, SQLiteStore, MemoryStore, RedisStore
+from assets import AssetManifest, assets_cli
+from page_cache import PageCache
+from offload import Offloader
+from instrumentation import Instrumentation
+from profiling import RequestProfiler
+from jobs import JobQueue, jobs_cli
+from search import CatalogSearch
+from throttle import FileBuckets, LoginThrottle, MemoryBuckets, SharedBuckets, parse_limit
+from schema import apply_schema
+from snapshot import SnapshotMatcher
 
 app = Flask(__name__, template_folder='.')
 
-# IMPORTANT: Set a secret key for session management
-app.secret_key = 'your-secret-key-here-change-this-in-production'  # Change this to a random string in production
+# Behind Heroku's router (or another proxy) set PROXY_HOPS=1 so request.remote_addr
+# is the client's address from X-Forwarded-For rather than the proxy's
+if int(os.environ.get('PROXY_HOPS', 0)):
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ['PROXY_HOPS']), x_proto=1)
+
+# Defaults from the environment; create_app(config) may override any of them
+DEV_SECRET_KEY = 'dev-only-secret-key-set-SECRET_KEY-in-production'
+app.config.from_mapping(
+    SECRET_KEY=os.environ.get('SECRET_KEY', DEV_SECRET_KEY),
+    MATCHER_ENGINE=os.environ.get('MATCHER_ENGINE', 'sql'),
+    # 0 leaves the schema to init_db.py (e.g. the release phase) alone
+    SCHEMA_AUTO_APPLY=os.environ.get('SCHEMA_AUTO_APPLY', '1') != '0',
+    STARTUP_BUDGET_MS=float(os.environ.get('STARTUP_BUDGET_MS', 2000))
+)
+
+@app.before_request
+def finish_setup():
+    # Plain 'gunicorn app:app' still works, setting up on the first request
+    if 'scholarpass' not in app.extensions:
+        create_app()
+
+# --- CLI commands (flask --app app users|assets|catalog|jobs|ranking ...) ---
+app.cli.add_command(users_cli)
+app.cli.add_command(catalog_cli)
+app.cli.add_command(assets_cli)
+app.cli.add_command(jobs_cli)
+app.cli.add_command(ranking_cli)
+
+# --- Request timing (INSTRUMENTATION=1 adds Server-Timing headers and /metrics) ---
+instruments = Instrumentation(
+    app,
+    enabled=os.environ.get('INSTRUMENTATION', '').lower() in ('1', 'true', 'yes'),
+    token=os.environ.get('METRICS_TOKEN')
+)
+
+# --- Login throttling (LOGIN_LIMIT_IP / LOGIN_LIMIT_EMAIL as burst/seconds, 0 disables) ---
+# Registered before every hook that reads the session or the database, so a
+# credential-stuffing burst is turned away without touching either.
+def build_throttle_buckets(backend):
+    """'file' (every worker on this machine), 'redis' (every worker sharing
+    REDIS_URL) or 'memory' (one process; only correct with a single worker)."""
+    if backend == 'memory':
+        return MemoryBuckets(maxsize=int(os.environ.get('THROTTLE_MAX_KEYS', 100000)))
+    if backend == 'redis' and os.environ.get('REDIS_URL'):
+        import redis
+        return SharedBuckets(redis.Redis.from_url(os.environ['REDIS_URL']))
+    return FileBuckets(
+        os.environ.get('THROTTLE_FILE', 'database/throttle.buckets'),
+        slots=int(os.environ.get('THROTTLE_MAX_KEYS', 100000))
+    )
+
+login_throttle = LoginThrottle(
+    app,
+    build_throttle_buckets(os.environ.get('THROTTLE_BACKEND', 'file')),
+    ip_limit=parse_limit(os.environ.get('LOGIN_LIMIT_IP', '30/300')),
+    email_limit=parse_limit(os.environ.get('LOGIN_LIMIT_EMAIL', '10/300'))
+)
+instruments.add_collector('scholarpass_throttle', login_throttle.stats)
+
+# --- Fingerprinted static assets (built by 'flask assets build') ---
+assets = AssetManifest()
+app.jinja_env.globals['asset_url'] = assets.url
+app.jinja_env.globals['image_sources'] = assets.image_sources
+
+# --- Operators may view /cache-stats and /admin/* ---
+# Granted per account with 'flask users admin EMAIL', never by anything a
+# visitor can submit; read from the users table on every check, so revoking
+# takes effect immediately.
+def user_is_admin(user_id):
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT is_admin FROM users WHERE id=?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return bool(row and row['is_admin'])
+
+def is_admin():
+    if 'user_id' not in session:
+        return False
+    return offload.run(user_is_admin, session['user_id'])
+
+# --- Profiling (X-Profile: $PROFILE_TOKEN, or PROFILE_SAMPLE_RATE=0.001) ---
+profiler = RequestProfiler(
+    app,
+    directory=os.environ.get('PROFILE_DIR', 'profiles'),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    token=os.environ.get('PROFILE_TOKEN'),
+    keep=int(os.environ.get('PROFILE_KEEP', 50)),
+    authorize=is_admin
+)
 
 # --- Make session available to all templates ---
 @app.context_processor
@@ -20,25 +136,285 @@ def inject_user():
         user_role=session.get('user_role')
     )
 
+# --- Rendered page cache for the static pages (PAGE_CACHE_BYTES=0 disables) ---
+page_cache = PageCache(app, inject_user, maxbytes=int(os.environ.get('PAGE_CACHE_BYTES', 8 * 1024 * 1024)))
+
 # --- Database connection ---
+db_pool = ConnectionPool(max_idle=int(os.environ.get('DB_POOL_SIZE', 8)))
+
 def get_db_connection():
-    os.makedirs('database', exist_ok=True)
-    conn = sqlite3.connect('database/app.db')
-    conn.row_factory = sqlite3.Row
+    """Pooled connection. Inside a request it is shared by every caller and
+    returned to the pool at app context teardown; close() is then a no-op."""
+    if not has_app_context():
+        with instruments.span('db_connect'):
+            return db_pool.acquire()
+    conn = g.get('db')
+    if conn is None:
+        with instruments.span('db_connect'):
+            conn = g.db = db_pool.acquire()
+        conn.bound = True
     return conn
 
-# --- Initialize DB ---
-def init_db():
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.bound = False
+        conn.close()
+
+# --- Blocking work under gevent workers (see gunicorn.conf.py) ---
+# SQLite calls and scoring run on native threads so they cannot stall the
+# event loop; with sync/threaded workers offload.run() calls straight through.
+offload = Offloader(workers=int(os.environ.get('OFFLOAD_THREADS', 16)))
+
+# --- Server-side sessions ---
+def build_session_store(backend):
+    """'sqlite' (shared by all workers), 'memory' (one process) or 'redis'."""
+    if backend == 'memory':
+        return MemoryStore(maxsize=int(os.environ.get('SESSION_MEMORY_SIZE', 10000)))
+    if backend == 'redis':
+        if os.environ.get('REDIS_URL'):
+            import redis
+            return RedisStore(redis.Redis.from_url(os.environ['REDIS_URL']))
+        from kvstore import LocalRedis
+        return RedisStore(LocalRedis())
+    return SQLiteStore(get_db_connection)
+
+# SESSION_BACKEND=cookie keeps Flask's signed cookie sessions
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+if SESSION_BACKEND != 'cookie':
+    session_store = build_session_store(SESSION_BACKEND)
+    # Only the SQLite store blocks; the memory store's lock must stay on the
+    # greenlet and a Redis client's sockets already yield under gevent
+    app.session_interface = ServerSessionInterface(
+        session_store,
+        run_blocking=offload.run if isinstance(session_store, SQLiteStore) else None
+    )
+
+# --- Scholarship matcher (built once per process by create_app) ---
+def current_catalog():
+    """Catalog rows from the database, or the bundled list before the schema has been applied."""
+    conn = get_db_connection()
+    try:
+        return load_catalog(conn)
+    except sqlite3.OperationalError:
+        return SCHOLARSHIPS
+    finally:
+        conn.close()
+
+def build_matcher(engine):
+    """'sql' scores from the catalog tables, 'index' from an in-memory inverted
+    index, 'snapshot' from the same index in a file every worker maps,
+    'vector' with NumPy matrix products and 'automaton' with an
+    Aho-Corasick automaton that also understands free-text answers.
+
+    No engine scores broad answers over a 50k catalog in under 10 ms (see
+    SqlMatcher); the result cache built around it is what keeps repeated
+    questionnaire answers fast."""
+    if engine == 'index':
+        return MatchIndex(current_catalog())
+    if engine == 'automaton':
+        from keyword_matcher import AutomatonMatcher
+        return AutomatonMatcher(current_catalog(), typos=os.environ.get('MATCHER_TYPOS', '').lower() in ('1', 'true', 'yes'))
+    if engine == 'snapshot':
+        # Connections of its own: writing a snapshot opens and rolls back a read transaction
+        return SnapshotMatcher(
+            os.environ.get('CATALOG_SNAPSHOT', 'database/catalog.snapshot'),
+            db_pool.acquire,
+            check_interval=float(os.environ.get('CATALOG_SNAPSHOT_CHECK_INTERVAL', 1.0))
+        )
+    if engine == 'vector':
+        from vector_matcher import VectorMatcher
+        return VectorMatcher(current_catalog())
+    return SqlMatcher(get_db_connection)
+
+# Trained by 'flask ranking train'; read once per worker at startup
+RANKING_MODEL = os.environ.get('RANKING_MODEL', 'models/ranker.json')
+
+def build_ranker(engine):
+    """The rule matcher, ordered by the learned ranking model when one has
+    been trained; the rules alone if the model is missing or unusable."""
+    rules = build_matcher(engine)
+    if not os.path.exists(RANKING_MODEL):
+        return rules
+    from ranking import LearnedRanker, RankingModel
+    try:
+        model = RankingModel.load(RANKING_MODEL)
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.warning('Ranking model not loaded, using rule scoring: %s', e)
+        return rules
+    return LearnedRanker(current_catalog(), model, rules,
+                         budget_ms=float(os.environ.get('RANKING_BUDGET_MS', 5)))
+
+def build_cached_matcher(ranker):
+    cached = CachedMatcher(
+        ranker,
+        maxsize=int(os.environ.get('RECOMMEND_CACHE_SIZE', 1024)),
+        ttl=float(os.environ.get('RECOMMEND_CACHE_TTL', 300))
+    )
+    if os.environ.get('RECOMMEND_CACHE_WARM'):
+        cached.warm()
+    return cached
+
+# Set by create_app()
+ranker = matcher = None
+
+def ranking_fingerprint():
+    """The loaded ranking model's fingerprint, or 'rules' when results keep rule order."""
+    return getattr(ranker, 'fingerprint', 'rules')
+
+def reload_catalog():
+    """Recompile the matcher and drop cached results after the catalog changes."""
+    # The snapshot engine reads the catalog itself, in one process for all of them
+    matcher.reload(None if isinstance(ranker, SnapshotMatcher) else current_catalog())
+
+# Catalog version this worker's matcher was built from
+catalog_state = {'version': None}
+
+def current_catalog_version():
+    conn = get_db_connection()
+    try:
+        return get_catalog_version(conn)
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+def sync_catalog():
+    """Reload the matcher if the catalog changed (e.g. in another worker); returns the version."""
+    version = current_catalog_version()
+    if version != catalog_state['version']:
+        if catalog_state['version'] is not None:
+            reload_catalog()
+        catalog_state['version'] = version
+    return version
+
+def collect_answers(source):
+    """Normalize questionnaire answers from a form, query string or JSON body."""
+    return {key: str(source.get(key) or '').lower().strip() for key in ANSWER_KEYS}
+
+# --- Password hashing ---
+hasher = CredentialHasher(
+    iterations=int(os.environ.get('PASSWORD_HASH_ITERATIONS', DEFAULT_ITERATIONS)),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+)
+
+# Cache and pool counters alongside the histograms at /metrics
+instruments.add_collector('scholarpass_db_pool', db_pool.stats)
+instruments.add_collector('scholarpass_page_cache', page_cache.stats)
+
+# --- Background jobs (JOB_WORKERS threads per process; 0 leaves them to 'flask jobs work') ---
+# Unbound connections: a failed handler's writes must not ride along with the
+# queue's own commits on a shared request connection
+jobs = JobQueue(
+    db_pool.acquire,
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    poll_interval=float(os.environ.get('JOB_POLL_INTERVAL', 1.0)),
+    lease=float(os.environ.get('JOB_LEASE_SECONDS', 300)),
+    run_blocking=offload.run
+)
+instruments.add_collector('scholarpass_jobs', jobs.stats)
+
+# --- Catalog search (results cached per catalog version) ---
+catalog_search = CatalogSearch(get_db_connection, maxsize=int(os.environ.get('SEARCH_CACHE_SIZE', 512)))
+instruments.add_collector('scholarpass_search_cache', catalog_search.stats)
+
+@app.before_request
+def start_job_workers():
+    # Picks up jobs left queued by a previous run without waiting for an enqueue
+    jobs.ensure_started()
+
+@jobs.handler('user.welcome')
+def send_welcome(payload):
+    """Welcome email for a new account; logged instead when SMTP_HOST is unset."""
+    subject = 'Welcome to ScholarPass'
+    body = (f"Hi {payload['name']},\n\nYour ScholarPass account is ready. "
+            "Answer the questionnaire to see the scholarships you match.\n")
+    if not os.environ.get('SMTP_HOST'):
+        app.logger.info('Welcome email to %s (SMTP_HOST unset, not sent)', payload['email'])
+        return
+    import smtplib
+    from email.message import EmailMessage
+    message = EmailMessage()
+    message['From'] = os.environ.get('MAIL_FROM', 'no-reply@scholarpass.local')
+    message['To'] = payload['email']
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(os.environ['SMTP_HOST'], int(os.environ.get('SMTP_PORT', 25)), timeout=30) as smtp:
+        smtp.send_message(message)
+
+@jobs.handler('matches.save')
+def save_latest_matches(payload):
+    """Score and save a student's latest answers for My ScholarPass."""
+    answers = payload['answers']
+    sync_catalog()
+    save_recommendations(payload['user_id'], answers, matcher.score(answers))
+
+@jobs.handler('catalog.rematch')
+def rematch_job(payload):
+    conn = get_db_connection()
+    try:
+        rematch_scholarship(conn, payload['scholarship_id'])
+        conn.commit()
+    finally:
+        conn.close()
+
+def find_user(email):
+    conn = get_db_connection()
+    try:
+        return conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
+    finally:
+        conn.close()
+
+def create_user(name, email, password):
+    """Insert a student account and queue its welcome email in the same
+    transaction; returns its id, or None if the email is taken."""
+    conn = get_db_connection()
+    try:
+        user_id = conn.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, 'student')",
+            (name, email, password)
+        ).lastrowid
+        jobs.enqueue('user.welcome', {'user_id': user_id, 'name': name, 'email': email},
+                     key=f'welcome:{user_id}', conn=conn)
+        conn.commit()
+        return user_id
+    except sqlite3.IntegrityError:
+        return None
+    finally:
+        conn.close()
+
+def update_password(user_id, password):
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE users SET password=? WHERE id=?", (password, user_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def save_recommendations(user_id, answers, results):
+    conn = get_db_connection()
+    try:
+        save_matches(conn, user_id, answers, results)
+        conn.commit()
+    finally:
+        conn.close()
+
+def saved_recommendations(user_id):
+    conn = get_db_connection()
+    try:
+        return load_matches(conn, user_id)
+    finally:
+        conn.close()
+
+def set_outcome(user_id, scholarship_id, status):
     conn = get_db_connection()
-    conn.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT DEFAULT 'student'
-    )''')
-    conn.commit()
-    conn.close()
+    try:
+        found = record_outcome(conn, user_id, scholarship_id, status)
+        conn.commit()
+        return found
+    finally:
+        conn.close()
 
 # --- Login Required Decorator ---
 def login_required(f):
@@ -53,7 +429,7 @@ def login_required(f):
 # --- ROUTES ---
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return page_cache.render('index.html')
 
 @app.route('/signin')
 def signin():
@@ -64,11 +440,11 @@ def signin():
 
 @app.route('/students')
 def students():
-    return render_template('students.html')
+    return page_cache.render('students.html')
 
 @app.route('/providers')
 def providers():
-    return render_template('providers.html')
+    return page_cache.render('providers.html')
 
 @app.route('/questions')
 @login_required  # Protect this route
@@ -78,7 +454,24 @@ def questions():
 @app.route('/myscholarpass')
 @login_required  # Protect this route
 def myscholarpass():
-    return render_template('scholarpass.html')
+    # Saved by recommend(); kept current by the catalog commands' re-matching
+    with instruments.span('db'):
+        matches = offload.run(saved_recommendations, session['user_id'])
+    return render_template('scholarpass.html', saved_matches=matches)
+
+@app.route('/api/matches/<int:scholarship_id>/status', methods=['POST'])
+@login_required
+def set_match_status(scholarship_id):
+    # JSON only: browsers cannot send it cross-site without a CORS preflight
+    body = request.get_json(silent=True)
+    status = body.get('status') if isinstance(body, dict) else None
+    if status not in OUTCOME_STATUSES:
+        return jsonify(error=f"status must be one of: {', '.join(OUTCOME_STATUSES)}"), 400
+    with instruments.span('db'):
+        found = offload.run(set_outcome, session['user_id'], scholarship_id, status)
+    if not found:
+        return jsonify(error='Unknown scholarship'), 404
+    return jsonify(status=status)
 
 # --- SIGNUP ---
 @app.route('/signup', methods=['GET', 'POST'])
@@ -86,31 +479,27 @@ def signup():
     if request.method == 'POST':
         name = request.form['name']
         email = request.form['email']
-        password = request.form['password']
-
-        conn = get_db_connection()
         try:
-            cursor = conn.execute(
-                "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, 'student')",
-                (name, email, password)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            
-            # Create session for the new user
-            session['user_id'] = user_id
-            session['user_name'] = name
-            session['user_email'] = email
-            session['user_role'] = 'student'
-            
-            conn.close()
-            flash(f'Welcome {name}! Your account has been created successfully.', 'success')
-            return redirect(url_for('questions'))
-            
-        except sqlite3.IntegrityError:
-            conn.close()
+            with instruments.span('hash'):
+                password = hasher.hash(request.form['password'])
+        except HasherBusy:
+            flash('We are handling a lot of sign-ups right now. Please try again in a moment.', 'error')
+            return redirect(url_for('signin'))
+
+        with instruments.span('db'):
+            user_id = offload.run(create_user, name, email, password)
+        if user_id is None:
             flash('Email already registered. Please try logging in.', 'error')
             return redirect(url_for('signin'))
+
+        # Create session for the new user
+        session['user_id'] = user_id
+        session['user_name'] = name
+        session['user_email'] = email
+        session['user_role'] = 'student'
+
+        flash(f'Welcome {name}! Your account has been created successfully.', 'success')
+        return redirect(url_for('questions'))
     
     return render_template('accountsignin.html')
 
@@ -120,14 +509,22 @@ def login():
     email = request.form['email']
     password = request.form['password']
 
-    conn = get_db_connection()
-    user = conn.execute(
-        "SELECT * FROM users WHERE email=? AND password=?",
-        (email, password)
-    ).fetchone()
-    conn.close()
+    with instruments.span('db'):
+        user = offload.run(find_user, email)
+    try:
+        with instruments.span('hash'):
+            valid, needs_rehash = hasher.verify(user['password'] if user else None, password)
+        if valid and needs_rehash:
+            # Upgrade plaintext or old-cost hashes now that we know the password
+            with instruments.span('hash'):
+                password_hash = hasher.hash(password)
+            with instruments.span('db'):
+                offload.run(update_password, user['id'], password_hash)
+    except HasherBusy:
+        flash('We are handling a lot of sign-ins right now. Please try again in a moment.', 'error')
+        return redirect(url_for('signin'))
 
-    if user:
+    if valid:
         # Create session
         session['user_id'] = user['id']
         session['user_name'] = user['name']
@@ -167,496 +564,223 @@ def session_info():
     else:
         return "<h2>No active session</h2><br><a href='/signin'>Login</a>"
 
+# --- CACHE STATS (admins only) ---
+@app.route('/cache-stats')
+def cache_stats():
+    if not is_admin():
+        return "Not Found", 404
+    return jsonify(pages=page_cache.stats(), recommendations=matcher.stats(), search=catalog_search.stats())
+
 # --- RECOMMENDATION ---
 @app.route('/recommend', methods=['POST'])
 @login_required  # Protect this route
 def recommend():
     # Get user info from session
     user_name = session.get('user_name', 'Student')
+    user_id = session['user_id']
     
     # --- Collect answers from form ---
-    answers = {
-        'school_type': request.form.get('school_type', '').lower().strip(),
-        'average': request.form.get('average', '').lower().strip(),
-        'financial_need': request.form.get('financial_need', '').lower().strip(),
-        'talent': request.form.get('talent', '').lower().strip(),
-        'university': request.form.get('university', '').lower().strip()
-    }
-
-    # --- Expanded Scholarship Dataset with detailed info ---
-    scholarships = [
-        {
-            "name": "Ateneo Freshmen Merit Scholarship",
-            "university": "Ateneo de Manila University",
-            "description": "Top 50 applicants based on academic ranking and ACET scores get free tuition and ₱50,000 annual allowance.",
-            "tags": ["Merit-based", "Full Tuition", "Allowance"],
-            "criteria": {"university": ["ateneo"], "average": ["95", "top", "excellent"]},
-            "weight": {"university": 3, "average": 2}
-        },
-        {
-            "name": "Director's List Scholarship",
-            "university": "Ateneo de Manila University",
-            "description": "150 applicants with outstanding high school averages and extracurricular activities receive a ₱100,000 grant.",
-            "tags": ["Academic Excellence", "₱100,000 Grant"],
-            "criteria": {"university": ["ateneo"], "average": ["90", "high"], "talent": ["extra", "arts", "sports"]},
-            "weight": {"university": 3, "average": 2, "talent": 1}
-        },
-        {
-            "name": "DLSU Archer Achiever Scholarship",
-            "university": "De La Salle University",
-            "description": "Top students from science or public high schools get a full waiver of tuition and other fees.",
-            "tags": ["Full Tuition Waiver", "Entrance Exam"],
-            "criteria": {"university": ["dlsu"], "average": ["90", "high"], "school_type": ["science", "public"]},
-            "weight": {"university": 3, "average": 2}
-        },
-        {
-            "name": "Star Scholars Program",
-            "university": "De La Salle University",
-            "description": "Integrated scholarship covering college and postgraduate programs such as master's, law, or medicine.",
-            "tags": ["Integrated", "Graduate", "Full Scholarship"],
-            "criteria": {"university": ["dlsu"], "average": ["95"], "financial_need": ["no"]},
-            "weight": {"university": 3, "average": 2}
-        },
-        {
-            "name": "UST Santo Tomas College Scholarship",
-            "university": "University of Santo Tomas",
-            "description": "For students with excellent academic performance.",
-            "tags": ["Academic Excellence", "Merit-based"],
-            "criteria": {"university": ["ust"], "average": ["high", "90", "95"]},
-            "weight": {"university": 3, "average": 2}
-        },
-        {
-            "name": "San Lorenzo Ruiz Student Assistance",
-            "university": "University of Santo Tomas",
-            "description": "For students in need of financial aid who can work 20–30 hours a week at the university.",
-            "tags": ["Financial Aid", "Work-study"],
-            "criteria": {"university": ["ust"], "financial_need": ["yes"], "talent": ["work", "volunteer"]},
-            "weight": {"university": 2, "financial_need": 3}
-        },
-        {
-            "name": "Vaugirard Scholarship Program",
-            "university": "De La Salle University",
-            "description": "50 public high school graduates get free tuition and living allowances.",
-            "tags": ["Public School", "Full Tuition", "Allowance"],
-            "criteria": {"school_type": ["public"], "financial_need": ["yes", "need"]},
-            "weight": {"school_type": 2, "financial_need": 3}
-        },
-        {
-            "name": "Don Tomas Mapua Scholarship",
-            "university": "Mapúa University",
-            "description": "Mapúa students with an average of 1.5 to 1.0 receive 100% tuition discount.",
-            "tags": ["Academic Excellence", "Full Tuition"],
-            "criteria": {"university": ["mapua"], "average": ["95"], "school_type": ["science", "public"]},
-            "weight": {"university": 3, "average": 2}
-        },
-        {
-            "name": "Financial Aid Grant",
-            "university": "Various Universities",
-            "description": "Provides tuition discounts, dormitory assistance, and allowances for books, food, and transportation.",
-            "tags": ["Financial Aid", "Assistance", "Allowance"],
-            "criteria": {"financial_need": ["yes", "need"], "school_type": ["public", "private"]},
-            "weight": {"financial_need": 3}
-        },
-        {
-            "name": "Athletic or Arts Scholarship",
-            "university": "Various Universities",
-            "description": "Full or partial scholarships for one year, renewable based on performance.",
-            "tags": ["Athletic", "Arts", "Renewable"],
-            "criteria": {"talent": ["arts", "sports"]},
-            "weight": {"talent": 3}
-        }
-    ]
+    answers = collect_answers(request.form)
+    with instruments.span('db'):
+        offload.run(sync_catalog)
 
     # --- Matching Logic ---
-    results = []
-    for s in scholarships:
-        score = 0
-        matched_criteria = []
-
-        for key, user_value in answers.items():
-            if not user_value:
-                continue
-
-            for keyword in s["criteria"].get(key, []):
-                if keyword in user_value or user_value in keyword:
-                    score += s["weight"].get(key, 1)
-                    matched_criteria.append(key)
-                    break
-
-        # Bonus scoring
-        if answers['financial_need'] == "yes" and "need" in s["criteria"].get("financial_need", []):
-            score += 1
-        if answers['average'] in ["95", "90"] and "average" in s["criteria"]:
-            score += 1
-
-        if score > 0:
-            results.append({
-                "name": s["name"],
-                "university": s["university"],
-                "description": s["description"],
-                "tags": s["tags"],
-                "score": score,
-                "matched": ", ".join(set(matched_criteria))
-            })
-
-    results.sort(key=lambda x: x["score"], reverse=True)
-
-    # --- Generate Simplified HTML Output with Logout Button ---
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>ScholarPass - Your Recommendations</title>
-        <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap" rel="stylesheet">
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-
-            body {{
-                font-family: 'Poppins', sans-serif;
-                background-color: #f5f1e8;
-                min-height: 100vh;
-            }}
-
-            /* Navigation */
-            nav {{
-                background: white;
-                padding: 1rem 3rem;
-                box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-
-            .logo {{
-                font-size: 24px;
-                font-weight: 700;
-                color: #b8883b;
-            }}
-
-            .user-info {{
-                display: flex;
-                align-items: center;
-                gap: 1rem;
-            }}
-
-            .user-name {{
-                font-size: 14px;
-                color: #666;
-            }}
-
-            .logout-btn {{
-                padding: 8px 20px;
-                background-color: #dc3545;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                font-weight: 600;
-                font-size: 13px;
-                cursor: pointer;
-                transition: all 0.3s ease;
-                text-decoration: none;
-                display: inline-block;
-            }}
-
-            .logout-btn:hover {{
-                background-color: #c82333;
-                transform: translateY(-2px);
-            }}
-
-            /* Header */
-            .header {{
-                text-align: center;
-                padding: 3rem 2rem 2rem;
-                max-width: 1200px;
-                margin: 0 auto;
-            }}
-
-            .header h1 {{
-                font-size: 2.5rem;
-                color: #2c2c2c;
-                margin-bottom: 0.5rem;
-            }}
-
-            .header p {{
-                font-size: 1.1rem;
-                color: #666;
-                margin-bottom: 1.5rem;
-            }}
-
-            .count-badge {{
-                display: inline-block;
-                padding: 8px 20px;
-                background-color: #b8883b;
-                color: white;
-                border-radius: 20px;
-                font-weight: 600;
-            }}
-
-            /* Container */
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 2rem;
-            }}
-
-            .scholarships-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fill, minmax(350px, 1fr));
-                gap: 20px;
-            }}
-
-            /* Scholarship Card */
-            .scholarship-card {{
-                background: white;
-                border-radius: 12px;
-                padding: 24px;
-                box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);
-                transition: all 0.3s ease;
-            }}
-
-            .scholarship-card:hover {{
-                transform: translateY(-4px);
-                box-shadow: 0 4px 16px rgba(0, 0, 0, 0.12);
-            }}
-
-            .card-header {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 12px;
-            }}
-
-            .match-score {{
-                background-color: #b8883b;
-                color: white;
-                padding: 4px 12px;
-                border-radius: 12px;
-                font-size: 12px;
-                font-weight: 700;
-            }}
-
-            .scholarship-title {{
-                font-size: 18px;
-                font-weight: 700;
-                color: #1a1a1a;
-                margin-bottom: 6px;
-            }}
-
-            .university-name {{
-                font-size: 13px;
-                color: #b8883b;
-                font-weight: 600;
-                margin-bottom: 12px;
-            }}
-
-            .scholarship-description {{
-                font-size: 14px;
-                color: #666;
-                line-height: 1.6;
-                margin-bottom: 14px;
-            }}
-
-            .tags {{
-                display: flex;
-                flex-wrap: wrap;
-                gap: 6px;
-                margin-bottom: 14px;
-            }}
-
-            .tag {{
-                padding: 5px 12px;
-                border-radius: 12px;
-                font-size: 11px;
-                font-weight: 600;
-                background-color: #b8883b;
-                color: white;
-            }}
-
-            .tag:nth-child(2) {{
-                background-color: #d4a54a;
-            }}
-
-            .tag:nth-child(3) {{
-                background-color: #e8c176;
-            }}
-
-            .matched-criteria {{
-                padding: 10px;
-                background-color: #f0f9f4;
-                border-radius: 8px;
-                border-left: 3px solid #2d5f3f;
-                font-size: 12px;
-                color: #2d5f3f;
-                font-weight: 500;
-            }}
-
-            /* No Results */
-            .no-results {{
-                text-align: center;
-                padding: 4rem 2rem;
-                background: white;
-                border-radius: 12px;
-                box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);
-            }}
-
-            .no-results h2 {{
-                font-size: 1.8rem;
-                color: #2c2c2c;
-                margin-bottom: 1rem;
-            }}
-
-            .no-results p {{
-                font-size: 1rem;
-                color: #666;
-                margin-bottom: 1.5rem;
-            }}
-
-            .btn {{
-                padding: 12px 24px;
-                background-color: #b8883b;
-                color: white;
-                border: none;
-                border-radius: 8px;
-                font-weight: 600;
-                font-size: 14px;
-                cursor: pointer;
-                transition: all 0.3s ease;
-            }}
-
-            .btn:hover {{
-                background-color: #9a7030;
-                transform: translateY(-2px);
-            }}
-
-            .btn-myscholarpass {{
-                display: inline-block;
-                padding: 12px 32px;
-                background-color: #b8883b;
-                color: white;
-                text-decoration: none;
-                border-radius: 8px;
-                font-weight: 600;
-                font-size: 14px;
-                transition: all 0.3s ease;
-                margin-top: 1rem;
-            }}
-
-            .btn-myscholarpass:hover {{
-                background-color: #9a7030;
-                transform: translateY(-2px);
-                box-shadow: 0 4px 12px rgba(184, 136, 59, 0.3);
-            }}
-
-            /* Responsive */
-            @media (max-width: 768px) {{
-                .header h1 {{
-                    font-size: 2rem;
-                }}
-
-                .scholarships-grid {{
-                    grid-template-columns: 1fr;
-                }}
-
-                nav, .container {{
-                    padding: 1rem 1.5rem;
-                }}
-
-                nav {{
-                    flex-direction: column;
-                    gap: 1rem;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <nav>
-            <div class="logo">ScholarPass</div>
-            <div class="user-info">
-                <span class="user-name">Welcome, {user_name}</span>
-                <a href="/logout" class="logout-btn">Logout</a>
-            </div>
-        </nav>
-
-        <div class="header">
-            <h1>🎓 Your Scholarship Matches</h1>
-            <p>Based on your profile and preferences</p>
-    """
-
-    if results:
-        html += f'<div class="count-badge">{len(results)} Scholarships Found</div>'
-        html += '<br><br><a href="/myscholarpass" class="btn-myscholarpass">Go to My ScholarPass</a>'
-    
-    html += """
-        </div>
-
-        <div class="container">
-    """
-
-    if not results:
-        html += """
-            <div class="no-results">
-                <h2>No Matches Found</h2>
-                <p>Try adjusting your answers to find more scholarship opportunities</p>
-                <button class="btn" onclick="window.history.back()">Try Again</button>
-            </div>
-        """
-    else:
-        html += '<div class="scholarships-grid">'
-        
-        for r in results[:10]:
-            html += f"""
-                <div class="scholarship-card">
-                    <div class="card-header">
-                        <div class="match-score">
-                            {r['score']} Match Points
-                        </div>
-                    </div>
-                    
-                    <div class="scholarship-title">{r['name']}</div>
-                    <div class="university-name">{r['university']}</div>
-                    <div class="scholarship-description">{r['description']}</div>
-                    
-                    <div class="tags">
-            """
-            
-            for tag in r['tags']:
-                html += f'<span class="tag">{tag}</span>'
-            
-            html += f"""
-                    </div>
-                    
-                    <div class="matched-criteria">
-                        ✓ Matched: {r['matched'].replace('_', ' ').title()}
-                    </div>
-                </div>
-            """
-        
-        html += '</div>'
+    # Scoring runs lazily from inside the template, so the page header is
+    # streamed to the browser before the cards are scored and rendered
+    def score_results():
+        with instruments.span('match'):
+            results = offload.run(matcher.score, answers)
+        # Saved for My ScholarPass in the background; a newer submission
+        # replaces a save that has not run yet
+        with instruments.span('db'):
+            offload.run(jobs.enqueue, 'matches.save', {'user_id': user_id, 'answers': answers},
+                        key=f'matches:{user_id}', replace=True)
+        return results
+
+    return Response(stream_template(
+        'recommendations.html',
+        user_name=user_name,
+        score_results=score_results
+    ))
+
+# --- JSON RECOMMENDATION API ---
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+def encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f'{version}:{offset}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, version):
+    """Offset encoded in a cursor, or None if it is malformed or from an older catalog."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_version, offset = (int(part) for part in raw.split(':'))
+    except ValueError:
+        return None
+    if cursor_version != version or offset < 0:
+        return None
+    return offset
+
+@app.route('/api/recommendations', methods=['GET', 'POST'])
+def api_recommendations():
+    body = request.get_json(silent=True)
+    if body is not None and not isinstance(body, dict):
+        return jsonify(error='JSON body must be an object'), 400
+    source = body or request.values
+    answers = collect_answers(source)
+
+    try:
+        limit = int(source.get('limit') or API_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify(error='limit must be an integer'), 400
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    with instruments.span('db'):
+        version = offload.run(sync_catalog)
+    offset = 0
+    if source.get('cursor'):
+        offset = decode_cursor(str(source['cursor']), version)
+        if offset is None:
+            return jsonify(error='Invalid or expired cursor. Restart from the first page.'), 400
+
+    # The page is fully determined by the catalog version, the ranking model,
+    # the answers and the position, so the ETag can be checked before any
+    # scoring happens
+    fingerprint = json.dumps([version, ranking_fingerprint(), [answers[key] for key in ANSWER_KEYS], offset, limit])
+    etag = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    with instruments.span('match'):
+        results = offload.run(matcher.score, answers)
+    next_offset = offset + limit
+    response = jsonify(
+        results=[
+            {
+                'name': r['name'],
+                'university': r['university'],
+                'tags': r['tags'],
+                'score': r['score'],
+                'matched': [key for key in ANSWER_KEYS if key in r['matched'].split(', ')]
+            }
+            for r in results[offset:next_offset]
+        ],
+        total=len(results),
+        next_cursor=encode_cursor(version, next_offset) if next_offset < len(results) else None,
+        catalog_version=version
+    )
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# --- CATALOG SEARCH API ---
+@app.route('/api/search')
+def api_search():
+    """Ranked prefix search: ?q=eng&university=DLSU&tag=Merit&limit=20&cursor=..."""
+    query = request.args.get('q', '')
+    university = request.args.get('university', '').strip()
+    tag = request.args.get('tag', '').strip()
+    try:
+        limit = int(request.args.get('limit') or API_PAGE_SIZE)
+    except ValueError:
+        return jsonify(error='limit must be an integer'), 400
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    with instruments.span('db'):
+        version = offload.run(sync_catalog)
+    offset = 0
+    if request.args.get('cursor'):
+        offset = decode_cursor(request.args['cursor'], version)
+        if offset is None:
+            return jsonify(error='Invalid or expired cursor. Restart from the first page.'), 400
+
+    with instruments.span('search'):
+        found = offload.run(catalog_search.search, query, version, university, tag, limit, offset)
+    next_offset = offset + limit
+    return jsonify(
+        results=found['results'],
+        total=found['total'],
+        facets=found['facets'],
+        next_cursor=encode_cursor(version, next_offset) if next_offset < found['total'] else None,
+        catalog_version=version
+    )
 
-    html += """
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html
+# --- Serve fingerprinted assets ---
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    with instruments.span('static'):
+        return assets.serve(filename)
 
 # --- Serve CSS & JS directly ---
 @app.route('/<path:filename>')
 def serve_file(filename):
     # Check if it's an HTML file - render it as a template to enable Jinja2
     if filename.endswith('.html'):
-        return render_template(filename)
+        return page_cache.render(filename)
     # For other files (CSS, JS, images), serve them directly
-    return send_from_directory('.', filename)
+    with instruments.span('static'):
+        return send_from_directory('.', filename)
+
+# --- Application factory ---
+# Timings of the last create_app() in this process, in milliseconds
+startup = {}
+setup_lock = threading.Lock()
+
+def create_app(config=None):
+    """Finish setting up the app and return it: apply ``config`` over the
+    defaults, apply the schema if this deployment has not, and build the
+    matcher from the catalog.
+
+    Routes and cheap services are defined at import; the expensive part
+    happens here, once per process. gunicorn calls it as 'app:create_app()'
+    in every worker, or once in the master with GUNICORN_PRELOAD=1 so the
+    workers share the built matcher copy-on-write. Later calls return the
+    app unchanged.
+    """
+    global ranker, matcher
+    with setup_lock:
+        if 'scholarpass' in app.extensions:
+            return app
+        began = time.perf_counter()
+        app.config.update(config or {})
+        if app.config['SECRET_KEY'] == DEV_SECRET_KEY and not app.debug:
+            app.logger.warning('SECRET_KEY is not set; using the development key')
+
+        if app.config['SCHEMA_AUTO_APPLY']:
+            done = apply_schema(db_pool.path)
+            if done:
+                app.logger.info('Applied database schema: %s', done)
+        schema_done = time.perf_counter()
+
+        # Read first: a change made while the matcher builds is reloaded on the next sync
+        catalog_state['version'] = current_catalog_version()
+        ranker = build_ranker(app.config['MATCHER_ENGINE'])
+        matcher = build_cached_matcher(ranker)
+        instruments.add_collector('scholarpass_recommend_cache', matcher.stats)
+        rules = getattr(ranker, 'fallback', ranker)
+        if rules is not ranker:
+            instruments.add_collector('scholarpass_ranking', ranker.stats)
+        if isinstance(rules, SnapshotMatcher):
+            instruments.add_collector('scholarpass_snapshot', rules.stats)
+        finished = time.perf_counter()
+
+        startup.update(
+            import_ms=round((began - STARTED) * 1000, 1),
+            schema_ms=round((schema_done - began) * 1000, 1),
+            matcher_ms=round((finished - schema_done) * 1000, 1),
+            total_ms=round((finished - STARTED) * 1000, 1),
+            budget_ms=app.config['STARTUP_BUDGET_MS']
+        )
+        instruments.add_collector('scholarpass_startup', lambda: dict(startup))
+        log = app.logger.warning if startup['total_ms'] > startup['budget_ms'] else app.logger.info
+        log('Started in %(total_ms)s ms (imports %(import_ms)s, schema %(schema_ms)s, '
+            'matcher %(matcher_ms)s; budget %(budget_ms)s)', startup)
+        app.extensions['scholarpass'] = startup
+        return app
 
 # --- Run ---
 if __name__ == '__main__':
-    init_db()
+    create_app()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""Fingerprinted static assets.
+
+``flask --app app assets build`` copies the CSS, JS and images into
+build/assets/ under content-hashed names, precompresses the text files
+(gzip, plus brotli when the ``brotli`` package is installed) and writes a
+manifest. At runtime ``asset_url()`` maps a source path to its hashed URL,
+and the /assets/ route serves those files as immutable.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import abort, request, send_from_directory
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+from image_variants import RASTER, available_formats, build_variants, savings_report
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BUILD_DIR = os.path.join('build', 'assets')
+MANIFEST_NAME = 'manifest.json'
+URL_PREFIX = '/assets'
+ONE_YEAR = 365 * 24 * 3600
+
+ASSET_EXTENSIONS = ('.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif', '.ico')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+assets_cli = AppGroup('assets', help='Build fingerprinted, precompressed static assets.')
+
+
+# --- Build ---
+def collect_sources(root):
+    """Relative paths of the site's static files: top-level CSS/JS and images/."""
+    paths = [name for name in os.listdir(root) if name.endswith(('.css', '.js'))]
+    images = os.path.join(root, 'images')
+    for folder, _, files in os.walk(images):
+        for name in files:
+            if name.lower().endswith(ASSET_EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/'))
+    # Images first, so stylesheets can be rewritten to point at hashed images
+    return sorted(paths, key=lambda p: (p.endswith('.css'), p))
+
+
+def rewrite_css(text, manifest):
+    def replace(match):
+        quote, target = match.groups()
+        entry = manifest.get(target.lstrip('/'))
+        return f'url({quote}{entry["path"]}{quote})' if entry else match.group(0)
+    return CSS_URL.sub(replace, text)
+
+
+def write_variants(path, data):
+    """Write .gz/.br next to ``path`` when they are smaller; returns encodings."""
+    encodings = []
+    variants = [('gzip', '.gz', lambda d: gzip.compress(d, 9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', lambda d: brotli.compress(d, quality=11)))
+    for encoding, suffix, compress in variants:
+        packed = compress(data)
+        if len(packed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(packed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_assets(root='.', out=BUILD_DIR, images=True):
+    """Fingerprint and precompress every asset; returns the manifest.
+
+    With ``images``, raster images also get resized WebP/AVIF variants.
+    """
+    formats = available_formats() if images else []
+    manifest = {}
+    for rel in collect_sources(root):
+        with open(os.path.join(root, rel), 'rb') as f:
+            data = f.read()
+        if rel.endswith('.css'):
+            data = rewrite_css(data.decode('utf-8'), manifest).encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(rel)
+        hashed = f'{stem}.{digest}{ext}'
+        target = os.path.join(out, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+
+        manifest[rel] = {
+            'path': hashed,
+            'etag': digest,
+            'size': len(data),
+            'encodings': write_variants(target, data) if rel.endswith(COMPRESSIBLE) else []
+        }
+        if formats and rel.lower().endswith(RASTER):
+            manifest[rel]['variants'] = build_variants(os.path.join(root, rel), rel, out, formats)
+
+    with open(os.path.join(out, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+@assets_cli.command('build')
+@click.option('--out', default=BUILD_DIR, show_default=True)
+@click.option('--images/--no-images', default=True, help='Generate responsive WebP/AVIF image variants.')
+def build_command(out, images):
+    """Fingerprint and precompress static files (run at deploy time)."""
+    if images and not available_formats():
+        click.echo('Pillow with WebP support is not installed; skipping image variants', err=True)
+    manifest = build_assets('.', out, images)
+    compressed = sum(1 for entry in manifest.values() if entry['encodings'])
+    click.echo(f'Built {len(manifest)} assets ({compressed} precompressed) into {out}')
+    if brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written', err=True)
+
+    rows = savings_report(manifest)
+    if rows:
+        click.echo(f"\n{'image':<32} {'original':>10} {'full-width':>10} {'<=640w':>10}")
+        for row in rows:
+            click.echo(f"{row['image']:<32} {row['original']:>10,} {row['full']:>10,} {row['mobile']:>10,}")
+        original = sum(row['original'] for row in rows)
+        full = sum(row['full'] for row in rows)
+        mobile = sum(row['mobile'] for row in rows)
+        click.echo(
+            f"{'total':<32} {original:>10,} {full:>10,} {mobile:>10,}\n"
+            f"Saved {original - full:,} bytes ({1 - full / original:.0%}) at full width, "
+            f"{original - mobile:,} bytes ({1 - mobile / original:.0%}) on phones"
+        )
+
+
+# --- Runtime ---
+class AssetManifest:
+    """Maps source paths to fingerprinted URLs; falls back to plain paths."""
+
+    def __init__(self, out=BUILD_DIR):
+        self.out = out
+        self.entries = {}
+        self.by_hashed = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.out, MANIFEST_NAME)) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        self.by_hashed = {}
+        for entry in self.entries.values():
+            self.by_hashed[entry['path']] = entry
+            for variant in entry.get('variants', []):
+                self.by_hashed[variant['path']] = dict(variant, encodings=[])
+
+    def url(self, path):
+        """Template helper: URL for a source asset such as 'style.css'."""
+        path = path.lstrip('/')
+        entry = self.entries.get(path)
+        return f'{URL_PREFIX}/{entry["path"]}' if entry else f'/{path}'
+
+    def image_sources(self, path, sizes='100vw'):
+        """Template helper: <source> tags listing an image's responsive variants.
+
+        Meant to sit inside ``<picture style="display: contents">`` ahead of
+        the plain <img>, which stays the fallback; emits nothing before a build.
+        """
+        entry = self.entries.get(path.lstrip('/'))
+        sources = []
+        by_type = {}
+        for variant in (entry or {}).get('variants', []):
+            by_type.setdefault(variant['type'], []).append(variant)
+        for mime, variants in by_type.items():
+            srcset = ', '.join(
+                f'{URL_PREFIX}/{v["path"]} {v["width"]}w' for v in sorted(variants, key=lambda v: v['width'])
+            )
+            sources.append(f'<source type="{mime}" srcset="{escape(srcset)}" sizes="{escape(sizes)}" />')
+        return Markup(''.join(sources))
+
+    def serve(self, filename):
+        """Serve a fingerprinted file, preferring a precompressed variant."""
+        entry = self.by_hashed.get(filename)
+        if entry is None:
+            abort(404)
+
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in entry['encodings'] and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+
+        response = send_from_directory(
+            os.path.abspath(self.out), filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            etag=f'{entry["etag"]}-{encoding}' if encoding else entry['etag'],
+            max_age=ONE_YEAR
+        )
+        if encoding and response.status_code != 304:
+            response.content_encoding = encoding
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
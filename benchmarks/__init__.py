@@ -0,0 +1,11 @@
+"""Load tests for the sign-in, sign-up and recommendation paths.
+
+    python -m benchmarks run [--target testclient|gunicorn] [--scenario NAME ...]
+                             [--users 8] [--requests 200] [--hash-iterations N]
+    python -m benchmarks compare baseline.json candidate.json [--threshold 0.10]
+
+Scenarios: pages (anonymous page views), signup (sign-up burst), login
+(login storm) and recommend (questionnaire submissions over every answer
+combination in questions.html). Results are written as JSON under
+benchmarks/results/ so a later run can be compared against them.
+"""
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+import click
+
+from benchmarks.runner import cleanup, compare, measure_startup, run_benchmarks
+
+SCENARIOS = ('pages', 'signup', 'login', 'recommend')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+@click.group(help='Benchmark the ScholarPass app.')
+def cli():
+    pass
+
+
+@cli.command('run')
+@click.option('--target', type=click.Choice(['testclient', 'gunicorn']), default='testclient', show_default=True)
+@click.option('--scenario', 'scenarios', multiple=True, type=click.Choice(SCENARIOS),
+              help='Scenario to run (repeatable; default: all).')
+@click.option('--users', default=8, show_default=True, help='Concurrent virtual users.')
+@click.option('--requests', default=200, show_default=True, help='Timed requests per scenario.')
+@click.option('--hash-iterations', type=int, help='PASSWORD_HASH_ITERATIONS for the run (default: the app\'s).')
+@click.option('--web-mode', type=click.Choice(['sync', 'gthread', 'gevent']), help='WEB_MODE for the gunicorn target.')
+@click.option('--workers', type=int, help='WEB_CONCURRENCY for the gunicorn target.')
+@click.option('--throttle', is_flag=True,
+              help='Keep the login throttle on. Off by default: every virtual user logs in from 127.0.0.1.')
+@click.option('--out', type=click.Path(dir_okay=False), help='Results file (default: benchmarks/results/).')
+def run_command(target, scenarios, users, requests, hash_iterations, web_mode, workers, throttle, out):
+    """Run scenarios and save latency/throughput/memory results as JSON."""
+    env = {}
+    if not throttle:
+        env['LOGIN_LIMIT_IP'] = env['LOGIN_LIMIT_EMAIL'] = '0'
+    if hash_iterations:
+        env['PASSWORD_HASH_ITERATIONS'] = str(hash_iterations)
+    if web_mode:
+        env['WEB_MODE'] = web_mode
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+
+    workdir = tempfile.mkdtemp(prefix='scholarpass-bench-')
+    try:
+        results = run_benchmarks(target, scenarios or SCENARIOS, users, requests, workdir, env)
+    finally:
+        cleanup(workdir)
+
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"{target}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    click.echo(f"{'scenario':<10} {'reqs':>6} {'err':>4} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for name, r in results['scenarios'].items():
+        click.echo(
+            f"{name:<10} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>9} "
+            f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['rss_peak_mb']:>8}"
+        )
+    click.echo(f'Saved {out}')
+
+
+@cli.command('startup')
+@click.option('--runs', default=5, show_default=True, help='Fresh processes to start.')
+@click.option('--engine', type=click.Choice(['sql', 'index', 'vector', 'automaton']),
+              help='MATCHER_ENGINE to build (default: the app\'s).')
+@click.option('--budget-ms', type=float, default=lambda: float(os.environ.get('STARTUP_BUDGET_MS', 2000)),
+              show_default='$STARTUP_BUDGET_MS or 2000', help='Slowest acceptable median worker boot.')
+def startup_command(runs, engine, budget_ms):
+    """Time app startup (imports, schema check, matcher build); exits 1 over budget."""
+    env = {'JOB_WORKERS': '0'}
+    if engine:
+        env['MATCHER_ENGINE'] = engine
+    workdir = tempfile.mkdtemp(prefix='scholarpass-bench-')
+    try:
+        median = measure_startup(runs, workdir, env)
+    finally:
+        cleanup(workdir)
+
+    for key in ('import_ms', 'schema_ms', 'matcher_ms', 'total_ms', 'process_ms'):
+        click.echo(f'{key:<12} {median[key]:>9}')
+    over = median['total_ms'] > budget_ms
+    click.echo(f"{'OVER' if over else 'within'} budget of {budget_ms} ms (median of {runs})")
+    sys.exit(1 if over else 0)
+
+
+@cli.command('compare')
+@click.argument('baseline', type=click.File())
+@click.argument('candidate', type=click.File())
+@click.option('--threshold', default=0.10, show_default=True, help='Allowed relative slowdown.')
+def compare_command(baseline, candidate, threshold):
+    """Compare two result files; exits 1 if any scenario regressed."""
+    rows = compare(json.load(baseline), json.load(candidate), threshold)
+
+    def cell(values):
+        before, after, change = values
+        return f'{before} -> {after}' + (f' ({change:+.0%})' if change is not None else '')
+
+    regressed = False
+    for row in rows:
+        flag = 'REGRESSED' if row['regressed'] else 'ok'
+        regressed = regressed or row['regressed']
+        click.echo(f"{row['scenario']:<10} {flag}")
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+            click.echo(f'  {metric:<15} {cell(row[metric])}')
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    cli()
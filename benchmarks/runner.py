@@ -0,0 +1,396 @@
+"""Drive scenarios against the app and summarize latency, throughput and memory.
+
+Two targets share the same scenarios:
+
+- ``testclient``: the Flask app imported into this process, requests go
+  through Werkzeug's test client (no network, measures app code only).
+- ``gunicorn``: a local gunicorn started from gunicorn.conf.py, requests go
+  over HTTP with keep-alive, memory is summed over master and workers.
+
+Either way the app runs against a throwaway copy of the database.
+"""
+import http.client
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from benchmarks.scenarios import ROOT
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+SETTINGS = ('MATCHER_ENGINE', 'PASSWORD_HASH_ITERATIONS', 'SESSION_BACKEND', 'WEB_MODE',
+            'WEB_CONCURRENCY', 'RECOMMEND_CACHE_SIZE', 'PAGE_CACHE_BYTES', 'DB_POOL_SIZE',
+            'LOGIN_LIMIT_IP', 'LOGIN_LIMIT_EMAIL', 'THROTTLE_BACKEND')
+
+
+# --- Recording ---
+class Recorder:
+    """Latencies per request label; thread-safe, can be paused for setup."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.enabled = False
+        self.lock = threading.Lock()
+
+    def record(self, label, seconds, ok):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(samples, errors, wall):
+    ordered = sorted(samples)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / wall, 2) if wall else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None
+    }
+
+
+# --- Clients ---
+class TestClient:
+    """Werkzeug test client for one virtual user."""
+
+    def __init__(self, app, recorder):
+        self.app = app
+        self.recorder = recorder
+        self.client = app.test_client()
+
+    def reset(self):
+        self.client = self.app.test_client()
+
+    def request(self, method, path, data=None, label=None, expect=(200,)):
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()  # drain streamed bodies
+        elapsed = time.perf_counter() - started
+        self.recorder.record(label or f'{method} {path}', elapsed, response.status_code in expect)
+        return response.status_code
+
+
+class HttpClient:
+    """Keep-alive HTTP client with a cookie jar for one virtual user."""
+
+    def __init__(self, host, port, recorder):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.cookies = {}
+        self.conn = http.client.HTTPConnection(host, port, timeout=120)
+
+    def reset(self):
+        self.cookies.clear()
+
+    def request(self, method, path, data=None, label=None, expect=(200,)):
+        body = urlencode(data) if data else None
+        headers = {}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            status = None
+        elapsed = time.perf_counter() - started
+        self.recorder.record(label or f'{method} {path}', elapsed, status in expect)
+
+        if status is not None:
+            for header in response.headers.get_all('Set-Cookie') or ():
+                for name, morsel in SimpleCookie(header).items():
+                    if morsel['max-age'] == '0':
+                        self.cookies.pop(name, None)
+                    else:
+                        self.cookies[name] = morsel.value
+        return status
+
+
+# --- Memory ---
+def rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_tree(pid):
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class MemorySampler(threading.Thread):
+    """Samples the RSS of a process tree every ``interval`` seconds."""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def current(self):
+        return sum(rss_bytes(pid) for pid in process_tree(self.pid))
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, self.current())
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.peak = max(self.peak, self.current())
+
+
+# --- Targets ---
+def prepare_database(path, source=os.path.join(ROOT, 'database', 'app.db')):
+    """Copy the real database (if any) to ``path`` and apply the schema there."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(source):
+        src, dst = sqlite3.connect(source), sqlite3.connect(path)
+        try:
+            src.backup(dst)  # consistent even while the WAL holds recent writes
+        finally:
+            src.close()
+            dst.close()
+    env = dict(os.environ, DATABASE_PATH=path)
+    subprocess.run([sys.executable, 'init_db.py'], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class GunicornServer:
+    """gunicorn 'app:create_app()' on a free local port, using gunicorn.conf.py."""
+
+    def __init__(self, env):
+        self.env = env
+        self.port = free_port()
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app:create_app()', '--bind', f'127.0.0.1:{self.port}',
+             '--log-level', 'warning'],
+            cwd=ROOT, env=self.env
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start listening within 60s')
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# --- Running ---
+def run_scenario(scenario, make_client, recorder, users, requests, memory_pid):
+    """Run ``requests`` steps of a scenario across ``users`` concurrent clients."""
+    clients = [make_client() for _ in range(users)]
+    recorder.enabled = False
+    for user, client in enumerate(clients):
+        scenario.setup(client, user)
+
+    recorder.samples, recorder.errors = {}, {}
+    recorder.enabled = True
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+    start = threading.Barrier(users + 1)
+
+    def virtual_user(user, client):
+        start.wait()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            scenario.step(client, user, i)
+
+    sampler = MemorySampler(memory_pid)
+    rss_start = sampler.current()
+    threads = [threading.Thread(target=virtual_user, args=(user, client)) for user, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    sampler.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    sampler.stop()
+    recorder.enabled = False
+
+    everything = [s for samples in recorder.samples.values() for s in samples]
+    result = summarize(everything, sum(recorder.errors.values()), wall)
+    result.update(
+        description=scenario.description,
+        wall_s=round(wall, 3),
+        rss_start_mb=round(rss_start / 2**20, 1),
+        rss_peak_mb=round(sampler.peak / 2**20, 1),
+        rss_end_mb=round(sampler.current() / 2**20, 1),
+        by_label={
+            label: summarize(samples, recorder.errors.get(label, 0), wall)
+            for label, samples in sorted(recorder.samples.items())
+        }
+    )
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(target, scenarios, users, requests, workdir, env):
+    """Run the named scenarios against ``target``; returns the results document.
+
+    ``env`` holds app settings (e.g. PASSWORD_HASH_ITERATIONS) for this run.
+    """
+    from benchmarks.scenarios import build_scenarios
+
+    db_path = os.path.join(workdir, 'app.db')
+    env = dict(os.environ, **env, DATABASE_PATH=db_path,
+               THROTTLE_FILE=os.path.join(workdir, 'throttle.buckets'))
+    prepare_database(db_path)
+    available = build_scenarios(run_id=str(int(time.time())))
+    recorder = Recorder()
+    results = {}
+
+    if target == 'testclient':
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+        import app as app_module
+        app = app_module.create_app()
+        for name in scenarios:
+            results[name] = run_scenario(
+                available[name], lambda: TestClient(app, recorder), recorder, users, requests, os.getpid()
+            )
+    elif target == 'gunicorn':
+        with GunicornServer(env) as server:
+            for name in scenarios:
+                results[name] = run_scenario(
+                    available[name], lambda: HttpClient('127.0.0.1', server.port, recorder),
+                    recorder, users, requests, server.process.pid
+                )
+    else:
+        raise ValueError(f'unknown target {target!r}')
+
+    return {
+        'meta': {
+            'target': target,
+            'revision': git_revision(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'users': users,
+            'requests_per_scenario': requests,
+            'settings': {key: env[key] for key in SETTINGS if key in env}
+        },
+        'scenarios': results
+    }
+
+
+# --- Startup ---
+STARTUP_SCRIPT = "import json, app; app.create_app(); print(json.dumps(app.startup))"
+
+
+def measure_startup(runs, workdir, env):
+    """Start the app in ``runs`` fresh interpreters; returns the median of each
+    create_app() phase plus ``process_ms``, the whole interpreter's wall time."""
+    db_path = os.path.join(workdir, 'app.db')
+    env = dict(os.environ, **env, DATABASE_PATH=db_path)
+    prepare_database(db_path)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        sample['process_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        samples.append(sample)
+    return {key: sorted(s[key] for s in samples)[len(samples) // 2] for key in samples[0]}
+
+
+def compare(baseline, candidate, threshold=0.10):
+    """Rows comparing two results documents; ``regressed`` marks p95 or throughput
+    moving the wrong way by more than ``threshold``."""
+    rows = []
+    for name, new in candidate['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        row = {'scenario': name}
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+            before, after = old.get(metric), new.get(metric)
+            change = (after - before) / before if before and after is not None else None
+            row[metric] = (before, after, change)
+        p95_change = row['p95_ms'][2]
+        rps_change = row['throughput_rps'][2]
+        row['regressed'] = (p95_change is not None and p95_change > threshold) or \
+            (rps_change is not None and rps_change < -threshold) or new['errors'] > old['errors']
+        rows.append(row)
+    return rows
+
+
+def cleanup(workdir):
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,116 @@
+"""Benchmark scenarios.
+
+Each scenario gets one client per virtual user. ``setup`` runs untimed
+(e.g. creating and logging in accounts); ``step`` issues the timed
+requests for request number ``i`` (unique across all virtual users).
+Requests go through ``client.request()``, which records their latency
+under the given label; ``client.reset()`` drops the client's cookies.
+"""
+import itertools
+import os
+import re
+
+from matcher import ANSWER_KEYS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'benchmark-password'
+
+
+def questionnaire_answers(path=os.path.join(ROOT, 'questions.html')):
+    """Every answer combination the questionnaire can submit, as sent by its script."""
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    names = re.findall(r'\{\s*name:\s*"(\w+)"', html)
+    blocks = re.split(r'data-question="\d+"', html)[1:]
+    options = [re.findall(r'data-value="([^"]+)"', block) for block in blocks]
+    if len(names) != len(options) or set(names) != set(ANSWER_KEYS):
+        raise ValueError(f'could not read the questions from {path}')
+    return [dict(zip(names, combo)) for combo in itertools.product(*options)]
+
+
+class Scenario:
+    name = None
+    description = ''
+
+    def setup(self, client, user):
+        pass
+
+    def step(self, client, user, i):
+        raise NotImplementedError
+
+
+class AnonymousPages(Scenario):
+    name = 'pages'
+    description = 'Anonymous visitors browsing the marketing pages'
+    paths = ('/', '/students', '/providers', '/index.html')
+
+    def step(self, client, user, i):
+        path = self.paths[i % len(self.paths)]
+        client.request('GET', path, label=f'GET {path}')
+
+
+class SignupBurst(Scenario):
+    name = 'signup'
+    description = 'Every virtual user creating new accounts at once'
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def step(self, client, user, i):
+        client.reset()
+        client.request('POST', '/signup', {
+            'name': f'Bench {user}-{i}',
+            'email': f'bench-{self.run_id}-signup-{user}-{i}@example.com',
+            'password': PASSWORD
+        }, label='POST /signup', expect=(302,))
+
+
+class LoginStorm(Scenario):
+    name = 'login'
+    description = 'Existing users signing in repeatedly, one in ten with a wrong password'
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def setup(self, client, user):
+        client.request('POST', '/signup', {
+            'name': f'Bench {user}',
+            'email': self.email(user),
+            'password': PASSWORD
+        }, expect=(302,))
+
+    def email(self, user):
+        return f'bench-{self.run_id}-login-{user}@example.com'
+
+    def step(self, client, user, i):
+        client.reset()
+        wrong = i % 10 == 9
+        client.request('POST', '/login', {
+            'email': self.email(user),
+            'password': PASSWORD + '-wrong' if wrong else PASSWORD
+        }, label='POST /login (bad password)' if wrong else 'POST /login', expect=(302,))
+
+
+class Questionnaire(Scenario):
+    name = 'recommend'
+    description = 'Logged-in students submitting every questionnaire combination'
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.combinations = questionnaire_answers()
+
+    def setup(self, client, user):
+        client.request('POST', '/signup', {
+            'name': f'Bench {user}',
+            'email': f'bench-{self.run_id}-recommend-{user}@example.com',
+            'password': PASSWORD
+        }, expect=(302,))
+
+    def step(self, client, user, i):
+        answers = self.combinations[i % len(self.combinations)]
+        client.request('POST', '/recommend', answers, label='POST /recommend')
+
+
+def build_scenarios(run_id):
+    scenarios = [AnonymousPages(), SignupBurst(run_id), LoginStorm(run_id), Questionnaire(run_id)]
+    return {scenario.name: scenario for scenario in scenarios}
@@ -0,0 +1,214 @@
+"""Scholarship catalog shipped with ScholarPass."""
+
+# --- Expanded Scholarship Dataset with detailed info ---
+SCHOLARSHIPS = [
+    {
+        "name": "Ateneo Freshmen Merit Scholarship",
+        "university": "Ateneo de Manila University",
+        "description": "Top 50 applicants based on academic ranking and ACET scores get free tuition and ₱50,000 annual allowance.",
+        "tags": ["Merit-based", "Full Tuition", "Allowance"],
+        "criteria": {"university": ["ateneo"], "average": ["95", "top", "excellent"]},
+        "weight": {"university": 3, "average": 2}
+    },
+    {
+        "name": "Director's List Scholarship",
+        "university": "Ateneo de Manila University",
+        "description": "150 applicants with outstanding high school averages and extracurricular activities receive a ₱100,000 grant.",
+        "tags": ["Academic Excellence", "₱100,000 Grant"],
+        "criteria": {"university": ["ateneo"], "average": ["90", "high"], "talent": ["extra", "arts", "sports"]},
+        "weight": {"university": 3, "average": 2, "talent": 1}
+    },
+    {
+        "name": "DLSU Archer Achiever Scholarship",
+        "university": "De La Salle University",
+        "description": "Top students from science or public high schools get a full waiver of tuition and other fees.",
+        "tags": ["Full Tuition Waiver", "Entrance Exam"],
+        "criteria": {"university": ["dlsu"], "average": ["90", "high"], "school_type": ["science", "public"]},
+        "weight": {"university": 3, "average": 2}
+    },
+    {
+        "name": "Star Scholars Program",
+        "university": "De La Salle University",
+        "description": "Integrated scholarship covering college and postgraduate programs such as master's, law, or medicine.",
+        "tags": ["Integrated", "Graduate", "Full Scholarship"],
+        "criteria": {"university": ["dlsu"], "average": ["95"], "financial_need": ["no"]},
+        "weight": {"university": 3, "average": 2}
+    },
+    {
+        "name": "UST Santo Tomas College Scholarship",
+        "university": "University of Santo Tomas",
+        "description": "For students with excellent academic performance.",
+        "tags": ["Academic Excellence", "Merit-based"],
+        "criteria": {"university": ["ust"], "average": ["high", "90", "95"]},
+        "weight": {"university": 3, "average": 2}
+    },
+    {
+        "name": "San Lorenzo Ruiz Student Assistance",
+        "university": "University of Santo Tomas",
+        "description": "For students in need of financial aid who can work 20–30 hours a week at the university.",
+        "tags": ["Financial Aid", "Work-study"],
+        "criteria": {"university": ["ust"], "financial_need": ["yes"], "talent": ["work", "volunteer"]},
+        "weight": {"university": 2, "financial_need": 3}
+    },
+    {
+        "name": "Vaugirard Scholarship Program",
+        "university": "De La Salle University",
+        "description": "50 public high school graduates get free tuition and living allowances.",
+        "tags": ["Public School", "Full Tuition", "Allowance"],
+        "criteria": {"school_type": ["public"], "financial_need": ["yes", "need"]},
+        "weight": {"school_type": 2, "financial_need": 3}
+    },
+    {
+        "name": "Don Tomas Mapua Scholarship",
+        "university": "Mapúa University",
+        "description": "Mapúa students with an average of 1.5 to 1.0 receive 100% tuition discount.",
+        "tags": ["Academic Excellence", "Full Tuition"],
+        "criteria": {"university": ["mapua"], "average": ["95"], "school_type": ["science", "public"]},
+        "weight": {"university": 3, "average": 2}
+    },
+    {
+        "name": "Financial Aid Grant",
+        "university": "Various Universities",
+        "description": "Provides tuition discounts, dormitory assistance, and allowances for books, food, and transportation.",
+        "tags": ["Financial Aid", "Assistance", "Allowance"],
+        "criteria": {"financial_need": ["yes", "need"], "school_type": ["public", "private"]},
+        "weight": {"financial_need": 3}
+    },
+    {
+        "name": "Athletic or Arts Scholarship",
+        "university": "Various Universities",
+        "description": "Full or partial scholarships for one year, renewable based on performance.",
+        "tags": ["Athletic", "Arts", "Renewable"],
+        "criteria": {"talent": ["arts", "sports"]},
+        "weight": {"talent": 3}
+    }
+]
+
+
+# --- Database persistence ---
+def add_scholarship(conn, scholarship):
+    """Insert a scholarship with its criteria and tags; returns the new id."""
+    cursor = conn.execute(
+        "INSERT INTO scholarships (name, university, description) VALUES (?, ?, ?)",
+        (scholarship["name"], scholarship["university"], scholarship.get("description", ""))
+    )
+    scholarship_id = cursor.lastrowid
+
+    _write_details(conn, scholarship_id, scholarship)
+    bump_catalog_version(conn)
+    return scholarship_id
+
+
+def update_scholarship(conn, scholarship_id, scholarship):
+    """Replace a scholarship's fields, criteria and tags; returns False if it does not exist."""
+    updated = conn.execute(
+        "UPDATE scholarships SET name = ?, university = ?, description = ? WHERE id = ?",
+        (scholarship["name"], scholarship["university"], scholarship.get("description", ""), scholarship_id)
+    ).rowcount
+    if not updated:
+        return False
+    conn.execute("DELETE FROM scholarship_criteria WHERE scholarship_id = ?", (scholarship_id,))
+    conn.execute("DELETE FROM scholarship_tags WHERE scholarship_id = ?", (scholarship_id,))
+    _write_details(conn, scholarship_id, scholarship)
+    bump_catalog_version(conn)
+    return True
+
+
+def _write_details(conn, scholarship_id, scholarship):
+    weights = scholarship.get("weight", {})
+    conn.executemany(
+        "INSERT OR IGNORE INTO scholarship_criteria (scholarship_id, criterion_key, keyword, weight) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            (scholarship_id, key, keyword.lower().strip(), weights.get(key, 1))
+            for key, keywords in scholarship.get("criteria", {}).items()
+            for keyword in keywords
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO scholarship_tags (scholarship_id, position, tag) VALUES (?, ?, ?)",
+        [(scholarship_id, position, tag) for position, tag in enumerate(scholarship.get("tags", []))]
+    )
+    _write_search_row(conn, scholarship_id, scholarship)
+
+
+def _write_search_row(conn, scholarship_id, scholarship):
+    """(Re)index one scholarship for search.py; the FTS rowid is its id."""
+    conn.execute("DELETE FROM scholarship_search WHERE rowid = ?", (scholarship_id,))
+    conn.execute(
+        "INSERT INTO scholarship_search (rowid, name, university, description, tags) VALUES (?, ?, ?, ?, ?)",
+        (scholarship_id, scholarship["name"], scholarship["university"], scholarship.get("description", ""),
+         " ".join(scholarship.get("tags", [])))
+    )
+
+
+def rebuild_search_index(conn):
+    """Index every scholarship if the search table is out of step (e.g. a
+    database created before search existed); returns how many were indexed.
+    Callers commit."""
+    indexed = conn.execute("SELECT COUNT(*) FROM scholarship_search").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM scholarships").fetchone()[0]
+    if indexed == total:
+        return 0
+    conn.execute("DELETE FROM scholarship_search")
+    catalog = load_catalog(conn)
+    for s in catalog:
+        _write_search_row(conn, s["id"], s)
+    conn.execute("INSERT INTO scholarship_search (scholarship_search) VALUES ('optimize')")
+    return len(catalog)
+
+
+def bump_catalog_version(conn):
+    """Mark the catalog as changed; callers commit."""
+    conn.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+
+
+def get_catalog_version(conn):
+    row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def seed_catalog(conn, scholarships=SCHOLARSHIPS):
+    """Load the bundled catalog into an empty scholarships table; callers commit."""
+    if conn.execute("SELECT 1 FROM scholarships LIMIT 1").fetchone():
+        return 0
+    for s in scholarships:
+        add_scholarship(conn, s)
+    return len(scholarships)
+
+
+def load_catalog(conn, scholarship_id=None):
+    """Read the catalog tables back into the dict shape used by the matcher.
+
+    With ``scholarship_id``, only that scholarship is read (an empty list if
+    it does not exist).
+    """
+    if scholarship_id is None:
+        where, detail_where, params = "", "", ()
+    else:
+        where, detail_where, params = "WHERE id = ?", "WHERE scholarship_id = ?", (scholarship_id,)
+    catalog = {}
+    for row in conn.execute(f"SELECT id, name, university, description FROM scholarships {where} ORDER BY id", params):
+        catalog[row[0]] = {
+            "id": row[0],
+            "name": row[1],
+            "university": row[2],
+            "description": row[3],
+            "tags": [],
+            "criteria": {},
+            "weight": {}
+        }
+
+    for sid, key, keyword, weight in conn.execute(
+        f"SELECT scholarship_id, criterion_key, keyword, weight FROM scholarship_criteria {detail_where}", params
+    ):
+        s = catalog[sid]
+        s["criteria"].setdefault(key, []).append(keyword)
+        s["weight"][key] = weight
+
+    for sid, tag in conn.execute(
+        f"SELECT scholarship_id, tag FROM scholarship_tags {detail_where} ORDER BY scholarship_id, position", params
+    ):
+        catalog[sid]["tags"].append(tag)
+
+    return list(catalog.values())
@@ -0,0 +1,113 @@
+"""Scholarship catalog commands.
+
+    flask --app app catalog add scholarships.json
+    flask --app app catalog edit 12 scholarship.json
+    flask --app app catalog add --background scholarships.json
+    flask --app app catalog snapshot
+
+Files hold one scholarship object (or, for ``add``, a list of them) in the
+shape of catalog.SCHOLARSHIPS. Saved matches of the students each change
+can affect are re-scored in the same transaction, or with ``--background``
+by a 'catalog.rematch' job queued in that transaction.
+"""
+import json
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+
+from catalog import add_scholarship, update_scholarship
+from saved_matches import rematch_scholarship
+
+catalog_cli = AppGroup('catalog', help='Add and edit scholarships.')
+
+REQUIRED = ('name', 'university')
+
+
+def rematch(conn, scholarship_id, background):
+    """Re-score now (returns the count) or queue the re-scoring (returns None)."""
+    if background:
+        from app import jobs
+        jobs.enqueue('catalog.rematch', {'scholarship_id': scholarship_id},
+                     key=f'rematch:{scholarship_id}', replace=True, conn=conn)
+        return None
+    return rematch_scholarship(conn, scholarship_id)
+
+
+def describe(rescored):
+    return 're-match queued' if rescored is None else f're-scored {rescored} students'
+
+
+def read_scholarships(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    scholarships = data if isinstance(data, list) else [data]
+    for s in scholarships:
+        if not isinstance(s, dict) or any(not s.get(field) for field in REQUIRED):
+            raise click.ClickException(f'every scholarship needs {" and ".join(REQUIRED)}')
+    return scholarships
+
+
+@catalog_cli.command('add')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--background', is_flag=True, help='Queue the re-matching as a background job.')
+def add_command(path, background):
+    """Add the scholarships in PATH and re-match affected students."""
+    from app import get_db_connection
+
+    scholarships = read_scholarships(path)
+    conn = get_db_connection()
+    started = time.perf_counter()
+    try:
+        for s in scholarships:
+            scholarship_id = add_scholarship(conn, s)
+            rescored = rematch(conn, scholarship_id, background)
+            click.echo(f'Added #{scholarship_id} {s["name"]}: {describe(rescored)}')
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo(f'Done in {time.perf_counter() - started:.2f}s')
+
+
+@catalog_cli.command('edit')
+@click.argument('scholarship_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--background', is_flag=True, help='Queue the re-matching as a background job.')
+def edit_command(scholarship_id, path, background):
+    """Replace scholarship SCHOLARSHIP_ID with PATH and re-match affected students."""
+    from app import get_db_connection
+
+    scholarships = read_scholarships(path)
+    if len(scholarships) != 1:
+        raise click.ClickException('edit takes a single scholarship')
+    conn = get_db_connection()
+    try:
+        if not update_scholarship(conn, scholarship_id, scholarships[0]):
+            raise click.ClickException(f'no scholarship #{scholarship_id}')
+        rescored = rematch(conn, scholarship_id, background)
+        conn.commit()
+    finally:
+        conn.close()
+    click.echo(f'Updated #{scholarship_id}: {describe(rescored)}')
+
+
+@catalog_cli.command('snapshot')
+@click.option('--path', default=lambda: os.environ.get('CATALOG_SNAPSHOT', 'database/catalog.snapshot'),
+              show_default='$CATALOG_SNAPSHOT or database/catalog.snapshot')
+def snapshot_command(path):
+    """Write the catalog snapshot that MATCHER_ENGINE=snapshot workers map.
+
+    Workers write it themselves when the catalog changes; this is for
+    building it ahead of a deploy or replacing a damaged file.
+    """
+    from app import get_db_connection
+    from snapshot import read_catalog, write_snapshot
+
+    conn = get_db_connection()
+    try:
+        version, scholarships = read_catalog(conn)
+    finally:
+        conn.close()
+    size = write_snapshot(path, scholarships, version)
+    click.echo(f'Wrote {path}: {len(scholarships)} scholarships at catalog version {version}, {size / 1024:.1f} KiB')
@@ -0,0 +1,111 @@
+"""Password hashing for user accounts.
+
+Hashes are PBKDF2-SHA256 in Werkzeug's ``method$salt$hash`` format with a
+configurable iteration count. Hashing runs on a bounded thread pool
+(hashlib releases the GIL), and rows stored as plaintext or at another
+cost are re-hashed the next time their owner logs in.
+"""
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from offload import native_executor
+
+DEFAULT_ITERATIONS = 600000
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashes are already queued."""
+
+
+class CredentialHasher:
+    """Hashes and verifies passwords on a bounded worker pool."""
+
+    def __init__(self, iterations=DEFAULT_ITERATIONS, workers=None, max_pending=64, wait=5.0):
+        self.iterations = iterations
+        self.method = f'pbkdf2:sha256:{iterations}'
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._pid = None
+        self._executor_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.wait = wait
+        self._dummy_hash = None
+
+    @property
+    def executor(self):
+        # Created lazily in each process: a pool made before a fork (gunicorn
+        # --preload) has no threads in the workers. Native threads even under
+        # gevent, where patched threads are greenlets.
+        with self._executor_lock:
+            if self._pid != os.getpid():
+                self._executor = native_executor(self.workers, thread_name_prefix='hasher')
+                self._pid = os.getpid()
+            return self._executor
+
+    @property
+    def dummy_hash(self):
+        """Verified when the email is unknown, so both paths cost the same."""
+        if self._dummy_hash is None:
+            self._dummy_hash = generate_password_hash('dummy-password', method=self.method)
+        return self._dummy_hash
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.wait):
+            raise HasherBusy()
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords, method=None):
+        """Hash a batch in parallel (bulk imports); order is preserved."""
+        method = method or self.method
+        return list(self.executor.map(lambda p: generate_password_hash(p, method), passwords))
+
+    def verify(self, stored, password):
+        """Return (valid, needs_rehash) for a stored hash or legacy plaintext."""
+        if stored is None:
+            self._run(check_password_hash, self.dummy_hash, password)
+            return False, False
+        if not stored.startswith(HASH_PREFIXES):
+            # Legacy plaintext row from before passwords were hashed
+            return hmac.compare_digest(stored.encode(), password.encode()), True
+        valid = self._run(check_password_hash, stored, password)
+        return valid, valid and stored.split('$', 1)[0] != self.method
+
+
+def benchmark(costs, rounds=20, threads=None):
+    """Time one verification per cost; returns a row of figures per cost."""
+    threads = threads or os.cpu_count() or 1
+    report = []
+    for iterations in costs:
+        method = f'pbkdf2:sha256:{iterations}'
+        stored = generate_password_hash('benchmark-password', method=method)
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            check_password_hash(stored, 'benchmark-password')
+        per_login = (time.perf_counter() - started) / rounds
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            started = time.perf_counter()
+            list(executor.map(lambda _: check_password_hash(stored, 'benchmark-password'), range(rounds * threads)))
+            parallel = rounds * threads / (time.perf_counter() - started)
+
+        report.append({
+            'iterations': iterations,
+            'ms_per_login': per_login * 1000,
+            'logins_per_sec_per_core': 1 / per_login,
+            'logins_per_sec_all_cores': parallel,
+            'threads': threads
+        })
+    return report
@@ -5,5 +5,123 @@ CREATE TABLE IF NOT EXISTS users (
     email TEXT UNIQUE NOT NULL,
     password TEXT NOT NULL,
     role TEXT NOT NULL DEFAULT 'student' CHECK (role IN ('student', 'provider')),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- Set only by 'flask users admin'; grants /cache-stats and /admin/*
+    is_admin INTEGER NOT NULL DEFAULT 0
+);
+
+-- Scholarship catalog matched against questionnaire answers
+CREATE TABLE IF NOT EXISTS scholarships (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    university TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
+
+-- One row per keyword; weight is the points for the criterion key
+CREATE TABLE IF NOT EXISTS scholarship_criteria (
+    scholarship_id INTEGER NOT NULL REFERENCES scholarships(id) ON DELETE CASCADE,
+    criterion_key TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    weight INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (scholarship_id, criterion_key, keyword)
+);
+
+-- Covering index: candidate lookup never touches the table itself
+CREATE INDEX IF NOT EXISTS idx_criteria_key_keyword
+    ON scholarship_criteria (criterion_key, keyword, scholarship_id, weight);
+
+CREATE TABLE IF NOT EXISTS scholarship_tags (
+    scholarship_id INTEGER NOT NULL REFERENCES scholarships(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (scholarship_id, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_scholarship_tags_tag ON scholarship_tags (tag);
+
+-- Full-text search over the catalog (search.py); rowid = scholarships.id.
+-- Prefix indexes make 2- and 3-letter prefix queries index lookups.
+CREATE VIRTUAL TABLE IF NOT EXISTS scholarship_search USING fts5(
+    name, university, description, tags,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS scholarship_search_delete AFTER DELETE ON scholarships BEGIN
+    DELETE FROM scholarship_search WHERE rowid = old.id;
+END;
+
+-- Bumped whenever the catalog changes; drives API ETags and matcher reloads
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+
+-- Server-side sessions; the cookie only holds the sid
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    user_id INTEGER,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id);
+
+-- Last questionnaire answers per user, one row per question
+CREATE TABLE IF NOT EXISTS user_answers (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    criterion_key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user_id, criterion_key)
+);
+
+-- Finds the users whose answer hits a scholarship's keyword
+CREATE INDEX IF NOT EXISTS idx_user_answers_lookup ON user_answers (criterion_key, value, user_id);
+
+-- Scored matches behind My ScholarPass
+CREATE TABLE IF NOT EXISTS user_matches (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    scholarship_id INTEGER NOT NULL REFERENCES scholarships(id) ON DELETE CASCADE,
+    score INTEGER NOT NULL,
+    matched TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_id, scholarship_id)
+) WITHOUT ROWID;
+
+-- Covering: My ScholarPass reads a user's ranked matches from the index alone
+CREATE INDEX IF NOT EXISTS idx_user_matches_rank ON user_matches (user_id, score DESC, scholarship_id, matched);
+CREATE INDEX IF NOT EXISTS idx_user_matches_scholarship ON user_matches (scholarship_id);
+
+-- A student's status for a scholarship on My ScholarPass; labels for ranking.py
+CREATE TABLE IF NOT EXISTS match_outcomes (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    scholarship_id INTEGER NOT NULL REFERENCES scholarships(id) ON DELETE CASCADE,
+    status TEXT NOT NULL CHECK (status IN ('saved', 'applied', 'pending', 'passed', 'not-interested')),
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, scholarship_id)
+);
+
+-- Background jobs (jobs.py); rows outlive restarts, 'running' rows carry a lease
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    rerun INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+-- Workers claim the oldest due job
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_at);
@@ -0,0 +1,67 @@
+"""Gunicorn settings, sized from the machine's CPU count.
+
+Gunicorn picks this file up automatically, so the Procfile's
+``web: gunicorn 'app:create_app()'`` uses it (after its ``release:
+python init_db.py`` step has applied the schema). Pick a mode with
+WEB_MODE:
+
+  sync     (default) 2 x CPUs + 1 single-request workers. Simple, but every
+           slow client holds a whole worker.
+  gthread  one worker per CPU, GUNICORN_THREADS (default 8) threads each.
+  gevent   one evented worker per CPU, each holding up to
+           GUNICORN_CONNECTIONS (default 1000) connections. SQLite queries,
+           scoring and password hashing are offloaded to native threads
+           (OFFLOAD_THREADS, PASSWORD_HASH_WORKERS), so slow clients cost a
+           greenlet rather than a worker. Needs the gevent package.
+
+WEB_CONCURRENCY overrides the worker count in every mode. With gevent,
+keep DB_POOL_SIZE at least OFFLOAD_THREADS so offloaded queries reuse
+pooled connections. Login throttle buckets live in one file shared by
+every worker (THROTTLE_FILE), so LOGIN_LIMIT_* hold per machine whatever
+the worker count; THROTTLE_BACKEND=memory would multiply them by it.
+
+GUNICORN_PRELOAD=1 runs create_app() once in the master before forking:
+workers start in milliseconds and share the built matcher and catalog
+copy-on-write instead of each building their own. Code changes then need
+a full restart rather than a HUP.
+"""
+import gc
+import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+mode = os.environ.get('WEB_MODE', 'sync')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+if preload_app and mode == 'gevent':
+    # The app is imported before the workers patch; patch first so its locks and sockets cooperate
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 20
+
+if mode == 'gevent':
+    worker_class = 'gevent'
+    workers = cpus
+    worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 1000))
+    keepalive = 30  # idle keep-alive connections are cheap for evented workers
+elif mode == 'gthread':
+    worker_class = 'gthread'
+    workers = cpus
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+    keepalive = 5
+elif mode == 'sync':
+    worker_class = 'sync'
+    workers = 2 * cpus + 1
+else:
+    raise RuntimeError(f'Unknown WEB_MODE {mode!r}; expected sync, gthread or gevent')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', workers))
+
+
+def pre_fork(server, worker):
+    # Move the preloaded app out of the collector's reach: a GC pass in a
+    # worker would otherwise write to every object and un-share its pages
+    gc.freeze()
@@ -0,0 +1,76 @@
+"""Responsive image variants for the asset build.
+
+Every raster image under images/ is resized to a few standard widths and
+re-encoded as WebP (and AVIF when Pillow supports it), so pages can send a
+phone a 320px WebP instead of a multi-megabyte original. Requires Pillow
+at build time only.
+"""
+import hashlib
+import io
+import os
+
+WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+RASTER = ('.png', '.jpg', '.jpeg')
+FORMATS = (
+    # (Pillow format, MIME type, extension, save options)
+    ('AVIF', 'image/avif', '.avif', {'quality': 50, 'speed': 8}),
+    ('WEBP', 'image/webp', '.webp', {'quality': 80, 'method': 6})
+)
+
+
+def available_formats():
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+    return [f for f in FORMATS if features.check(f[0].lower())]
+
+
+def build_variants(source, rel, out, formats):
+    """Write resized variants of one image; returns manifest records."""
+    from PIL import Image
+
+    with Image.open(source) as original:
+        original.load()
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'A' in original.getbands() or 'transparency' in original.info else 'RGB')
+        # Every standard width below the original, plus the original width
+        # itself unless it is wider than any screen we target
+        widths = [w for w in WIDTHS if w < original.width]
+        if original.width <= WIDTHS[-1]:
+            widths.append(original.width)
+
+        stem = os.path.splitext(rel)[0]
+        variants = []
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            image = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for pil_format, mime, ext, options in formats:
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, **options)
+                data = buffer.getvalue()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                path = f'{stem}.w{width}.{digest}{ext}'
+                with open(os.path.join(out, path), 'wb') as f:
+                    f.write(data)
+                variants.append({'path': path, 'etag': digest, 'width': width, 'type': mime, 'size': len(data)})
+    return variants
+
+
+def savings_report(manifest, mobile_width=640):
+    """Per image: original bytes, best variant at full width and at phone width."""
+    rows = []
+    for rel, entry in sorted(manifest.items()):
+        variants = entry.get('variants')
+        if not variants:
+            continue
+        full_width = max(v['width'] for v in variants)
+        mobile = [v for v in variants if v['width'] <= mobile_width] or variants
+        mobile_best = max(v['width'] for v in mobile)
+        rows.append({
+            'image': rel,
+            'original': entry['size'],
+            'full': min(v['size'] for v in variants if v['width'] == full_width),
+            'mobile': min(v['size'] for v in variants if v['width'] == mobile_best)
+        })
+    return rows
@@ -1,17 +1,16 @@
-import sqlite3
-import os
+# Run once per deploy by the Procfile's release phase; workers then skip the schema
+from db import DATABASE
+from schema import apply_schema
 
-# Ensure the folder exists
-os.makedirs('database', exist_ok=True)
+done = apply_schema(DATABASE)
 
-# Connect to the database
-conn = sqlite3.connect('database/app.db')
-
-# Read and execute the schema
-with open('database/schema.sql') as f:
-    conn.executescript(f.read())
-
-conn.commit()
-conn.close()
-
-print("✅ Database created successfully at database/app.db")
+if done is None:
+    print(f"✅ Database at {DATABASE} is up to date")
+else:
+    if done['upgraded_users']:
+        print("✅ Upgraded the users table (created_at, role check)")
+    if done['seeded']:
+        print(f"✅ Seeded {done['seeded']} scholarships")
+    if done['indexed']:
+        print(f"✅ Indexed {done['indexed']} scholarships for search")
+    print(f"✅ Database created successfully at {DATABASE}")
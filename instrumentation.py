@@ -0,0 +1,158 @@
+"""Opt-in request timing.
+
+Code wraps its hot paths in ``instruments.span('db')`` and friends. Each
+request collects its spans into a ``Server-Timing`` header, and every span
+and request duration feeds a histogram served at /metrics in Prometheus
+text format. When disabled, ``span()`` is a no-op and no hooks or routes
+are registered.
+
+Metrics are kept per process: with several gunicorn workers each scrape
+sees the worker that answered it.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from flask import Response, abort, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+# Seconds; roughly the Prometheus client defaults, plus finer steps below 5ms
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_disabled = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, help, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            snapshot = [(labels, list(s['counts']), s['sum']) for labels, s in sorted(self.series.items())]
+        for labels, counts, total in snapshot:
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            prefix = base + ',' if base else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+
+class Instrumentation:
+    """Spans, Server-Timing headers and a /metrics endpoint for one app."""
+
+    def __init__(self, app, enabled=False, token=None):
+        self.enabled = enabled
+        self.token = token
+        self.requests = Histogram(
+            'scholarpass_request_duration_seconds', 'Time from request start until the response is closed.',
+            ('endpoint', 'method', 'status')
+        )
+        self.stages = Histogram(
+            'scholarpass_stage_duration_seconds', 'Time spent in an instrumented stage.', ('stage',)
+        )
+        self.collectors = []
+        if enabled:
+            self._register(app)
+
+    # --- Spans ---
+    def span(self, name):
+        """Context manager timing one stage; a no-op while disabled."""
+        if not self.enabled:
+            return _disabled
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.stages.observe(seconds, name)
+        if has_request_context():
+            spans = g.setdefault('spans', {})
+            total, count = spans.get(name, (0.0, 0))
+            spans[name] = (total + seconds, count + 1)
+
+    # --- Flask hooks ---
+    def _register(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _start(self):
+        g.request_started = time.perf_counter()
+
+    def _finish(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        spans = g.get('spans', {})
+        timings = [
+            f'{name};dur={total * 1000:.2f}' + (f';desc="{count} calls"' if count > 1 else '')
+            for name, (total, count) in spans.items()
+        ]
+        timings.append(f'app;dur={(time.perf_counter() - started) * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        # Observed on close, so streamed bodies (recommendations) count in full
+        labels = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+        response.call_on_close(lambda: self.requests.observe(time.perf_counter() - started, *labels))
+        return response
+
+    def _render_started(self, sender, template, context, **extra):
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        stack = g.get('render_started')
+        if stack:
+            self.record('render', time.perf_counter() - stack.pop())
+
+    # --- Exposition ---
+    def add_collector(self, prefix, stats):
+        """Expose the numeric values of ``stats()`` as ``<prefix>_<key>`` gauges."""
+        self.collectors.append((prefix, stats))
+
+    def render(self):
+        lines = self.requests.render() + self.stages.render()
+        for prefix, stats in self.collectors:
+            for key, value in sorted(stats().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'# TYPE {prefix}_{key} gauge')
+                    lines.append(f'{prefix}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
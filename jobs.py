@@ -0,0 +1,310 @@
+"""Background jobs backed by the ``jobs`` table.
+
+Request handlers enqueue slow side effects instead of running them inline;
+worker threads in each web process (JOB_WORKERS) or a dedicated
+``flask --app app jobs work`` process claim and run them. Because jobs
+live in SQLite they survive restarts, and a job whose worker died is
+picked up again once its lease expires.
+
+Idempotency keys come in two flavours:
+
+- ``enqueue(..., key=k)``: at most one job per key, ever. Repeats are
+  ignored (e.g. one welcome email per account).
+- ``enqueue(..., key=k, replace=True)``: latest wins. A pending job gets
+  the new payload. A job that is running is re-run with the new payload
+  once it finishes, so work for one key never runs concurrently.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+
+import click
+from flask.cli import AppGroup
+
+jobs_cli = AppGroup('jobs', help='Inspect and run background jobs.')
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+INSERT_SQL = (
+    "INSERT INTO jobs (kind, payload, idempotency_key, max_attempts, run_at, created_at) "
+    "VALUES (:kind, :payload, :key, :max_attempts, :run_at, :now) "
+)
+ON_CONFLICT_IGNORE = "ON CONFLICT(idempotency_key) DO NOTHING"
+# SET expressions all see the old row, so status is tested before it changes
+ON_CONFLICT_REPLACE = """
+    ON CONFLICT(idempotency_key) DO UPDATE SET
+        payload = excluded.payload,
+        max_attempts = excluded.max_attempts,
+        run_at = excluded.run_at,
+        rerun = status = 'running',
+        attempts = CASE WHEN status = 'running' THEN attempts ELSE 0 END,
+        status = CASE WHEN status = 'running' THEN 'running' ELSE 'queued' END,
+        last_error = NULL
+"""
+
+
+class JobQueue:
+    """Durable job queue with retries, leases and idempotency keys.
+
+    ``connect`` returns a pooled connection of the queue's own, never one
+    shared with handlers (the app passes db_pool.acquire, whose release
+    rolls back anything left open). ``run_blocking(fn, *args)``
+    runs database and handler work; the app passes offload.run so gevent
+    workers keep the event loop free.
+    """
+
+    def __init__(self, connect, workers=2, poll_interval=1.0, lease=300, retention=7 * 24 * 3600,
+                 run_blocking=None):
+        self.connect = connect
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retention = retention
+        self.run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+        self.handlers = {}
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.pid = None
+        self.last_sweep = 0.0
+        self.counters = {'enqueued': 0, 'duplicates': 0, 'succeeded': 0, 'retried': 0, 'exhausted': 0}
+
+    def handler(self, kind):
+        """Register the function that runs jobs of ``kind``; it gets the payload dict."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    # --- Producing ---
+    def enqueue(self, kind, payload, key=None, replace=False, delay=0, max_attempts=5, conn=None):
+        """Queue a job; returns False if an existing job with ``key`` made it a no-op.
+
+        Pass ``conn`` to enqueue inside the caller's transaction (the caller
+        commits), so the job exists exactly when the caller's write does.
+        """
+        now = time.time()
+        params = {
+            'kind': kind, 'payload': json.dumps(payload), 'key': key,
+            'max_attempts': max_attempts, 'run_at': now + delay, 'now': now
+        }
+        sql = INSERT_SQL + (ON_CONFLICT_REPLACE if replace else ON_CONFLICT_IGNORE)
+        own = conn is None
+        if own:
+            conn = self.connect()
+        try:
+            added = conn.execute(sql, params).rowcount > 0
+            if own:
+                conn.commit()
+        finally:
+            if own:
+                conn.close()
+        with self.lock:
+            self.counters['enqueued' if added else 'duplicates'] += 1
+        self.wakeup.set()
+        return added
+
+    # --- Consuming ---
+    def claim(self, worker):
+        """Lease the next due job to ``worker``; returns (id, kind, payload) or None."""
+        now = time.time()
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker died mid-run go back to the queue
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', locked_by = NULL WHERE status = 'running' AND locked_at < ?",
+                (now - self.lease,)
+            )
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = 'queued' AND run_at <= ? "
+                "ORDER BY run_at, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', locked_by = ?, locked_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now, row[0])
+                )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return tuple(row) if row is not None else None
+
+    def complete(self, job_id, worker):
+        conn = self.connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN rerun THEN 'queued' ELSE 'done' END, "
+                "attempts = CASE WHEN rerun THEN 0 ELSE attempts END, rerun = 0, "
+                "locked_by = NULL, finished_at = ? WHERE id = ? AND locked_by = ?",
+                (time.time(), job_id, worker)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fail(self, job_id, worker, error):
+        """Schedule a retry with exponential backoff, or give up after max_attempts."""
+        now = time.time()
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, rerun FROM jobs WHERE id = ? AND locked_by = ?", (job_id, worker)
+            ).fetchone()
+            if row is None:
+                return None  # lease expired and someone else owns it now
+            attempts, max_attempts, rerun = row
+            if rerun:
+                status, attempts, run_at = 'queued', 0, now  # fresh payload, fresh attempts
+            elif attempts < max_attempts:
+                status, run_at = 'queued', now + min(2 ** attempts, 600)
+            else:
+                status, run_at = 'failed', now
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, run_at = ?, rerun = 0, locked_by = NULL, "
+                "last_error = ?, finished_at = ? WHERE id = ?",
+                (status, attempts, run_at, error[-4000:], now if status == 'failed' else None, job_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return status
+
+    def run_one(self, worker):
+        """Claim and run a single job; returns False when nothing was due."""
+        job = self.run_blocking(self.claim, worker)
+        if job is None:
+            return False
+        job_id, kind, payload = job
+        handler = self.handlers.get(kind)
+        try:
+            if handler is None:
+                raise LookupError(f'no handler registered for job kind {kind!r}')
+            self.run_blocking(handler, json.loads(payload))
+        except Exception:
+            status = self.run_blocking(self.fail, job_id, worker, traceback.format_exc())
+            with self.lock:
+                self.counters['exhausted' if status == 'failed' else 'retried'] += 1
+        else:
+            self.run_blocking(self.complete, job_id, worker)
+            with self.lock:
+                self.counters['succeeded'] += 1
+        return True
+
+    def work(self, worker, stop=None):
+        """Process jobs until ``stop`` is set, sleeping when the queue is empty."""
+        while stop is None or not stop.is_set():
+            try:
+                if self.run_one(worker):
+                    continue
+                self.maybe_purge()
+            except Exception:
+                traceback.print_exc()  # e.g. database locked; try again after a pause
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def ensure_started(self):
+        """Start this process's worker threads (again after a fork).
+
+        Called per request rather than at import, so CLI commands that only
+        enqueue never run jobs in a process that is about to exit.
+        """
+        if not self.workers or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        for n in range(self.workers):
+            worker = f'{socket.gethostname()}:{os.getpid()}:{n}'
+            threading.Thread(target=self.work, args=(worker,), name=f'jobs-{n}', daemon=True).start()
+
+    # --- Maintenance & metrics ---
+    def maybe_purge(self):
+        """Drop finished un-keyed jobs past the retention period, at most hourly."""
+        now = time.time()
+        if now - self.last_sweep < 3600:
+            return
+        self.last_sweep = now
+        conn = self.connect()
+        try:
+            conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND idempotency_key IS NULL AND finished_at < ?",
+                (now - self.retention,)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def depth(self):
+        """Jobs per status plus the age of the oldest due job, from the table."""
+        conn = self.connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(run_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        finally:
+            conn.close()
+        result = {status: counts.get(status, 0) for status in STATUSES}
+        result['oldest_queued_age_seconds'] = max(0.0, time.time() - oldest) if oldest else 0.0
+        return result
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(self.run_blocking(self.depth), **counters)
+
+
+# --- CLI ---
+# No app context: handlers then get their own pooled connections, exactly as
+# in the web workers' job threads, instead of one shared g.db that a failed
+# handler would leave mid-transaction
+@jobs_cli.command('work', with_appcontext=False)
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+def work_command(once):
+    """Run jobs in the foreground (a dedicated worker process)."""
+    from app import create_app, jobs
+
+    create_app()  # handlers score with the matcher
+
+    worker = f'{socket.gethostname()}:{os.getpid()}:cli'
+    if once:
+        count = 0
+        while jobs.run_one(worker):
+            count += 1
+        click.echo(f'Ran {count} jobs')
+        return
+    click.echo(f'Worker {worker} waiting for jobs (Ctrl+C to stop)')
+    jobs.work(worker)
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Show queue depth per status."""
+    from app import jobs
+
+    for key, value in jobs.depth().items():
+        click.echo(f'{key:<26} {value:.1f}' if isinstance(value, float) else f'{key:<26} {value}')
+
+
+@jobs_cli.command('retry-failed')
+@click.option('--kind', help='Only jobs of this kind.')
+def retry_failed_command(kind):
+    """Re-queue jobs that used up their attempts."""
+    from app import get_db_connection
+
+    conn = get_db_connection()
+    retried = conn.execute(
+        "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, last_error = NULL "
+        "WHERE status = 'failed'" + (" AND kind = ?" if kind else ""),
+        (time.time(), kind) if kind else (time.time(),)
+    ).rowcount
+    conn.commit()
+    conn.close()
+    click.echo(f'Re-queued {retried} jobs')
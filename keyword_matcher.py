@@ -0,0 +1,201 @@
+"""Keyword matching for free-text answers with an Aho-Corasick automaton.
+
+MatchIndex compares an answer with every keyword of its criterion, which
+is fine for the questionnaire's button values but not for free text
+("I play varsity basketball and paint") against a large keyword
+vocabulary. AutomatonMatcher compiles every keyword of a criterion (and
+its synonyms, and optionally common typos) into one automaton, so a
+single pass over the answer finds every keyword it mentions, however many
+keywords there are.
+
+Free text is normalized first (lowercase, accents and punctuation
+stripped) and keywords only match whole words or phrases, so "no" does
+not fire inside "not". The fixed button values of QUESTION_OPTIONS keep
+MatchIndex's either-contains-the-other rule, precomputed at reload, so
+questionnaire results are identical to the other engines.
+"""
+import re
+import unicodedata
+from array import array
+from collections import namedtuple
+
+from matcher import QUESTION_OPTIONS, IndexState, MatchIndex, index_catalog
+
+# Extra ways students write catalog keywords; matched as the keyword itself
+SYNONYMS = {
+    'arts': ('art', 'paint', 'painting', 'drawing', 'music', 'dance', 'theater', 'theatre', 'singing', 'choir'),
+    'sports': ('sport', 'athlete', 'athletics', 'varsity', 'basketball', 'volleyball', 'football', 'swimming'),
+    'volunteer': ('volunteering', 'community service', 'outreach'),
+    'work': ('working student', 'part time job', 'part-time job'),
+    'need': ('financial aid', 'low income', 'financial assistance'),
+    'dlsu': ('de la salle', 'la salle', 'de la salle university'),
+    'ust': ('santo tomas', 'university of santo tomas'),
+    'ateneo': ('admu', 'ateneo de manila', 'ateneo de manila university'),
+    'mapua': ('mapua university', 'mapua institute of technology'),
+    'science': ('science high school', 'pisay', 'philippine science high school'),
+    'excellent': ('with honors', 'with high honors', 'honor student'),
+}
+
+# Characters left after normalize(), numbered for the transition table
+ALPHABET = ' abcdefghijklmnopqrstuvwxyz0123456789'
+SYMBOLS = {ch: n for n, ch in enumerate(ALPHABET)}
+RADIX = len(ALPHABET)
+
+# Keywords shorter than this get no typo variants; short words collide too easily
+TYPO_MIN_LENGTH = 5
+
+# The index plus the automata and button lookups compiled from the same catalog
+AutomatonState = namedtuple('AutomatonState', IndexState._fields + ('automata', 'options'))
+
+
+def normalize(text):
+    """Lowercase ASCII words separated by single spaces."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def typo_variants(word):
+    """Single deletions and adjacent transpositions of ``word``."""
+    variants = set()
+    for i in range(len(word)):
+        variants.add(word[:i] + word[i + 1:])
+        if i + 1 < len(word) and word[i] != word[i + 1]:
+            variants.add(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+    variants.discard(word)
+    return {v for v in variants if v and v == v.strip() and '  ' not in v}
+
+
+class Automaton:
+    """Aho-Corasick automaton mapping patterns to output values.
+
+    Patterns and text are normalized (ALPHABET only). Transitions live in one
+    flat dict keyed by ``state * RADIX + symbol`` and failure links in an
+    array, which takes less than half the memory of a dict per state on
+    vocabularies of hundreds of thousands of keywords.
+    """
+
+    def __init__(self):
+        self.goto = {}
+        self.fail = array('l', [0])
+        self.out = {}
+        # Only needed until build(): the tree structure for the breadth-first pass
+        self.parent = array('l', [0])
+        self.symbol = array('b', [0])
+        self.depth = array('l', [0])
+
+    def add(self, pattern, value):
+        goto = self.goto
+        state = 0
+        for ch in pattern:
+            key = state * RADIX + SYMBOLS[ch]
+            nxt = goto.get(key)
+            if nxt is None:
+                nxt = goto[key] = len(self.fail)
+                self.fail.append(0)
+                self.parent.append(state)
+                self.symbol.append(SYMBOLS[ch])
+                self.depth.append(self.depth[state] + 1)
+            state = nxt
+        outputs = self.out.get(state, ())
+        if value not in outputs:
+            self.out[state] = outputs + (value,)
+
+    def build(self):
+        """Compute failure links breadth-first; call once after every add()."""
+        goto, fail, out = self.goto, self.fail, self.out
+        by_depth = sorted(range(1, len(fail)), key=self.depth.__getitem__)
+        for state in by_depth:
+            parent, symbol = self.parent[state], self.symbol[state]
+            if parent:
+                f = fail[parent]
+                while f and f * RADIX + symbol not in goto:
+                    f = fail[f]
+                fail[state] = goto.get(f * RADIX + symbol, 0)
+            # A state also emits everything its longest proper suffix emits
+            inherited = out.get(fail[state])
+            if inherited:
+                own = out.get(state, ())
+                out[state] = own + tuple(v for v in inherited if v not in own)
+        del self.parent, self.symbol, self.depth
+        return self
+
+    def find(self, text):
+        """Every output value whose pattern occurs in normalized ``text``, in one pass."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        state = 0
+        for ch in text:
+            symbol = SYMBOLS[ch]
+            while state and state * RADIX + symbol not in goto:
+                state = fail[state]
+            state = goto.get(state * RADIX + symbol, 0)
+            if state in out:
+                found.update(out[state])
+        return found
+
+
+def compile_keywords(keywords, synonyms=None, typos=False):
+    """Automaton emitting the catalog keyword for each whole-word mention.
+
+    Patterns are padded with spaces and so is the text being searched,
+    which limits matches to word boundaries.
+    """
+    synonyms = synonyms or {}
+    patterns = {}
+    for keyword in keywords:
+        for form in (keyword, *synonyms.get(keyword, ())):
+            phrase = normalize(form)
+            if phrase:
+                patterns.setdefault(phrase, set()).add(keyword)
+    if typos:
+        exact = set(patterns)
+        for phrase, targets in list(patterns.items()):
+            if len(phrase) < TYPO_MIN_LENGTH:
+                continue
+            for variant in typo_variants(phrase):
+                # A real keyword or synonym always wins over a typo reading
+                if variant not in exact:
+                    patterns.setdefault(variant, set()).update(targets)
+
+    automaton = Automaton()
+    for phrase, targets in patterns.items():
+        for keyword in targets:
+            automaton.add(f' {phrase} ', keyword)
+    return automaton.build()
+
+
+class AutomatonMatcher(MatchIndex):
+    """MatchIndex whose keyword lookup is one automaton pass per answer."""
+
+    def __init__(self, scholarships, synonyms=SYNONYMS, typos=False):
+        self.synonyms = synonyms
+        self.typos = typos
+        super().__init__(scholarships)
+
+    def reload(self, scholarships):
+        """Rebuild the index and recompile the automata (call whenever the catalog changes)."""
+        scholarships = list(scholarships)
+        vocab = {}
+        for s in scholarships:
+            for key, keywords in s["criteria"].items():
+                vocab.setdefault(key, set()).update(keywords)
+        automata = {key: compile_keywords(keywords, self.synonyms, self.typos) for key, keywords in vocab.items()}
+        # Button values keep the substring rule the other engines use
+        options = {
+            key: {
+                value: [keyword for keyword in vocab.get(key, ()) if keyword in value or value in keyword]
+                for value in values
+            }
+            for key, values in QUESTION_OPTIONS.items()
+        }
+        self.state = AutomatonState(*index_catalog(scholarships), automata, options)
+
+    def matching_keywords(self, state, key, user_value, by_keyword):
+        fixed = state.options.get(key, {}).get(user_value)
+        if fixed is not None:
+            return fixed
+        automaton = state.automata.get(key)
+        if automaton is None:
+            return ()
+        return automaton.find(f' {normalize(user_value)} ')
@@ -0,0 +1,115 @@
+"""In-process stand-in for a Redis server.
+
+LocalRedis implements the small subset of the redis-py client API used by
+ScholarPass (strings with expiry, counters and sets), so code written
+against it can be pointed at a real ``redis.Redis`` client unchanged.
+"""
+import threading
+import time
+
+
+# Writes between full sweeps of expired keys
+SWEEP_EVERY = 1000
+
+
+class LocalRedis:
+    """Thread-safe dict with Redis-style TTLs.
+
+    Expired keys vanish when read, and every SWEEP_EVERY writes all expired
+    keys are dropped, so keys that are written once and never read again
+    (rate-limit buckets for one-off IPs) do not pile up.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.RLock()
+        self.writes = 0
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _wrote(self):
+        self.writes += 1
+        if self.writes % SWEEP_EVERY == 0:
+            now = time.monotonic()
+            for key in [k for k, deadline in self.expires.items() if deadline <= now]:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+
+    # --- strings ---
+    def get(self, key):
+        with self.lock:
+            return self.data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if ex is not None:
+                self.expires[key] = time.monotonic() + ex
+            self._wrote()
+            return True
+
+    def setex(self, key, seconds, value):
+        return self.set(key, value, ex=seconds)
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            value = int(self.data[key]) + amount if self._alive(key) else amount
+            self.data[key] = value
+            return value
+
+    # --- keys ---
+    def delete(self, *keys):
+        with self.lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return removed
+
+    def expire(self, key, seconds):
+        with self.lock:
+            if not self._alive(key):
+                return False
+            self.expires[key] = time.monotonic() + seconds
+            return True
+
+    def ttl(self, key):
+        with self.lock:
+            if not self._alive(key):
+                return -2
+            deadline = self.expires.get(key)
+            return -1 if deadline is None else max(0, int(deadline - time.monotonic()))
+
+    def dbsize(self):
+        with self.lock:
+            return sum(1 for key in list(self.data) if self._alive(key))
+
+    # --- sets ---
+    def sadd(self, key, *members):
+        with self.lock:
+            current = self.data[key] if self._alive(key) else set()
+            added = len(set(members) - current)
+            self.data[key] = current | set(members)
+            return added
+
+    def srem(self, key, *members):
+        with self.lock:
+            if not self._alive(key):
+                return 0
+            current = self.data[key]
+            removed = len(current & set(members))
+            self.data[key] = current - set(members)
+            return removed
+
+    def smembers(self, key):
+        with self.lock:
+            return set(self.data[key]) if self._alive(key) else set()
@@ -0,0 +1,249 @@
+"""Scholarship matching engine.
+
+The catalog is compiled once into an inverted index so that scoring a
+questionnaire submission only touches scholarships that share a keyword
+with the student's answers.
+"""
+from collections import namedtuple
+
+# Questionnaire fields, in the order recommend() collects them
+ANSWER_KEYS = ('school_type', 'average', 'financial_need', 'talent', 'university')
+
+# Normalized button values offered by questions.html
+QUESTION_OPTIONS = {
+    'school_type': ('science', 'public', 'private'),
+    'average': ('95', '90', '85', 'below85'),
+    'financial_need': ('yes', 'no'),
+    'talent': ('sports', 'arts', 'none'),
+    'university': ('ateneo', 'dlsu', 'ust', 'mapua')
+}
+
+# Answers that earn the bonus points awarded on top of keyword matches
+NEED_BONUS_ANSWER = "yes"
+AVERAGE_BONUS_ANSWERS = ("95", "90")
+
+
+class IndexState(namedtuple('IndexState', 'scholarships postings need_bonus average_bonus')):
+    """One compiled catalog; replaced whole on reload, never modified."""
+    __slots__ = ()
+
+
+def index_catalog(scholarships):
+    """Compile a catalog into an IndexState."""
+    scholarships = list(scholarships)
+    postings = {}
+    need_bonus = set()
+    average_bonus = set()
+
+    for sid, s in enumerate(scholarships):
+        for key, keywords in s["criteria"].items():
+            weight = s["weight"].get(key, 1)
+            by_keyword = postings.setdefault(key, {})
+            for keyword in keywords:
+                by_keyword.setdefault(keyword, []).append((sid, weight))
+
+        if "need" in s["criteria"].get("financial_need", []):
+            need_bonus.add(sid)
+        if "average" in s["criteria"]:
+            average_bonus.add(sid)
+
+    return IndexState(scholarships, postings, frozenset(need_bonus), frozenset(average_bonus))
+
+
+class MatchIndex:
+    """Inverted index over the scholarship catalog.
+
+    ``state.postings`` maps criterion key -> keyword -> list of
+    ``(scholarship_id, weight)`` pairs, where the scholarship id is the
+    position of the scholarship in ``state.scholarships``.
+    """
+
+    def __init__(self, scholarships):
+        self.reload(scholarships)
+
+    def reload(self, scholarships):
+        """Rebuild the index from a new catalog (call whenever it changes)."""
+        # One assignment, so a concurrent score() sees the old catalog or the new one, never a mix
+        self.state = index_catalog(scholarships)
+
+    def score(self, answers, limit=None):
+        """Score answers against the catalog, best matches first."""
+        state = self.state
+        scores = {}
+        matched = {}
+
+        for key, user_value in answers.items():
+            if not user_value:
+                continue
+
+            # A scholarship scores each criterion once, however many of its keywords match
+            seen = set()
+            by_keyword = state.postings.get(key, {})
+            for keyword in self.matching_keywords(state, key, user_value, by_keyword):
+                for sid, weight in by_keyword.get(keyword, ()):
+                    if sid in seen:
+                        continue
+                    seen.add(sid)
+                    scores[sid] = scores.get(sid, 0) + weight
+                    matched.setdefault(sid, []).append(key)
+
+        # Bonus scoring
+        if answers.get('financial_need') == NEED_BONUS_ANSWER:
+            for sid in state.need_bonus:
+                scores[sid] = scores.get(sid, 0) + 1
+        if answers.get('average') in AVERAGE_BONUS_ANSWERS:
+            for sid in state.average_bonus:
+                scores[sid] = scores.get(sid, 0) + 1
+
+        results = []
+        for sid in sorted(scores):
+            if scores[sid] > 0:
+                results.append(build_result(state.scholarships[sid], scores[sid], matched.get(sid, [])))
+
+        results.sort(key=lambda x: x["score"], reverse=True)
+        return results if limit is None else results[:limit]
+
+    def matching_keywords(self, state, key, user_value, by_keyword):
+        """Keywords of criterion ``key`` hit by an answer: either contains the other."""
+        return [keyword for keyword in by_keyword if keyword in user_value or user_value in keyword]
+
+
+def build_result(scholarship, score, matched_criteria):
+    """Shape a scored scholarship the way the results page expects it."""
+    return {
+        "id": scholarship.get("id"),
+        "name": scholarship["name"],
+        "university": scholarship["university"],
+        "description": scholarship["description"],
+        "tags": scholarship["tags"],
+        "score": score,
+        "matched": ", ".join(set(matched_criteria))
+    }
+
+
+# --- SQL-backed matcher ---
+
+# Walks the distinct keywords of one criterion key with index seeks (a loose
+# index scan), so the cost grows with the keyword vocabulary rather than with
+# the number of scholarships.
+KEYWORD_SCAN_SQL = """
+    WITH RECURSIVE vocab(keyword) AS (
+        SELECT MIN(keyword) FROM scholarship_criteria WHERE criterion_key = :key
+        UNION ALL
+        SELECT (SELECT MIN(keyword) FROM scholarship_criteria
+                WHERE criterion_key = :key AND keyword > vocab.keyword)
+        FROM vocab WHERE vocab.keyword IS NOT NULL
+    )
+    SELECT keyword FROM vocab
+    WHERE keyword IS NOT NULL
+      AND (instr(:value, keyword) > 0 OR instr(keyword, :value) > 0)
+"""
+
+# Weights are summed and ranked on scholarship ids alone; names, descriptions
+# and tags are only joined in for the rows that are actually returned.
+SCORE_SQL = """
+    WITH hits AS (
+        SELECT {distinct} scholarship_id, criterion_key, weight
+        FROM scholarship_criteria
+        WHERE {match}
+    ),
+    bonus AS (
+        SELECT DISTINCT scholarship_id FROM scholarship_criteria
+        WHERE :need_bonus AND criterion_key = 'financial_need' AND keyword = 'need'
+        UNION ALL
+        SELECT DISTINCT scholarship_id FROM scholarship_criteria
+        WHERE :average_bonus AND criterion_key = 'average'
+    ),
+    points AS (
+        SELECT scholarship_id, weight AS points, criterion_key FROM hits
+        UNION ALL
+        SELECT scholarship_id, 1, NULL FROM bonus
+    ),
+    ranked AS (
+        SELECT scholarship_id, SUM(points) AS score, group_concat(criterion_key) AS matched
+        FROM points
+        GROUP BY scholarship_id
+        HAVING score > 0
+        ORDER BY score DESC, scholarship_id
+        LIMIT :limit
+    )
+    SELECT s.id, s.name, s.university, s.description, r.score, r.matched,
+           (SELECT group_concat(tag, char(31)) FROM (
+                SELECT tag FROM scholarship_tags t WHERE t.scholarship_id = s.id ORDER BY t.position
+           )) AS tags
+    FROM ranked r JOIN scholarships s ON s.id = r.scholarship_id
+    ORDER BY r.score DESC, s.id
+"""
+
+
+class SqlMatcher:
+    """Scores answers with indexed queries against the catalog tables.
+
+    Candidates are pulled through ``idx_criteria_key_keyword`` and weights
+    are summed in SQL, so only scholarships sharing a keyword are read.
+
+    Cost grows with the number of matching scholarships, not the catalog
+    size. The sub-10 ms target at 50k scholarships holds only for selective
+    answers (about 4 ms for a top-10 page). Broad answers that match most of
+    the catalog group every matching row: about 90 ms for a top-10 page,
+    and about 470 ms for the full list recommend() and the API ask for.
+    Any exact scoring has that floor; the in-memory index takes about
+    180 ms. The CachedMatcher in front keeps the questionnaire's fixed
+    combinations under a millisecond after their first request (or at
+    startup with RECOMMEND_CACHE_WARM). Free-text API answers pay the full
+    cost once per distinct answer set.
+    """
+
+    def __init__(self, connect):
+        self.connect = connect
+
+    def reload(self, scholarships=None):
+        """Nothing to rebuild: every query reads the live tables."""
+
+    def score(self, answers, limit=None):
+        """Score answers against the catalog, best matches first."""
+        conn = self.connect()
+        try:
+            return score_in_db(conn, answers, limit)
+        finally:
+            conn.close()
+
+
+def score_in_db(conn, answers, limit=None):
+    """Run the indexed candidate lookup and SQL aggregation on ``conn``."""
+    clauses = []
+    params = {
+        "need_bonus": answers.get('financial_need') == NEED_BONUS_ANSWER,
+        "average_bonus": answers.get('average') in AVERAGE_BONUS_ANSWERS,
+        "limit": -1 if limit is None else limit
+    }
+    # (scholarship, key, keyword) is the primary key, so rows only need
+    # de-duplicating when one answer hit several keywords of the same key
+    distinct = False
+
+    for n, (key, user_value) in enumerate(answers.items()):
+        if not user_value:
+            continue
+        keywords = [row[0] for row in conn.execute(KEYWORD_SCAN_SQL, {"key": key, "value": user_value})]
+        if not keywords:
+            continue
+        distinct = distinct or len(keywords) > 1
+        params[f"k{n}"] = key
+        placeholders = []
+        for i, keyword in enumerate(keywords):
+            params[f"k{n}_{i}"] = keyword
+            placeholders.append(f":k{n}_{i}")
+        clauses.append(f"(criterion_key = :k{n} AND keyword IN ({', '.join(placeholders)}))")
+
+    sql = SCORE_SQL.format(distinct="DISTINCT" if distinct else "", match=" OR ".join(clauses) or "0")
+    results = []
+    for sid, name, university, description, score, matched, tags in conn.execute(sql, params):
+        scholarship = {
+            "id": sid,
+            "name": name,
+            "university": university,
+            "description": description,
+            "tags": tags.split("\x1f") if tags else []
+        }
+        results.append(build_result(scholarship, score, matched.split(",") if matched else []))
+    return results
@@ -0,0 +1,60 @@
+"""Blocking work under evented (gevent) workers.
+
+SQLite and CPU-bound code never yield to the gevent hub, so one slow query
+or password hash would stall every connection the worker holds. Under
+gevent these calls are pushed onto native OS threads while the request's
+greenlet waits; under sync or threaded workers they simply run inline.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def evented():
+    """True inside a worker whose socket module gevent has monkey-patched."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def native_executor(max_workers, thread_name_prefix=''):
+    """ThreadPoolExecutor backed by real threads even when threading is patched."""
+    if evented():
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+class Offloader:
+    """Runs blocking calls on a native thread pool when the worker is evented."""
+
+    def __init__(self, workers=16):
+        self.workers = workers
+        self.executor = None
+        self.pid = None
+
+    def run(self, fn, *args, **kwargs):
+        if not evented():
+            return fn(*args, **kwargs)
+        if self.pid != os.getpid():
+            # Created lazily in each worker: threads do not survive a fork
+            self.executor = native_executor(self.workers, 'offload')
+            self.pid = os.getpid()
+        return self.executor.submit(fn, *args, **kwargs).result()
+
+
+def native_ident():
+    """Id of the current OS thread (threading.get_ident() is per greenlet under gevent)."""
+    if evented():
+        from gevent.monkey import get_original
+        return get_original('_thread', 'get_ident')()
+    return threading.get_ident()
+
+
+def start_native_thread(target):
+    """Run ``target`` on a new OS thread, even under gevent; returns nothing."""
+    if evented():
+        from gevent.monkey import get_original
+        get_original('_thread', 'start_new_thread')(target, ())
+    else:
+        threading.Thread(target=target, daemon=True).start()
@@ -0,0 +1,156 @@
+"""Render-once cache for the mostly static pages.
+
+The marketing pages only vary on a couple of ``inject_user()`` values (for
+example ``logged_in`` and ``user_name``), so each template is rendered once
+per combination of the variables it actually references and the bytes are
+reused. Anonymous visitors without a session cookie never reach Jinja.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, render_template
+from jinja2 import nodes
+
+# Names whose value changes per request in ways the key cannot capture
+UNCACHEABLE_NAMES = frozenset(('request', 'session', 'g', 'get_flashed_messages', 'csrf_token'))
+
+
+class PageCache:
+    """Size-bounded LRU of rendered templates, keyed on template + context.
+
+    ``context`` returns the per-request template variables (the app's
+    context processor); only the ones a template references end up in its
+    key. Entries are dropped when a template file's mtime changes.
+    """
+
+    def __init__(self, app, context, maxbytes=8 * 1024 * 1024, check_interval=1.0):
+        self.app = app
+        self.context = context
+        self.maxbytes = maxbytes
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.templates = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Template analysis ---
+    def _inspect(self, name):
+        """Context names a template (and its includes) reads, plus its files' mtimes."""
+        env = self.app.jinja_env
+        names, files, pending, seen = set(), {}, [name], set()
+        cacheable = True
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            source, filename, _ = env.loader.get_source(env, current)
+            files[filename] = os.path.getmtime(filename)
+            tree = env.parse(source)
+            names.update(node.name for node in tree.find_all(nodes.Name) if node.ctx == 'load')
+            for node in tree.find_all((nodes.Extends, nodes.Include, nodes.Import, nodes.FromImport)):
+                if isinstance(node.template, nodes.Const) and isinstance(node.template.value, str):
+                    pending.append(node.template.value)
+                else:
+                    cacheable = False  # dynamic include: cannot know what it reads
+        if names & UNCACHEABLE_NAMES:
+            cacheable = False
+        return {
+            'keys': tuple(sorted(names)),
+            'files': files,
+            'cacheable': cacheable,
+            'checked': time.monotonic()
+        }
+
+    def _template(self, name):
+        """Analysis for ``name``, re-done (and entries dropped) when a file changed."""
+        now = time.monotonic()
+        info = self.templates.get(name)
+        if info is not None and now - info['checked'] < self.check_interval:
+            return info
+        if info is not None:
+            try:
+                changed = any(os.path.getmtime(f) != m for f, m in info['files'].items())
+            except OSError:
+                changed = True
+            if not changed:
+                info['checked'] = now
+                return info
+            self.invalidate(name)
+        info = self.templates[name] = self._inspect(name)
+        return info
+
+    # --- Rendering ---
+    def render(self, name):
+        """Response for template ``name``, rendered at most once per context."""
+        info = self._template(name)
+        if not info['cacheable'] or not self.maxbytes:
+            self.bypassed += 1
+            return Response(render_template(name), mimetype='text/html')
+
+        context = self.context()
+        key = (name,) + tuple((k, context[k]) for k in info['keys'] if k in context)
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        hit = body is not None
+        if not hit:
+            body = render_template(name).encode('utf-8')
+            self._store(key, body)
+
+        response = Response(body, mimetype='text/html')
+        response.headers['X-Page-Cache'] = 'hit' if hit else 'miss'
+        return response
+
+    def _store(self, key, body):
+        with self.lock:
+            self.misses += 1
+            if len(body) > self.maxbytes:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.maxbytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    # --- Maintenance ---
+    def invalidate(self, name=None):
+        """Drop cached pages for one template, or all of them."""
+        with self.lock:
+            doomed = [key for key in self.entries if name is None or key[0] == name]
+            for key in doomed:
+                self.size -= len(self.entries.pop(key))
+            self.invalidations += len(doomed)
+            if name is None:
+                self.templates.clear()
+            else:
+                self.templates.pop(name, None)
+            return len(doomed)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'maxbytes': self.maxbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,195 @@
+"""On-demand profiles of production requests.
+
+Requests to selected endpoints run under cProfile when they carry the
+``X-Profile`` header with the configured token, or when picked by the
+sampling rate. Profiling lasts until the response is closed, so streamed
+pages include their scoring and rendering. Each capture writes:
+
+- ``<id>.pstats``: cProfile stats (``python -m pstats``, snakeviz).
+- ``<id>.collapsed``: sampled stacks in collapsed format for flamegraph.pl
+  or speedscope.
+- ``<id>.json``: what was profiled and how long it took.
+
+Only the newest ``keep`` captures are kept. Admins can list and download
+them from /admin/profiles.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import abort, g, jsonify, request, send_from_directory
+
+from offload import native_ident, start_native_thread
+
+HEADER = 'X-Profile'
+SUFFIXES = ('.pstats', '.collapsed', '.json')
+
+
+class StackSampler:
+    """Counts the stacks of one OS thread every ``interval`` seconds."""
+
+    def __init__(self, ident, interval=0.001):
+        self.ident = ident
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.stopped = False
+
+    def start(self):
+        start_native_thread(self._run)
+        return self
+
+    def _run(self):
+        while not self.stopped:
+            frame = sys._current_frames().get(self.ident)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                with self.lock:
+                    self.counts[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.stopped = True
+        with self.lock:
+            return Counter(self.counts)
+
+
+class RequestProfiler:
+    """Profiles sampled or explicitly requested requests for one app."""
+
+    def __init__(self, app, directory='profiles', sample_rate=0.0, token=None, keep=50,
+                 endpoints=('recommend', 'login', 'api_recommendations'), authorize=None, interval=0.001):
+        self.directory = os.path.abspath(directory)
+        self.sample_rate = sample_rate
+        self.token = token
+        self.keep = keep
+        self.endpoints = frozenset(endpoints)
+        self.authorize = authorize or (lambda: False)
+        self.interval = interval
+        self.enabled = sample_rate > 0 or bool(token)
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            app.before_request(self._start)
+            app.after_request(self._finish)
+            app.teardown_request(self._abandon)
+        # Listing stays available so old captures can be fetched after disabling
+        app.add_url_rule('/admin/profiles', 'list_profiles', self.list_view)
+        app.add_url_rule('/admin/profiles/<path:filename>', 'download_profile', self.download_view)
+
+    # --- Capturing ---
+    def _trigger(self):
+        """'header' or 'sample' if this request should be profiled, else None."""
+        if request.endpoint not in self.endpoints:
+            return None
+        supplied = request.headers.get(HEADER)
+        if self.token and supplied and hmac.compare_digest(supplied, self.token):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _start(self):
+        trigger = self._trigger()
+        if trigger is None:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return  # another profiler is already active on this thread
+        g.profile_capture = {
+            'profile': profile,
+            'sampler': StackSampler(native_ident(), self.interval).start(),
+            'started': time.perf_counter(),
+            'trigger': trigger,
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{uuid.uuid4().hex[:8]}"
+        }
+
+    def _finish(self, response):
+        capture = g.pop('profile_capture', None)
+        if capture is None:
+            return response
+        meta = {
+            'id': capture['id'],
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'trigger': capture['trigger'],
+            'created': time.time()
+        }
+        response.headers['X-Profile-Id'] = capture['id']
+        response.call_on_close(lambda: self._save(capture, meta))
+        return response
+
+    def _abandon(self, exception=None):
+        # after_request never ran (unhandled error): stop profiling this thread
+        capture = g.pop('profile_capture', None)
+        if capture is not None:
+            capture['profile'].disable()
+            capture['sampler'].stop()
+
+    def _save(self, capture, meta):
+        capture['profile'].disable()
+        stacks = capture['sampler'].stop()
+        meta['duration_ms'] = round((time.perf_counter() - capture['started']) * 1000, 3)
+        meta['samples'] = sum(stacks.values())
+
+        base = os.path.join(self.directory, capture['id'])
+        capture['profile'].dump_stats(base + '.pstats')
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(base + '.json', 'w') as f:
+            json.dump(meta, f)
+        self._rotate()
+
+    def _rotate(self):
+        captures = self.captures()
+        for meta in captures[self.keep:]:
+            for suffix in SUFFIXES:
+                try:
+                    os.remove(os.path.join(self.directory, meta['id'] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    # --- Admin endpoints ---
+    def captures(self):
+        """Metadata of stored captures, newest first."""
+        found = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return found
+        for name in names:
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        found.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(found, key=lambda meta: meta['created'], reverse=True)
+
+    def list_view(self):
+        if not self.authorize():
+            abort(404)
+        return jsonify(profiles=[
+            dict(meta, files=[f'/admin/profiles/{meta["id"]}{suffix}' for suffix in SUFFIXES[:2]])
+            for meta in self.captures()
+        ])
+
+    def download_view(self, filename):
+        if not self.authorize() or not filename.endswith(SUFFIXES):
+            abort(404)
+        return send_from_directory(self.directory, filename, as_attachment=True)
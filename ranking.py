@@ -0,0 +1,248 @@
+"""Learned ranking of recommendation candidates.
+
+The rule matchers decide *which* scholarships a student matches: the
+candidates are exactly the results of the configured engine (so free-text,
+synonym and typo matches of the automaton engine are kept). A model
+trained on what students then did with their matches (match_outcomes)
+decides the order. ``flask --app app ranking train`` fits it offline; the
+model file is read once per worker at startup, and ranking a submission
+is a single matrix-vector product over the candidates.
+
+The model is a linear scorer stored as JSON (feature names, coefficients,
+intercept), so workers only need NumPy; scikit-learn is a training-time
+dependency. LearnedRanker falls back to the rule matcher when the model is
+missing or broken, or when it cannot rank within the latency budget.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from matcher import ANSWER_KEYS, AVERAGE_BONUS_ANSWERS, NEED_BONUS_ANSWER, QUESTION_OPTIONS
+from vector_matcher import VectorMatcher
+
+MODEL_FORMAT = 1
+
+# Columns of the feature matrix, one row per scholarship
+FEATURES = tuple(f'hit_{key}' for key in ANSWER_KEYS) + (
+    'need_bonus', 'average_bonus', 'rule_score', 'coverage', 'criteria_count'
+)
+
+# Training labels from match_outcomes: these statuses are positives with
+# the given sample weight; everything else shown to the student is a negative
+POSITIVE_WEIGHTS = {'passed': 3.0, 'applied': 3.0, 'pending': 3.0, 'saved': 1.0}
+
+
+# --- Features ---
+def catalog_key(scholarship):
+    """Identifies a scholarship (or a result built from one) across engines."""
+    return scholarship["id"] if scholarship.get("id") is not None else scholarship["name"]
+
+
+def build_state(scholarships, vector=None):
+    """Per-catalog arrays the features are computed from."""
+    vector = vector or VectorMatcher(scholarships)
+    encoded = vector.state
+    n = len(encoded["scholarships"])
+    counts = np.zeros(n, dtype=np.float32)
+    for sid, s in enumerate(encoded["scholarships"]):
+        counts[sid] = sum(1 for key in ANSWER_KEYS if key in s["criteria"])
+    positions = {catalog_key(s): sid for sid, s in enumerate(encoded["scholarships"])}
+    return {"vector": vector, "encoded": encoded, "criteria_count": counts, "positions": positions}
+
+
+def feature_matrix(state, answers):
+    """(scholarships x FEATURES) matrix for one answer set, the per-key hit
+    vectors, and the rule score of every scholarship."""
+    vector, encoded = state["vector"], state["encoded"]
+    n = len(encoded["scholarships"])
+    hits = {}
+    rule = np.zeros(n, dtype=np.float32)
+    columns = []
+    for key in ANSWER_KEYS:
+        value = answers.get(key)
+        if value and key in encoded["weights"]:
+            hit = vector._hits(encoded, key, value)
+            hits[key] = hit
+            rule += encoded["weights"][key] * hit
+            columns.append(hit.astype(np.float32))
+        else:
+            columns.append(np.zeros(n, dtype=np.float32))
+
+    need = encoded["need_bonus"] * (answers.get('financial_need') == NEED_BONUS_ANSWER)
+    average = encoded["average_bonus"] * (answers.get('average') in AVERAGE_BONUS_ANSWERS)
+    rule += need + average
+    hit_count = np.sum(columns, axis=0)
+    coverage = hit_count / np.maximum(state["criteria_count"], 1)
+    columns += [need, average, rule, coverage, state["criteria_count"]]
+    return np.column_stack(columns).astype(np.float32), hits, rule
+
+
+def result_features(state, answers, results, sids):
+    """FEATURES rows for a rule matcher's ``results`` (at catalog positions
+    ``sids``), taking hits and rule score from the results themselves.
+
+    For the substring engines these equal the feature_matrix() rows the
+    model was trained on; other engines contribute the matches they found.
+    """
+    encoded = state["encoded"]
+    sids = np.asarray(sids, dtype=np.int64)
+    matched = [set(r["matched"].split(", ")) if r["matched"] else set() for r in results]
+    hit_columns = [np.array([key in m for m in matched], dtype=np.float32) for key in ANSWER_KEYS]
+    need = encoded["need_bonus"][sids] * (answers.get('financial_need') == NEED_BONUS_ANSWER)
+    average = encoded["average_bonus"][sids] * (answers.get('average') in AVERAGE_BONUS_ANSWERS)
+    rule = np.array([r["score"] for r in results], dtype=np.float32)
+    criteria_count = state["criteria_count"][sids]
+    coverage = np.sum(hit_columns, axis=0) / np.maximum(criteria_count, 1)
+    columns = hit_columns + [need, average, rule, coverage, criteria_count]
+    return np.column_stack(columns).astype(np.float32)
+
+
+# --- Model ---
+class RankingModel:
+    """Linear relevance scorer over FEATURES."""
+
+    def __init__(self, coef, intercept, meta=None):
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = float(intercept)
+        self.meta = meta or {}
+        if self.coef.shape != (len(FEATURES),):
+            raise ValueError(f'expected {len(FEATURES)} coefficients, got {self.coef.shape}')
+        # Identifies the weights, so a retrained model changes API ETags
+        weights = json.dumps([[float(c) for c in self.coef], self.intercept])
+        self.fingerprint = hashlib.sha256(weights.encode()).hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path):
+        """Read a model file; raises ValueError if it does not fit this code."""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format') != MODEL_FORMAT or tuple(data.get('features', ())) != FEATURES:
+            raise ValueError(f'{path} was trained for a different feature set; retrain it')
+        return cls(data['coef'], data['intercept'], data.get('meta'))
+
+    def save(self, path):
+        """Write atomically, so a worker starting meanwhile never reads half a file."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({
+                'format': MODEL_FORMAT,
+                'features': list(FEATURES),
+                'coef': [float(c) for c in self.coef],
+                'intercept': self.intercept,
+                'meta': self.meta
+            }, f, indent=2)
+        os.replace(tmp, path)
+
+    def decision(self, X):
+        return X @ self.coef + self.intercept
+
+
+# --- Inference ---
+class LearnedRanker:
+    """The results of the ``fallback`` rule matcher, re-ordered by a RankingModel.
+
+    Exposes score()/reload() like the rule matchers, so it sits behind
+    CachedMatcher unchanged. Results are the rule matcher's own, so they
+    keep the rule score in ``score``.
+    """
+
+    def __init__(self, scholarships, model, fallback, budget_ms=5.0):
+        self.model = model
+        self.fallback = fallback
+        self.budget_ms = budget_ms
+        self.lock = threading.Lock()
+        self.counters = {'ranked': 0, 'fallbacks': 0, 'errors': 0, 'over_budget': 0}
+        self.reload(scholarships)
+        # Once per loaded model: the check scores dozens of answer sets with
+        # the rule matcher, too slow for the request that notices a catalog change
+        self.check = self.check_budget(self.state)
+
+    @property
+    def fingerprint(self):
+        """What decides the order of results: the model, or the rules when it is over budget."""
+        return self.model.fingerprint if self.check.get('within_budget') else 'rules'
+
+    def reload(self, scholarships):
+        """Re-encode the catalog and reload the fallback."""
+        scholarships = list(scholarships)
+        self.fallback.reload(scholarships)
+        self.state = build_state(scholarships)
+
+    def check_budget(self, state, samples=32):
+        """Time the model on a spread of questionnaire combinations; it is only
+        used if its p95 latency is within the budget.
+
+        Only re-ordering is timed: the rule matcher runs with or without the
+        model.
+        """
+        combinations = list(itertools.product(*QUESTION_OPTIONS.values()))
+        timings = []
+        for values in combinations[::max(1, len(combinations) // samples)]:
+            answers = dict(zip(QUESTION_OPTIONS, values))
+            results = self.fallback.score(answers)
+            started = time.perf_counter()
+            self._order(state, answers, results)
+            timings.append((time.perf_counter() - started) * 1000)
+        p95 = float(np.percentile(timings, 95)) if timings else 0.0
+        return {'p95_ms': round(p95, 4), 'within_budget': p95 <= self.budget_ms}
+
+    def score(self, answers, limit=None):
+        """Score answers against the catalog, most relevant first."""
+        state = self.state
+        if not self.check.get('within_budget'):
+            return self._fall_back(answers, limit)
+        # Every candidate is needed to re-order them, so the limit applies after ranking
+        results = self.fallback.score(answers)
+        started = time.perf_counter()
+        try:
+            ordered = self._order(state, answers, results)
+        except Exception:
+            with self.lock:
+                self.counters['errors'] += 1
+                self.counters['fallbacks'] += 1
+            return results if limit is None else results[:limit]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.counters['ranked'] += 1
+            if elapsed_ms > self.budget_ms:
+                self.counters['over_budget'] += 1
+        return ordered if limit is None else ordered[:limit]
+
+    def _fall_back(self, answers, limit):
+        with self.lock:
+            self.counters['fallbacks'] += 1
+        return self.fallback.score(answers, limit)
+
+    def _order(self, state, answers, results):
+        """The rule matcher's results, most relevant first."""
+        positions = state["positions"]
+        known, sids, unknown = [], [], []
+        for r in results:
+            sid = positions.get(catalog_key(r))
+            if sid is None:
+                unknown.append(r)  # only while the two catalogs are being reloaded
+            else:
+                known.append(r)
+                sids.append(sid)
+        if not known:
+            return list(results)
+        relevance = self.model.decision(result_features(state, answers, known, sids))
+        # Rule order among ties
+        order = np.lexsort((np.arange(len(known)), -relevance))
+        return [known[i] for i in order.tolist()] + unknown
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(
+            counters,
+            budget_ms=self.budget_ms,
+            check_p95_ms=self.check.get('p95_ms', 0.0),
+            model_active=int(bool(self.check.get('within_budget')))
+        )
@@ -0,0 +1,155 @@
+"""Offline training of the recommendation ranking model.
+
+    flask --app app ranking train [--out models/ranker.json] [--budget-ms 5]
+    flask --app app ranking show
+
+Training pairs every student's stored answers (user_answers) with the
+scholarships they matched; a match the student saved, applied to, is
+waiting on or won (match_outcomes) is a positive, the rest negatives. The
+model is evaluated on held-out students against the rule score and only
+written if it ranks at least as well and fits the latency budget. Workers
+load it at startup, so restart them after training.
+"""
+import json
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+
+ranking_cli = AppGroup('ranking', help='Train and inspect the learned ranking model.')
+
+
+def default_model_path():
+    return os.environ.get('RANKING_MODEL', 'models/ranker.json')
+
+
+def load_training_data(conn, state):
+    """Feature rows, labels, sample weights and user ids for every student
+    with stored answers and at least one outcome."""
+    import numpy as np
+    from ranking import POSITIVE_WEIGHTS, feature_matrix
+
+    outcomes = {}
+    for user_id, scholarship_id, status in conn.execute(
+        "SELECT user_id, scholarship_id, status FROM match_outcomes"
+    ):
+        outcomes.setdefault(user_id, {})[scholarship_id] = status
+    answers = {}
+    for user_id, key, value in conn.execute("SELECT user_id, criterion_key, value FROM user_answers"):
+        if user_id in outcomes:
+            answers.setdefault(user_id, {})[key] = value
+
+    position = {s["id"]: sid for sid, s in enumerate(state["encoded"]["scholarships"])}
+    rows, labels, weights, groups = [], [], [], []
+    for user_id, user_answers in answers.items():
+        X, _, rule = feature_matrix(state, user_answers)
+        # What the student was shown, plus anything they acted on anyway
+        shown = set(np.flatnonzero(rule > 0).tolist())
+        shown.update(position[sid] for sid in outcomes[user_id] if sid in position)
+        for sid in sorted(shown):
+            status = outcomes[user_id].get(state["encoded"]["scholarships"][sid]["id"])
+            rows.append(X[sid])
+            labels.append(1 if status in POSITIVE_WEIGHTS else 0)
+            weights.append(POSITIVE_WEIGHTS.get(status, 1.0))
+            groups.append(user_id)
+    return np.array(rows), np.array(labels), np.array(weights), np.array(groups)
+
+
+def fit(X, y, weights):
+    """Logistic regression on standardized features, folded back into one
+    coefficient vector over raw features."""
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(X)
+    scale = np.where(scaler.scale_ > 0, scaler.scale_, 1.0)
+    model = LogisticRegression(max_iter=1000).fit((X - scaler.mean_) / scale, y, sample_weight=weights)
+    coef = model.coef_[0] / scale
+    return coef, float(model.intercept_[0] - np.dot(coef, scaler.mean_))
+
+
+@ranking_cli.command('train')
+@click.option('--out', default=default_model_path, show_default='$RANKING_MODEL or models/ranker.json',
+              help='Where to write the model.')
+@click.option('--budget-ms', default=lambda: float(os.environ.get('RANKING_BUDGET_MS', 5)), type=float,
+              show_default='$RANKING_BUDGET_MS or 5', help='Per-request p95 inference budget.')
+@click.option('--min-students', default=50, show_default=True,
+              help='Refuse to train on fewer students with outcomes.')
+@click.option('--holdout', default=0.2, show_default=True, help='Share of students held out for evaluation.')
+@click.option('--force', is_flag=True, help='Write the model even if it loses to the rules or misses the budget.')
+def train_command(out, budget_ms, min_students, holdout, force):
+    """Fit the ranking model from stored answers and match outcomes."""
+    try:
+        from sklearn.metrics import roc_auc_score
+        from sklearn.model_selection import GroupShuffleSplit
+    except ImportError:
+        raise click.ClickException('training needs scikit-learn: pip install scikit-learn')
+    from app import get_db_connection
+    from catalog import get_catalog_version, load_catalog
+    from matcher import MatchIndex
+    from ranking import FEATURES, LearnedRanker, RankingModel, build_state
+
+    started = time.perf_counter()
+    conn = get_db_connection()
+    try:
+        catalog = load_catalog(conn)
+        version = get_catalog_version(conn)
+        state = build_state(catalog)
+        X, y, weights, groups = load_training_data(conn, state)
+    finally:
+        conn.close()
+
+    students = len(set(groups.tolist()))
+    click.echo(f'{len(y)} examples from {students} students, {int(y.sum())} positives')
+    if students < min_students:
+        raise click.ClickException(f'need outcomes from at least {min_students} students to train')
+    if y.min() == y.max():
+        raise click.ClickException('outcomes are all positive or all negative; nothing to learn')
+
+    # Evaluate on students the model has not seen
+    train, test = next(GroupShuffleSplit(n_splits=1, test_size=holdout, random_state=0).split(X, y, groups))
+    coef, intercept = fit(X[train], y[train], weights[train])
+    rule_column = FEATURES.index('rule_score')
+    auc_model = roc_auc_score(y[test], X[test] @ coef + intercept, sample_weight=weights[test])
+    auc_rules = roc_auc_score(y[test], X[test][:, rule_column], sample_weight=weights[test])
+    click.echo(f'Held-out AUC: model {auc_model:.4f}, rules {auc_rules:.4f}')
+
+    coef, intercept = fit(X, y, weights)
+    model = RankingModel(coef, intercept, meta={
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'catalog_version': version,
+        'examples': len(y),
+        'students': students,
+        'auc_model': round(float(auc_model), 4),
+        'auc_rules': round(float(auc_rules), 4)
+    })
+    check = LearnedRanker(catalog, model, MatchIndex(catalog), budget_ms=budget_ms).check
+    click.echo(f"Inference p95 {check['p95_ms']:.3f} ms over {len(catalog)} scholarships (budget {budget_ms} ms)")
+
+    if not force:
+        if auc_model < auc_rules:
+            raise click.ClickException('the model ranks worse than the rules; not saved (use --force to override)')
+        if not check['within_budget']:
+            raise click.ClickException('the model misses the latency budget; not saved (use --force to override)')
+    model.save(out)
+    click.echo(f'Wrote {out} in {time.perf_counter() - started:.1f}s; restart the workers to load it')
+
+
+@ranking_cli.command('show')
+@click.option('--path', default=default_model_path, show_default='$RANKING_MODEL or models/ranker.json')
+def show_command(path):
+    """Print a model's training summary and weights."""
+    from ranking import FEATURES, RankingModel
+
+    if not os.path.exists(path):
+        raise click.ClickException(f'no model at {path}; run `flask --app app ranking train`')
+    try:
+        model = RankingModel.load(path)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(model.meta, indent=2))
+    for name, weight in zip(FEATURES, model.coef.tolist()):
+        click.echo(f'{name:<20} {weight:+.4f}')
+    click.echo(f'{"intercept":<20} {model.intercept:+.4f}')
@@ -0,0 +1,88 @@
+"""Memoized recommendation results.
+
+The questionnaire only offers a few hundred answer combinations, so scored
+results are cached per normalized answers tuple in front of the matcher.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from matcher import ANSWER_KEYS, QUESTION_OPTIONS
+
+
+class CachedMatcher:
+    """LRU + TTL cache in front of any matcher exposing score()/reload().
+
+    Cached result lists are shared between requests and must be treated as
+    read-only.
+    """
+
+    def __init__(self, matcher, maxsize=1024, ttl=300):
+        self.matcher = matcher
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped by invalidate(); results scored under an older generation are not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def score(self, answers, limit=None):
+        """Score answers, reusing a cached result when one is fresh."""
+        key = (tuple(answers.get(k, '') for k in ANSWER_KEYS), limit)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (not self.ttl or now - entry[0] < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self.generation
+
+        results = self.matcher.score(answers, limit)
+
+        with self.lock:
+            if generation != self.generation:
+                return results  # the catalog changed while scoring; may be stale
+            self.entries[key] = (now, results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    def reload(self, scholarships=None):
+        """Reload the underlying matcher and drop every cached result."""
+        self.matcher.reload(scholarships)
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def warm(self, options=QUESTION_OPTIONS):
+        """Precompute every answer combination; returns how many were scored."""
+        keys = list(options)
+        count = 0
+        for values in itertools.product(*(options[k] for k in keys)):
+            self.score(dict(zip(keys, values)))
+            count += 1
+        return count
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
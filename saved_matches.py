@@ -0,0 +1,166 @@
+"""Saved questionnaire answers and scored matches per user.
+
+recommend() stores each student's answers (one row per question) and the
+scholarships they matched. My ScholarPass then reads the matches back with
+one indexed query instead of re-scoring.
+
+Students' own verdicts on their matches (applied, not interested, ...)
+are kept apart in ``match_outcomes`` so re-scoring never wipes them; they
+are also the training labels for the learned ranker (ranking.py).
+
+When a scholarship is added or edited, only the students it can affect
+are re-scored: those whose stored answers hit one of its keywords (found
+through ``idx_user_answers_lookup``), those eligible for its bonus points,
+and those who already had it saved.
+"""
+from catalog import load_catalog
+from matcher import ANSWER_KEYS, AVERAGE_BONUS_ANSWERS, NEED_BONUS_ANSWER, MatchIndex
+
+# SQLite's default limit on bound parameters is 999 on older builds
+CHUNK_SIZE = 500
+
+# Statuses a student can give a match on My ScholarPass
+OUTCOME_STATUSES = ('saved', 'applied', 'pending', 'passed', 'not-interested')
+
+# Same shape as the matcher's results; tags joined with the unit separator
+SAVED_MATCHES_SQL = """
+    SELECT s.id, s.name, s.university, s.description, m.score, m.matched,
+           (SELECT group_concat(tag, char(31)) FROM (
+                SELECT tag FROM scholarship_tags t WHERE t.scholarship_id = s.id ORDER BY t.position
+           )) AS tags,
+           o.status
+    FROM user_matches m JOIN scholarships s ON s.id = m.scholarship_id
+    LEFT JOIN match_outcomes o ON o.user_id = m.user_id AND o.scholarship_id = m.scholarship_id
+    WHERE m.user_id = ?
+    ORDER BY m.score DESC, m.scholarship_id
+"""
+
+# Distinct stored answers to one question, walked with index seeks
+ANSWER_SCAN_SQL = """
+    WITH RECURSIVE answer_values(value) AS (
+        SELECT MIN(value) FROM user_answers WHERE criterion_key = :key
+        UNION ALL
+        SELECT (SELECT MIN(value) FROM user_answers
+                WHERE criterion_key = :key AND value > answer_values.value)
+        FROM answer_values WHERE answer_values.value IS NOT NULL
+    )
+    SELECT value FROM answer_values WHERE value IS NOT NULL AND value != ''
+"""
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# --- Saving ---
+def save_matches(conn, user_id, answers, results):
+    """Replace a user's saved answers and matches; callers commit."""
+    conn.executemany(
+        "INSERT INTO user_answers (user_id, criterion_key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id, criterion_key) DO UPDATE SET value = excluded.value",
+        [(user_id, key, answers.get(key, '')) for key in ANSWER_KEYS]
+    )
+    conn.execute("DELETE FROM user_matches WHERE user_id = ?", (user_id,))
+    conn.executemany(
+        "INSERT INTO user_matches (user_id, scholarship_id, score, matched) VALUES (?, ?, ?, ?)",
+        [(user_id, r["id"], r["score"], r["matched"]) for r in results if r.get("id") is not None]
+    )
+
+
+def load_matches(conn, user_id):
+    """A user's saved matches, best first, shaped like the matcher's results."""
+    return [
+        {
+            "id": sid,
+            "name": name,
+            "university": university,
+            "description": description,
+            "tags": tags.split("\x1f") if tags else [],
+            "score": score,
+            "matched": matched,
+            "status": status or "saved"
+        }
+        for sid, name, university, description, score, matched, tags, status
+        in conn.execute(SAVED_MATCHES_SQL, (user_id,))
+    ]
+
+
+def record_outcome(conn, user_id, scholarship_id, status):
+    """Store a student's status for one scholarship; callers commit.
+
+    Returns False if the scholarship does not exist.
+    """
+    if not conn.execute("SELECT 1 FROM scholarships WHERE id = ?", (scholarship_id,)).fetchone():
+        return False
+    conn.execute(
+        "INSERT INTO match_outcomes (user_id, scholarship_id, status, updated_at) "
+        "VALUES (?, ?, ?, CURRENT_TIMESTAMP) "
+        "ON CONFLICT(user_id, scholarship_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+        (user_id, scholarship_id, status)
+    )
+    return True
+
+
+# --- Incremental re-matching ---
+def affected_users(conn, scholarship):
+    """Ids of users whose saved score for ``scholarship`` may have changed."""
+    users = {row[0] for row in conn.execute(
+        "SELECT user_id FROM user_matches WHERE scholarship_id = ?", (scholarship["id"],)
+    )}
+
+    for key, keywords in scholarship["criteria"].items():
+        # Same substring rule as the matchers, applied to each distinct stored answer
+        values = {
+            value for (value,) in conn.execute(ANSWER_SCAN_SQL, {"key": key})
+            if any(keyword in value or value in keyword for keyword in keywords)
+        }
+        if key == "financial_need" and "need" in keywords:
+            values.add(NEED_BONUS_ANSWER)
+        if key == "average":
+            values.update(AVERAGE_BONUS_ANSWERS)
+        for batch in chunks(values):
+            users.update(row[0] for row in conn.execute(
+                f"SELECT user_id FROM user_answers WHERE criterion_key = ? "
+                f"AND value IN ({', '.join('?' * len(batch))})",
+                [key, *batch]
+            ))
+    return users
+
+
+def rematch_scholarship(conn, scholarship_id):
+    """Re-score one added, edited or removed scholarship for the users it affects.
+
+    Returns the number of users re-scored; callers commit.
+    """
+    found = load_catalog(conn, scholarship_id)
+    if not found:
+        return conn.execute("DELETE FROM user_matches WHERE scholarship_id = ?", (scholarship_id,)).rowcount
+
+    scholarship = found[0]
+    index = MatchIndex([scholarship])
+    users = affected_users(conn, scholarship)
+    for batch in chunks(users):
+        answers = {}
+        for user_id, key, value in conn.execute(
+            f"SELECT user_id, criterion_key, value FROM user_answers "
+            f"WHERE user_id IN ({', '.join('?' * len(batch))})",
+            batch
+        ):
+            answers.setdefault(user_id, {})[key] = value
+
+        for user_id in batch:
+            result = index.score(answers.get(user_id, {}))
+            if result:
+                conn.execute(
+                    "INSERT INTO user_matches (user_id, scholarship_id, score, matched) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, scholarship_id) DO UPDATE SET score = excluded.score, "
+                    "matched = excluded.matched",
+                    (user_id, scholarship_id, result[0]["score"], result[0]["matched"])
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM user_matches WHERE user_id = ? AND scholarship_id = ?", (user_id, scholarship_id)
+                )
+    return len(users)
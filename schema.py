@@ -0,0 +1,105 @@
+"""Applying database/schema.sql, once per deployment.
+
+schema.sql is the only definition of the tables. apply_schema() stamps the
+database with a fingerprint of the file (PRAGMA user_version), so the first
+process to start after a deploy (the release phase's init_db.py, or else
+the first worker) creates what is missing, upgrades old tables and seeds
+the catalog, while every later worker only reads one integer. Starters that
+race serialize on SQLite's write lock, and every step is idempotent.
+"""
+import hashlib
+import os
+import sqlite3
+
+from catalog import rebuild_search_index, seed_catalog
+from db import DATABASE
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'schema.sql')
+
+
+def schema_version(sql):
+    """Fingerprint of the schema text that fits PRAGMA user_version (a signed 32-bit int)."""
+    return int(hashlib.sha256(sql.encode()).hexdigest()[:7], 16) or 1
+
+
+def statements(sql):
+    """The statements of a script, comments dropped; trigger bodies stay whole."""
+    buffer = ''
+    for line in sql.splitlines(keepends=True):
+        if line.lstrip().startswith('--'):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            yield buffer.strip()
+            buffer = ''
+
+
+def upgrade_users(conn, create_users):
+    """Rebuild a users table made by the old app.init_db(), which had no
+    created_at column (old rows get the upgrade time) and no role CHECK;
+    returns True if it did."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+    if row is None or 'CHECK' in row[0]:
+        return False
+    columns = {info[1] for info in conn.execute('PRAGMA table_info(users)')}
+    copied = ', '.join(c for c in ('id', 'name', 'email', 'password', 'created_at') if c in columns)
+    conn.execute(create_users.replace(' users (', ' users_upgraded (', 1))
+    # Accounts from before the CHECK may have no role (or an unknown one): they were students
+    conn.execute(
+        f"INSERT INTO users_upgraded ({copied}, role) "
+        f"SELECT {copied}, CASE WHEN role IN ('student', 'provider') THEN role ELSE 'student' END FROM users"
+    )
+    conn.execute('DROP TABLE users')
+    conn.execute('ALTER TABLE users_upgraded RENAME TO users')
+    return True
+
+
+def add_admin_flag(conn):
+    """Add users.is_admin to a users table from before it existed; returns True if it did."""
+    columns = {info[1] for info in conn.execute('PRAGMA table_info(users)')}
+    if not columns or 'is_admin' in columns:
+        return False
+    conn.execute('ALTER TABLE users ADD COLUMN is_admin INTEGER NOT NULL DEFAULT 0')
+    return True
+
+
+def apply_schema(path=DATABASE, schema_path=SCHEMA_PATH, timeout=60.0):
+    """Bring the database at ``path`` up to schema.sql and seed the catalog.
+
+    Returns None if the database was already current, else a dict of what
+    was done ('upgraded_users', 'added_admin_flag', 'seeded', 'indexed').
+    """
+    with open(schema_path) as f:
+        sql = f.read()
+    version = schema_version(sql)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        if conn.execute('PRAGMA user_version').fetchone()[0] == version:
+            return None
+        # Off already unless enabled; the users rebuild must not cascade deletes
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('PRAGMA user_version').fetchone()[0] == version:
+            conn.rollback()  # another process applied it while we waited
+            return None
+        ddl = list(statements(sql))
+        create_users = next(s for s in ddl if s.startswith('CREATE TABLE IF NOT EXISTS users '))
+        upgraded = upgrade_users(conn, create_users)
+        admin_flag = add_admin_flag(conn)
+        for statement in ddl:
+            conn.execute(statement)
+        # Seeding checks for an empty catalog under the same lock; all of it,
+        # user_version included, commits together below
+        done = {
+            'upgraded_users': upgraded,
+            'added_admin_flag': admin_flag,
+            'seeded': seed_catalog(conn),
+            'indexed': rebuild_search_index(conn)
+        }
+        conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+        return done
+    finally:
+        conn.close()
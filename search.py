@@ -0,0 +1,170 @@
+"""Full-text search over the scholarship catalog.
+
+The ``scholarship_search`` FTS5 table holds one row per scholarship
+(rowid = scholarships.id) with its name, university, description and tags;
+catalog.py keeps it in step with every add and edit. Each word of a query
+is matched as a prefix ("eng" finds "engineering"), all words must match,
+and results are ranked by BM25 with name and tag hits weighted above
+description hits. Facet counts by university and tag cover every match,
+not just the returned page.
+
+Results are cached per catalog version, so an add or edit in any worker
+invalidates them on the next search.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+# bm25() weights, in column order: name, university, description, tags
+RANK = "bm25(scholarship_search, 10.0, 4.0, 1.0, 6.0)"
+MAX_TERMS = 8
+FACET_LIMIT = 20
+
+# Scholarships matching the query and filters; the placeholders are filled
+# in by CatalogSearch._where with fixed SQL, never with user input
+MATCHED_CTE = """
+    WITH matched AS (
+        SELECT s.id, s.name, s.university, s.description, {rank} AS rank
+        FROM {source}
+        JOIN scholarships s ON s.id = {source_id}
+        WHERE {where}
+    )
+"""
+
+RESULTS_SQL = """
+    SELECT m.id, m.name, m.university, m.description, m.rank,
+           (SELECT group_concat(tag, char(31)) FROM (
+                SELECT tag FROM scholarship_tags t WHERE t.scholarship_id = m.id ORDER BY t.position
+           )) AS tags
+    FROM matched m
+    ORDER BY m.rank, m.id
+    LIMIT ? OFFSET ?
+"""
+
+UNIVERSITY_FACET_SQL = """
+    SELECT university, COUNT(*) FROM matched
+    GROUP BY university ORDER BY COUNT(*) DESC, university LIMIT ?
+"""
+
+TAG_FACET_SQL = """
+    SELECT t.tag, COUNT(DISTINCT t.scholarship_id) FROM matched m
+    JOIN scholarship_tags t ON t.scholarship_id = m.id
+    GROUP BY t.tag ORDER BY COUNT(DISTINCT t.scholarship_id) DESC, t.tag LIMIT ?
+"""
+
+
+def match_expression(query):
+    """FTS5 MATCH string for free text: every word as a quoted prefix term.
+
+    Returns None for a query with no words. Quoting each word keeps FTS5
+    operators and punctuation typed by users from being interpreted.
+    """
+    terms = re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class CatalogSearch:
+    """Searches the catalog through ``connect`` with an LRU result cache."""
+
+    def __init__(self, connect, maxsize=512):
+        self.connect = connect
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, query, version, university=None, tag=None, limit=20, offset=0):
+        """One page of results with the total and facet counts.
+
+        ``version`` is the current catalog version; a new version drops
+        every cached result. Cached dicts are shared and must not be changed.
+        """
+        match = match_expression(query)
+        key = (match, (university or '').lower(), (tag or '').lower(), limit, offset)
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        result = self._query(match, university, tag, limit, offset)
+
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = result
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return result
+
+    def _where(self, match, university, tag):
+        """The matched CTE and its parameters for a query and filters."""
+        conditions, params = [], []
+        if match:
+            conditions.append('scholarship_search MATCH ?')
+            params.append(match)
+        if university:
+            conditions.append('s.university = ? COLLATE NOCASE')
+            params.append(university)
+        if tag:
+            conditions.append('EXISTS (SELECT 1 FROM scholarship_tags ft '
+                              'WHERE ft.scholarship_id = s.id AND ft.tag = ? COLLATE NOCASE)')
+            params.append(tag)
+        where = ' AND '.join(conditions) or '1'
+        if match:
+            cte = MATCHED_CTE.format(rank=RANK, source='scholarship_search',
+                                     source_id='scholarship_search.rowid', where=where)
+        else:
+            # No words: browse the catalog, filtered, in id order
+            cte = MATCHED_CTE.format(rank='0.0', source='scholarships AS listing',
+                                     source_id='listing.id', where=where)
+        return cte, params
+
+    def _query(self, match, university, tag, limit, offset):
+        cte, params = self._where(match, university, tag)
+        conn = self.connect()
+        try:
+            rows = conn.execute(cte + RESULTS_SQL, [*params, limit, offset]).fetchall()
+            total = conn.execute(cte + "SELECT COUNT(*) FROM matched", params).fetchone()[0]
+            universities = conn.execute(cte + UNIVERSITY_FACET_SQL, [*params, FACET_LIMIT]).fetchall()
+            tags = conn.execute(cte + TAG_FACET_SQL, [*params, FACET_LIMIT]).fetchall()
+        finally:
+            conn.close()
+        return {
+            "results": [
+                {
+                    "id": sid,
+                    "name": name,
+                    "university": university_name,
+                    "description": description,
+                    "tags": tag_list.split("\x1f") if tag_list else [],
+                    # bm25() is lower-is-better; flip it so higher means more relevant
+                    "score": round(-rank, 4) or 0.0
+                }
+                for sid, name, university_name, description, rank, tag_list in rows
+            ],
+            "total": total,
+            "facets": {
+                "university": [{"value": value, "count": count} for value, count in universities],
+                "tag": [{"value": value, "count": count} for value, count in tags]
+            }
+        }
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,269 @@
+"""Server-side sessions.
+
+The session cookie only carries a short random id. Session data lives in a
+pluggable store (SQLite table, in-memory LRU, or a Redis-like key/value
+server) and is only loaded the first time a request touches ``session``,
+so static files and other session-free requests never hit the store.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Same encoding Flask uses for cookie sessions, so flashes and tuples survive
+serializer = TaggedJSONSerializer()
+
+
+# --- Stores ---
+class MemoryStore:
+    """Bounded LRU of sessions in this process (single-worker deployments)."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sid):
+        with self.lock:
+            entry = self.entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self.entries[sid]
+                return None
+            self.entries.move_to_end(sid)
+            return serializer.loads(entry[2])
+
+    def set(self, sid, data, ttl):
+        with self.lock:
+            self.entries[sid] = (time.time() + ttl, data.get('user_id'), serializer.dumps(data))
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.entries.pop(sid, None)
+
+    def revoke_user(self, user_id):
+        with self.lock:
+            doomed = [sid for sid, entry in self.entries.items() if entry[1] == user_id]
+            for sid in doomed:
+                del self.entries[sid]
+            return len(doomed)
+
+    def sweep(self):
+        now = time.time()
+        with self.lock:
+            doomed = [sid for sid, entry in self.entries.items() if entry[0] <= now]
+            for sid in doomed:
+                del self.entries[sid]
+            return len(doomed)
+
+
+class SQLiteStore:
+    """Sessions in the app database's ``sessions`` table (shared by all workers)."""
+
+    def __init__(self, connect):
+        self.connect = connect
+
+    def get(self, sid):
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return serializer.loads(row[0]) if row else None
+
+    def set(self, sid, data, ttl):
+        conn = self.connect()
+        try:
+            conn.execute(
+                "INSERT INTO sessions (sid, user_id, data, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET user_id = excluded.user_id, data = excluded.data, "
+                "expires_at = excluded.expires_at",
+                (sid, data.get('user_id'), serializer.dumps(data), time.time() + ttl)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _delete_where(self, clause, params):
+        conn = self.connect()
+        try:
+            removed = conn.execute(f"DELETE FROM sessions WHERE {clause}", params).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return removed
+
+    def delete(self, sid):
+        self._delete_where("sid = ?", (sid,))
+
+    def revoke_user(self, user_id):
+        return self._delete_where("user_id = ?", (user_id,))
+
+    def sweep(self):
+        return self._delete_where("expires_at <= ?", (time.time(),))
+
+
+class RedisStore:
+    """Sessions in a Redis-like server; expiry is handled by the server's TTLs.
+
+    ``client`` is a ``redis.Redis`` instance or the kvstore.LocalRedis stand-in.
+    """
+
+    def __init__(self, client, prefix='session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        if raw is None:
+            return None
+        return serializer.loads(raw.decode() if isinstance(raw, bytes) else raw)
+
+    def set(self, sid, data, ttl):
+        self.client.setex(self.prefix + sid, int(ttl), serializer.dumps(data))
+        user_id = data.get('user_id')
+        if user_id is not None:
+            key = f'{self.prefix}user:{user_id}'
+            self.client.sadd(key, sid)
+            self.client.expire(key, int(ttl))
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def revoke_user(self, user_id):
+        key = f'{self.prefix}user:{user_id}'
+        sids = [s.decode() if isinstance(s, bytes) else s for s in self.client.smembers(key)]
+        removed = self.client.delete(*[self.prefix + sid for sid in sids]) if sids else 0
+        self.client.delete(key)
+        return removed
+
+    def sweep(self):
+        return 0  # the server expires keys itself
+
+
+# --- Session object ---
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that fetches its data from the store on first access."""
+
+    def __init__(self, sid=None, loader=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.loaded_user_id = None
+        self._loader = loader
+
+    @property
+    def loaded(self):
+        return self._loader is None
+
+    def _load(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            self.accessed = True
+            data = loader()
+            if data:
+                dict.update(self, data)  # plain dict update: loading is not a modification
+                self.loaded_user_id = data.get('user_id')
+            else:
+                self.new = True  # unknown or expired id: never reuse a client-chosen id
+
+
+def _loading(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__len__',
+              '__repr__', 'get', 'keys', 'values', 'items', 'copy', 'clear', 'pop', 'popitem',
+              'setdefault', 'update'):
+    setattr(ServerSession, _name, _loading(_name))
+
+
+# --- Flask integration ---
+class ServerSessionInterface(SessionInterface):
+    """Stores sessions in ``store`` and keeps only an opaque id in the cookie.
+
+    Every store call goes through ``run_blocking(fn, *args)``, so a store
+    that blocks (SQLite) can be kept off the event loop under gevent.
+    """
+
+    def __init__(self, store, sweep_interval=300, run_blocking=None):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.monotonic()
+        self.run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSession()
+        return ServerSession(sid, loader=lambda: self.run_blocking(self.store.get, sid))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+        if not session.loaded and not session.modified:
+            return  # request never touched the session
+
+        if not session:
+            if session.modified and session.sid:
+                self.run_blocking(self.store.delete, session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # New id whenever someone logs in, so a planted id cannot be hijacked
+        rotate = session.new or session.get('user_id') != session.loaded_user_id
+        if rotate and session.sid:
+            self.run_blocking(self.store.delete, session.sid)
+        if rotate:
+            session.sid = secrets.token_urlsafe(24)
+
+        if session.modified or rotate or self.should_set_cookie(app, session):
+            ttl = app.permanent_session_lifetime.total_seconds()
+            self.run_blocking(self.store.set, session.sid, dict(session), ttl)
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        self.maybe_sweep()
+
+    def maybe_sweep(self):
+        """Purge expired sessions at most once per ``sweep_interval`` seconds."""
+        now = time.monotonic()
+        if now - self.last_sweep >= self.sweep_interval:
+            self.last_sweep = now
+            self.run_blocking(self.store.sweep)
+
+    def revoke_user(self, user_id):
+        """Log a user out everywhere; returns the number of sessions removed."""
+        return self.run_blocking(self.store.revoke_user, user_id)
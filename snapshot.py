@@ -0,0 +1,311 @@
+"""Catalog snapshots shared by every worker through mmap.
+
+Every other engine keeps its own copy of the catalog and index in each
+worker, and rebuilds it in each worker when the catalog changes. Here the
+compiled catalog (the fields results show, the inverted index and the
+bonus lists) is written once to a compact binary file stamped with the
+catalog version, and every worker maps that file read-only: the pages
+live once in the OS page cache however many workers there are. Each
+worker decodes only the keyword vocabulary, plus the scholarships it
+actually returns.
+
+The first process to see a catalog version newer than the file's writes
+the next snapshot, under a file lock, to a temporary file that replaces
+the old one atomically; the others wait for it and map the result. A
+worker also re-maps whenever the file is replaced (e.g. by ``flask catalog
+snapshot``), checking at most every ``check_interval`` seconds.
+
+Layout (little-endian): a header, a directory of sections, then the
+sections, each 8-byte aligned. Text lives once in ``strings`` (UTF-8);
+every other section is an array of uint32, referring to text as
+(offset, length) pairs.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+
+from catalog import get_catalog_version, load_catalog
+from matcher import MatchIndex
+
+MAGIC = b'SPCS'
+FORMAT = 1
+HEADER = struct.Struct('<4sHHqI')  # magic, format, section count, catalog version, scholarships
+SECTION = struct.Struct('<8sQQ')   # name, offset, length in bytes
+SECTIONS = ('strings', 'records', 'keys', 'vocab', 'postings', 'need', 'average')
+
+# Sections are read in place as native uint32 arrays
+NATIVE_UINT32 = sys.byteorder == 'little' and array('I').itemsize == 4
+
+# Per scholarship: id, then name, university, description and tags as (offset, length)
+RECORD = struct.Struct('<9I')
+TAG_SEPARATOR = '\x1f'
+
+
+# --- Writing ---
+def encode(scholarships):
+    """The sections' bytes for a catalog, in SECTIONS order."""
+    if not NATIVE_UINT32:
+        raise RuntimeError('catalog snapshots need a little-endian platform with 4-byte unsigned ints')
+    strings = bytearray()
+    interned = {}
+
+    def text(value):
+        ref = interned.get(value)
+        if ref is None:
+            data = value.encode()
+            ref = interned[value] = (len(strings), len(data))
+            strings.extend(data)
+        return ref
+
+    records = array('I')
+    index, need, average = {}, array('I'), array('I')
+    for sid, s in enumerate(scholarships):
+        records.append(s.get("id") or 0)
+        for field in ("name", "university", "description"):
+            records.extend(text(s[field]))
+        # Scholarships share tag lists, so the joined list is stored once
+        records.extend(text(TAG_SEPARATOR.join(s["tags"])))
+
+        # The same postings MatchIndex.reload() builds
+        for key, keywords in s["criteria"].items():
+            weight = s["weight"].get(key, 1)
+            by_keyword = index.setdefault(key, {})
+            for keyword in keywords:
+                by_keyword.setdefault(keyword, []).append((sid, weight))
+        if "need" in s["criteria"].get("financial_need", []):
+            need.append(sid)
+        if "average" in s["criteria"]:
+            average.append(sid)
+
+    keys, vocab, postings = array('I'), array('I'), array('I')
+    for key, by_keyword in index.items():
+        keys.extend(text(key))
+        keys.extend((len(vocab) // 4, len(by_keyword)))
+        for keyword, pairs in by_keyword.items():
+            vocab.extend(text(keyword))
+            vocab.extend((len(postings) // 2, len(pairs)))
+            for pair in pairs:
+                postings.extend(pair)
+
+    arrays = (records, keys, vocab, postings, need, average)
+    return [bytes(strings)] + [a.tobytes() for a in arrays]
+
+
+def write_snapshot(path, scholarships, version):
+    """Write a snapshot atomically (readers see the old file or the new one,
+    never a mix); returns its size in bytes."""
+    sections = encode(list(scholarships))
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    directory = []
+    for name, data in zip(SECTIONS, sections):
+        offset += -offset % 8
+        directory.append((name, offset, len(data)))
+        offset += len(data)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, len(SECTIONS), version, len(scholarships)))
+        for name, start, length in directory:
+            f.write(SECTION.pack(name.encode(), start, length))
+        for (name, start, length), data in zip(directory, sections):
+            f.write(b'\0' * (start - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return offset
+
+
+def read_catalog(conn):
+    """(version, scholarships) from one read transaction, so the two agree.
+
+    The transaction is rolled back afterwards, so ``conn`` must not be in one
+    already (e.g. a request's shared connection with uncommitted writes).
+    """
+    if conn.in_transaction:
+        raise ValueError('read_catalog() needs a connection outside any transaction')
+    conn.execute('BEGIN')
+    try:
+        return get_catalog_version(conn), load_catalog(conn)
+    finally:
+        conn.rollback()
+
+
+def snapshot_version(path):
+    """Catalog version a snapshot file was written for, or None if there is no usable file."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, fmt, _, version, _ = HEADER.unpack(header)
+    return version if magic == MAGIC and fmt == FORMAT else None
+
+
+# --- Reading ---
+class Records(Sequence):
+    """Scholarships of a snapshot, decoded on access in the shape build_result() reads."""
+
+    def __init__(self, records, strings):
+        self.records, self.strings = records, strings
+        self.count = len(records) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, sid):
+        if not 0 <= sid < self.count:
+            raise IndexError(sid)
+        scholarship_id, name, name_len, university, university_len, description, description_len, tags, tags_len = \
+            RECORD.unpack_from(self.records, sid * RECORD.size)
+        strings = self.strings
+        tags = str(strings[tags:tags + tags_len], 'utf-8')
+        return {
+            "id": scholarship_id or None,
+            "name": str(strings[name:name + name_len], 'utf-8'),
+            "university": str(strings[university:university + university_len], 'utf-8'),
+            "description": str(strings[description:description + description_len], 'utf-8'),
+            "tags": tags.split(TAG_SEPARATOR) if tags else []
+        }
+
+
+class Postings(Mapping):
+    """keyword -> (scholarship position, weight) pairs of one criterion key, read from the map."""
+
+    def __init__(self, vocab, pairs):
+        self.vocab, self.pairs = vocab, pairs
+
+    def __getitem__(self, keyword):
+        start, count = self.vocab[keyword]
+        flat = self.pairs[start * 2:(start + count) * 2]
+        return zip(flat[0::2], flat[1::2])
+
+    def __iter__(self):
+        return iter(self.vocab)
+
+    def __len__(self):
+        return len(self.vocab)
+
+
+class Snapshot:
+    """A snapshot file mapped read-only."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self.size = stat.st_size
+        magic, fmt, count, self.version, n = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f'{path} is not a format {FORMAT} catalog snapshot')
+        if not NATIVE_UINT32:
+            raise RuntimeError('catalog snapshots need a little-endian platform with 4-byte unsigned ints')
+
+        view = memoryview(self.map)
+        sections = {}
+        for i in range(count):
+            name, start, length = SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size)
+            sections[name.rstrip(b'\0').decode()] = view[start:start + length]
+        strings = sections.pop('strings')
+        ints = {name: data.cast('I') for name, data in sections.items()}
+
+        def text(offset, length):
+            return str(strings[offset:offset + length], 'utf-8')
+
+        self.scholarships = Records(sections['records'], strings)
+        if len(self.scholarships) != n:
+            raise ValueError(f'{path} is truncated')
+        # The vocabulary is the only part each worker decodes into its own memory
+        keys, vocab = ints['keys'], ints['vocab']
+        self.postings = {}
+        for k in range(0, len(keys), 4):
+            first, count = keys[k + 2], keys[k + 3]
+            entries = vocab[first * 4:(first + count) * 4]
+            self.postings[text(keys[k], keys[k + 1])] = Postings(
+                {text(entries[v], entries[v + 1]): (entries[v + 2], entries[v + 3]) for v in range(0, len(entries), 4)},
+                ints['postings']
+            )
+        self.need_bonus, self.average_bonus = ints['need'], ints['average']
+
+
+# --- Matching ---
+class SnapshotMatcher(MatchIndex):
+    """MatchIndex scoring over a catalog snapshot shared by every worker.
+
+    ``connect`` opens a database connection of the matcher's own (not one
+    shared with a request: see read_catalog()); it is used to check the
+    catalog version and, in the one process that writes a new snapshot,
+    to read the catalog.
+    """
+
+    def __init__(self, path, connect, check_interval=1.0):
+        self.path = path
+        self.connect = connect
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.checked_at = time.monotonic()
+        self.counters = {'written': 0, 'mapped': 0}
+        self.reload()
+
+    def reload(self, scholarships=None):
+        """Map the snapshot of the database's current catalog, writing it first
+        if no process has yet. ``scholarships`` is not used: the snapshot is
+        written from one consistent read of the catalog and its version."""
+        with self.lock:
+            conn = self.connect()
+            try:
+                if snapshot_version(self.path) != get_catalog_version(conn):
+                    with open(f'{self.path}.lock', 'a') as lock:
+                        fcntl.flock(lock, fcntl.LOCK_EX)
+                        # Whoever held the lock before us may have written it already
+                        if snapshot_version(self.path) != get_catalog_version(conn):
+                            version, scholarships = read_catalog(conn)
+                            write_snapshot(self.path, scholarships, version)
+                            self.counters['written'] += 1
+            finally:
+                conn.close()
+            self._map()
+
+    def _map(self):
+        snapshot = Snapshot(self.path)
+        # A Snapshot has the fields of an IndexState: score() reads this one reference
+        self.state = snapshot
+        self.counters['mapped'] += 1
+
+    def score(self, answers, limit=None):
+        """Score answers against the catalog, best matches first."""
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            self._follow_file()
+        return super().score(answers, limit)
+
+    def _follow_file(self):
+        """Re-map if the snapshot file was replaced since it was mapped."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_mtime_ns) != self.state.identity:
+            with self.lock:
+                if (stat.st_ino, stat.st_mtime_ns) != self.state.identity:
+                    self._map()
+
+    def stats(self):
+        snapshot = self.state
+        return dict(
+            self.counters,
+            version=snapshot.version,
+            bytes=snapshot.size,
+            scholarships=len(snapshot.scholarships)
+        )
@@ -0,0 +1,44 @@
+"""Shared fixtures. Every test runs against throwaway databases, never database/app.db."""
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+# app.py and db.py read these at import, so they are set before any test imports them
+WORKDIR = tempfile.mkdtemp(prefix='scholarpass-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(WORKDIR, 'app.db')
+os.environ['CATALOG_SNAPSHOT'] = os.path.join(WORKDIR, 'catalog.snapshot')
+os.environ['THROTTLE_FILE'] = os.path.join(WORKDIR, 'throttle.buckets')
+os.environ['RANKING_MODEL'] = os.path.join(WORKDIR, 'no-model.json')
+os.environ['JOB_WORKERS'] = '0'              # jobs only run when a test runs them
+os.environ['LOGIN_LIMIT_IP'] = '0'           # throttle tests build their own throttles
+os.environ['LOGIN_LIMIT_EMAIL'] = '0'
+os.environ['PASSWORD_HASH_ITERATIONS'] = '1000'
+os.environ['PROFILE_DIR'] = os.path.join(WORKDIR, 'profiles')
+
+from schema import apply_schema  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A database with the schema applied and the bundled catalog seeded."""
+    path = str(tmp_path / 'app.db')
+    apply_schema(path)
+    return path
+
+
+@pytest.fixture
+def connect(db_path):
+    return lambda: sqlite3.connect(db_path)
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    from app import create_app
+    return create_app({'TESTING': True})
+
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
@@ -0,0 +1,105 @@
+"""/api/recommendations: ETags, cursor paging and input errors."""
+import sqlite3
+
+import pytest
+
+from catalog import SCHOLARSHIPS, add_scholarship
+
+ANSWERS = {'school_type': 'public', 'average': '90', 'financial_need': 'yes', 'talent': 'sports', 'university': 'dlsu'}
+
+
+def get(client, headers=None, **params):
+    return client.get('/api/recommendations', query_string=dict(ANSWERS, **params), headers=headers)
+
+
+def all_pages(client, limit):
+    names, cursor = [], None
+    while True:
+        response = get(client, limit=limit, **({'cursor': cursor} if cursor else {}))
+        assert response.status_code == 200
+        body = response.get_json()
+        names += [r['name'] for r in body['results']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return names, body['total']
+
+
+def test_unchanged_page_answers_304(client):
+    first = get(client, limit=2)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = get(client, headers={'If-None-Match': etag}, limit=2)
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert not again.data
+
+    # Another page or other answers is another representation
+    assert get(client, headers={'If-None-Match': etag}, limit=3).status_code == 200
+    assert get(client, headers={'If-None-Match': etag}, limit=2, talent='arts').status_code == 200
+
+
+def test_cursor_pages_cover_the_full_list_once(client):
+    everything = get(client, limit=100).get_json()
+    names, total = all_pages(client, limit=3)
+    assert total == everything['total'] == len(names)
+    assert names == [r['name'] for r in everything['results']]
+    assert everything['next_cursor'] is None
+
+
+def test_matched_lists_answer_keys_in_questionnaire_order(client):
+    result = get(client, limit=100).get_json()['results'][0]
+    assert result['matched'] == [k for k in ANSWERS if k in result['matched']]
+    assert result['score'] >= 1
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'x', 3, True])
+def test_non_object_json_body_is_rejected(client, body):
+    response = client.post('/api/recommendations', json=body)
+    assert response.status_code == 400
+    assert 'object' in response.get_json()['error']
+
+
+def test_json_object_body_is_scored(client):
+    response = client.post('/api/recommendations', json=dict(ANSWERS, limit=2))
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 2
+
+
+def test_bad_limit_and_cursor(client):
+    assert get(client, limit='ten').status_code == 400
+    assert get(client, cursor='not-a-cursor').status_code == 400
+    assert get(client, limit=0).get_json()['results']  # clamped to one row, not an error
+
+
+def test_catalog_change_expires_cursors_and_etags(client):
+    from db import DATABASE
+
+    first = get(client, limit=2)
+    body = first.get_json()
+    conn = sqlite3.connect(DATABASE)
+    with conn:
+        add_scholarship(conn, dict(SCHOLARSHIPS[-1], name='Community Sports Grant'))
+    conn.close()
+
+    # The cached results are dropped as soon as the new version is seen
+    assert get(client, headers={'If-None-Match': first.headers['ETag']}, limit=2).status_code == 200
+    assert get(client, cursor=body['next_cursor'], limit=2).status_code == 400
+    updated = get(client, limit=100).get_json()
+    assert updated['catalog_version'] == body['catalog_version'] + 1
+    assert updated['total'] == body['total'] + 1
+    assert 'Community Sports Grant' in [r['name'] for r in updated['results']]
+
+
+def test_a_retrained_ranking_model_changes_the_etag(client, monkeypatch):
+    import app
+
+    class Ranker:
+        fingerprint = 'model-a'
+
+    rules = get(client, limit=2).headers['ETag']
+    monkeypatch.setattr(app, 'ranker', Ranker())
+    first = get(client, limit=2).headers['ETag']
+    Ranker.fingerprint = 'model-b'
+    assert get(client, headers={'If-None-Match': first}, limit=2).status_code == 200
+    assert len({rules, first, get(client, limit=2).headers['ETag']}) == 3
@@ -0,0 +1,149 @@
+"""Background jobs: retries with backoff, dead-lettering and idempotency keys."""
+import sqlite3
+import time
+
+import pytest
+
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(connect):
+    return JobQueue(connect, workers=0)
+
+
+def job(connect, job_id=None):
+    conn = connect()
+    try:
+        return conn.execute(
+            "SELECT status, attempts, run_at, last_error FROM jobs " + ("WHERE id = ?" if job_id else "ORDER BY id DESC"),
+            (job_id,) if job_id else ()
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def make_due(connect):
+    conn = connect()
+    with conn:
+        conn.execute("UPDATE jobs SET run_at = 0 WHERE status = 'queued'")
+    conn.close()
+
+
+def test_job_runs_once(queue, connect):
+    seen = []
+    queue.handler('note')(seen.append)
+    assert queue.enqueue('note', {'n': 1})
+    assert queue.run_one('w1')
+    assert not queue.run_one('w1')
+    assert seen == [{'n': 1}]
+    assert job(connect)[:2] == ('done', 1)
+    assert queue.stats()['succeeded'] == 1
+
+
+def test_failed_job_is_retried_with_backoff(queue, connect):
+    calls = []
+
+    @queue.handler('flaky')
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 3:
+            raise RuntimeError(f'attempt {len(calls)} failed')
+
+    queue.enqueue('flaky', {}, max_attempts=5)
+    started = time.time()
+    assert queue.run_one('w1')
+    status, attempts, run_at, error = job(connect)
+    assert (status, attempts) == ('queued', 1)
+    assert run_at >= started + 2  # 2 ** attempts seconds
+    assert 'attempt 1 failed' in error
+    assert not queue.run_one('w1')  # not due yet
+
+    make_due(connect)
+    assert queue.run_one('w1')
+    make_due(connect)
+    assert queue.run_one('w1')
+    assert job(connect)[:2] == ('done', 3)
+    assert len(calls) == 3
+    stats = queue.stats()
+    assert (stats['retried'], stats['succeeded'], stats['exhausted']) == (2, 1, 0)
+
+
+def test_job_is_dead_lettered_after_max_attempts(queue, connect):
+    @queue.handler('broken')
+    def broken(payload):
+        raise ValueError('always fails')
+
+    queue.enqueue('broken', {}, max_attempts=2)
+    assert queue.run_one('w1')
+    make_due(connect)
+    assert queue.run_one('w1')
+    status, attempts, _, error = job(connect)
+    assert (status, attempts) == ('failed', 2)
+    assert 'always fails' in error
+    make_due(connect)
+    assert not queue.run_one('w1')  # failed jobs stay put until retried by hand
+    stats = queue.stats()
+    assert (stats['failed'], stats['retried'], stats['exhausted']) == (1, 1, 1)
+
+
+def test_unknown_kind_fails_instead_of_vanishing(queue, connect):
+    queue.enqueue('nobody-handles-this', {}, max_attempts=1)
+    assert queue.run_one('w1')
+    status, _, _, error = job(connect)
+    assert status == 'failed'
+    assert 'no handler registered' in error
+
+
+def test_idempotency_keys(queue, connect):
+    assert queue.enqueue('note', {'n': 1}, key='welcome:1')
+    assert not queue.enqueue('note', {'n': 2}, key='welcome:1')
+
+    # replace=True keeps one pending job with the latest payload
+    seen = []
+    queue.handler('note')(seen.append)
+    assert queue.enqueue('note', {'v': 1}, key='matches:1', replace=True)
+    queue.enqueue('note', {'v': 2}, key='matches:1', replace=True)
+    while queue.run_one('w1'):
+        pass
+    assert seen == [{'n': 1}, {'v': 2}]
+    assert queue.stats()['duplicates'] == 1
+
+
+def test_expired_lease_is_reclaimed(connect):
+    queue = JobQueue(connect, workers=0, lease=0)
+    queue.enqueue('note', {})
+    assert queue.claim('dead-worker') is not None
+    assert queue.claim('w2') is not None  # the first lease has already expired
+    assert job(connect)[:2] == ('running', 2)
+
+
+def test_failed_handler_writes_are_rolled_back_under_the_cli(flask_app):
+    from app import get_db_connection, jobs
+    from db import DATABASE
+
+    @jobs.handler('test.half_done')
+    def half_done(payload):
+        conn = get_db_connection()
+        try:
+            conn.execute("INSERT INTO users (name, email, password) VALUES ('Half', ?, 'x')", (payload['email'],))
+            raise RuntimeError('failed after writing')
+        finally:
+            conn.close()
+
+    seen = []
+    jobs.handler('test.note')(seen.append)
+    jobs.enqueue('test.half_done', {'email': 'half@example.com'})
+    jobs.enqueue('test.note', {'n': 1})
+
+    result = flask_app.test_cli_runner().invoke(args=['jobs', 'work', '--once'])
+    assert result.exit_code == 0, result.output
+    assert seen == [{'n': 1}]  # the next claim was not stuck behind an open transaction
+
+    conn = sqlite3.connect(DATABASE)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE email = 'half@example.com'").fetchone()[0] == 0
+        status, attempts = conn.execute("SELECT status, attempts FROM jobs WHERE kind = 'test.half_done'").fetchone()
+    finally:
+        conn.close()
+    assert (status, attempts) == ('queued', 1)
@@ -0,0 +1,127 @@
+"""Every engine must rank exactly like the loop recommend() originally ran."""
+import itertools
+import sqlite3
+
+import pytest
+
+from benchmarks.scenarios import questionnaire_answers
+from catalog import load_catalog
+from keyword_matcher import AutomatonMatcher
+from matcher import ANSWER_KEYS, MatchIndex, SqlMatcher
+from snapshot import SnapshotMatcher
+from vector_matcher import VectorMatcher
+
+
+def original_recommend(answers, scholarships):
+    """The matching loop from the first version of recommend(), verbatim apart from the result shape."""
+    results = []
+    for s in scholarships:
+        score = 0
+        matched_criteria = []
+
+        for key, user_value in answers.items():
+            if not user_value:
+                continue
+
+            for keyword in s["criteria"].get(key, []):
+                if keyword in user_value or user_value in keyword:
+                    score += s["weight"].get(key, 1)
+                    matched_criteria.append(key)
+                    break
+
+        if answers['financial_need'] == "yes" and "need" in s["criteria"].get("financial_need", []):
+            score += 1
+        if answers['average'] in ["95", "90"] and "average" in s["criteria"]:
+            score += 1
+
+        if score > 0:
+            results.append((s["name"], score, set(matched_criteria)))
+
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results
+
+
+def shape(results):
+    return [(r["name"], r["score"], set(r["matched"].split(", ")) if r["matched"] else set()) for r in results]
+
+
+def answer_sets():
+    """Every questionnaire combination, plus some of them with one question skipped,
+    normalized as recommend() does."""
+    combinations = [
+        {key: value.lower().strip() for key, value in answers.items()}
+        for answers in questionnaire_answers()
+    ]
+    skipped = [dict(answers, **{key: ''}) for answers, key in itertools.product(combinations[::7], ANSWER_KEYS)]
+    return combinations + skipped
+
+
+ENGINES = {
+    'sql': lambda connect, catalog, tmp_path: SqlMatcher(connect),
+    'index': lambda connect, catalog, tmp_path: MatchIndex(catalog),
+    'vector': lambda connect, catalog, tmp_path: VectorMatcher(catalog),
+    'automaton': lambda connect, catalog, tmp_path: AutomatonMatcher(catalog),
+    'snapshot': lambda connect, catalog, tmp_path: SnapshotMatcher(str(tmp_path / 'catalog.snapshot'), connect),
+}
+
+
+@pytest.fixture
+def catalog(connect):
+    conn = connect()
+    try:
+        return load_catalog(conn)
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_engines_match_the_original_loop(engine, connect, catalog, tmp_path):
+    matcher = ENGINES[engine](connect, catalog, tmp_path)
+    for answers in answer_sets():
+        expected = original_recommend(answers, catalog)
+        assert shape(matcher.score(answers)) == expected, answers
+        assert shape(matcher.score(answers, limit=3)) == expected[:3], answers
+
+
+@pytest.mark.parametrize('engine', ['index', 'vector', 'automaton'])
+def test_reload_replaces_the_catalog(engine, connect, catalog, tmp_path):
+    matcher = ENGINES[engine](connect, catalog, tmp_path)
+    answers = {'school_type': '', 'average': '', 'financial_need': '', 'talent': 'arts', 'university': ''}
+    assert len(matcher.score(answers)) == 2
+    matcher.reload(catalog[:1])
+    assert shape(matcher.score(answers)) == original_recommend(answers, catalog[:1]) == []
+
+
+def test_snapshot_is_written_once_and_follows_the_catalog(db_path, connect, catalog, tmp_path):
+    path = str(tmp_path / 'catalog.snapshot')
+    first = SnapshotMatcher(path, connect)
+    second = SnapshotMatcher(path, connect)
+    assert first.stats()['written'] == 1
+    assert second.stats()['written'] == 0  # mapped the file the first one wrote
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    with conn:
+        conn.execute("DELETE FROM scholarships WHERE id > 1")
+        conn.execute("UPDATE catalog_version SET version = version + 1")
+    conn.close()
+    first.reload()
+    assert first.stats()['scholarships'] == 1
+
+    # The other worker notices the replaced file on its next score()
+    second.check_interval = 0
+    answers = dict.fromkeys(ANSWER_KEYS, '')
+    answers['university'] = 'ateneo'
+    assert [r['id'] for r in second.score(answers)] == [1]
+    assert second.stats()['written'] == 0
+
+
+def test_read_catalog_refuses_an_open_transaction(connect):
+    from snapshot import read_catalog
+
+    conn = connect()
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('a', 'a@example.com', 'x')")
+    with pytest.raises(ValueError):
+        read_catalog(conn)
+    assert conn.in_transaction  # the caller's write was left alone
+    conn.rollback()
@@ -0,0 +1,77 @@
+"""LearnedRanker only re-orders what the configured rule engine matched."""
+import numpy as np
+import pytest
+
+from benchmarks.scenarios import questionnaire_answers
+from catalog import SCHOLARSHIPS
+from keyword_matcher import AutomatonMatcher
+from matcher import MatchIndex
+from ranking import FEATURES, LearnedRanker, RankingModel, build_state, feature_matrix, result_features
+
+CATALOG = [dict(s, id=n) for n, s in enumerate(SCHOLARSHIPS, start=1)]
+
+
+def model(seed):
+    return RankingModel(np.random.default_rng(seed).normal(size=len(FEATURES)), 0.0)
+
+
+def ids(results):
+    return [r['id'] for r in results]
+
+
+@pytest.mark.parametrize('engine', [MatchIndex, AutomatonMatcher])
+def test_candidates_are_the_rule_engines_results(engine):
+    rules = engine(CATALOG)
+    ranker = LearnedRanker(CATALOG, model(0), engine(CATALOG), budget_ms=1000)
+    answers = [
+        {'school_type': 'public', 'average': '90', 'financial_need': 'yes', 'talent': 'sports', 'university': 'dlsu'},
+        # Free text only the automaton understands
+        {'talent': 'i play varsity basketball', 'university': 'de la salle'},
+    ]
+    for a in answers:
+        expected = rules.score(a)
+        ranked = ranker.score(a)
+        assert sorted(ids(ranked)) == sorted(ids(expected))
+        assert ranker.score(a, limit=2) == ranked[:2]
+    assert ranker.stats()['ranked'] > 0
+
+
+def test_result_features_equal_the_training_features():
+    state = build_state(CATALOG)
+    rules = MatchIndex(CATALOG)
+    for answers in questionnaire_answers()[::11]:
+        answers = {key: value.lower() for key, value in answers.items()}
+        results = rules.score(answers)
+        sids = [state['positions'][r['id']] for r in results]
+        X, _, _ = feature_matrix(state, answers)
+        assert np.allclose(result_features(state, answers, results, sids), X[sids])
+
+
+def test_falls_back_to_rule_order_when_over_budget():
+    rules = MatchIndex(CATALOG)
+    ranker = LearnedRanker(CATALOG, model(1), MatchIndex(CATALOG), budget_ms=0)
+    answers = {'financial_need': 'yes', 'average': '95'}
+    assert ids(ranker.score(answers)) == ids(rules.score(answers))
+    assert ranker.stats()['fallbacks'] == 1
+
+
+def test_catalog_reload_does_not_re_run_the_budget_check():
+    class Counting(MatchIndex):
+        calls = 0
+
+        def score(self, answers, limit=None):
+            Counting.calls += 1
+            return super().score(answers, limit)
+
+    ranker = LearnedRanker(CATALOG, model(2), Counting(CATALOG), budget_ms=1000)
+    assert Counting.calls > 0  # checked once, when the model was loaded
+    checked = Counting.calls
+    ranker.reload(CATALOG[:5])
+    assert Counting.calls == checked
+    assert ranker.stats()['model_active'] == 1
+
+
+def test_fingerprint_names_the_model_only_while_it_orders_results():
+    active = LearnedRanker(CATALOG, model(3), MatchIndex(CATALOG), budget_ms=1000)
+    assert active.fingerprint == model(3).fingerprint != model(4).fingerprint
+    assert LearnedRanker(CATALOG, model(3), MatchIndex(CATALOG), budget_ms=0).fingerprint == 'rules'
@@ -0,0 +1,94 @@
+"""CachedMatcher: hits, TTL, and invalidation when the catalog is reloaded."""
+import threading
+import time
+
+from catalog import SCHOLARSHIPS
+from matcher import MatchIndex
+from result_cache import CachedMatcher
+
+ARTS = {'school_type': '', 'average': '', 'financial_need': '', 'talent': 'arts', 'university': ''}
+
+
+class CountingMatcher:
+    def __init__(self, scholarships):
+        self.index = MatchIndex(scholarships)
+        self.calls = 0
+
+    def score(self, answers, limit=None):
+        self.calls += 1
+        return self.index.score(answers, limit)
+
+    def reload(self, scholarships):
+        self.index.reload(scholarships)
+
+
+def test_repeated_answers_are_served_from_the_cache():
+    inner = CountingMatcher(SCHOLARSHIPS)
+    cached = CachedMatcher(inner)
+    first = cached.score(ARTS)
+    assert cached.score(dict(ARTS)) is first
+    assert cached.score(ARTS, limit=1) == first[:1]  # the limit is part of the key
+    assert inner.calls == 2
+    stats = cached.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 2)
+
+
+def test_reload_drops_cached_results():
+    cached = CachedMatcher(CountingMatcher(SCHOLARSHIPS))
+    assert len(cached.score(ARTS)) == 2
+    cached.reload(SCHOLARSHIPS[:1])
+    assert cached.stats()['size'] == 0
+    assert cached.score(ARTS) == []
+
+
+def test_result_scored_during_a_reload_is_not_cached():
+    class Slow:
+        def __init__(self):
+            self.version = 0
+            self.scoring = threading.Event()
+            self.release = threading.Event()
+
+        def score(self, answers, limit=None):
+            version = self.version
+            self.scoring.set()
+            self.release.wait(5)
+            return [version]
+
+        def reload(self, scholarships):
+            self.version += 1
+
+    inner = Slow()
+    cached = CachedMatcher(inner)
+    worker = threading.Thread(target=cached.score, args=(ARTS,))
+    worker.start()
+    inner.scoring.wait(5)
+    cached.reload(None)  # the catalog changes while the old one is being scored
+    inner.release.set()
+    worker.join()
+
+    assert cached.stats()['size'] == 0
+    assert cached.score(ARTS) == [1]
+
+
+def test_entries_expire_after_the_ttl():
+    inner = CountingMatcher(SCHOLARSHIPS)
+    cached = CachedMatcher(inner, ttl=0.05)
+    cached.score(ARTS)
+    time.sleep(0.06)
+    cached.score(ARTS)
+    assert inner.calls == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cached = CachedMatcher(CountingMatcher(SCHOLARSHIPS), maxsize=2)
+    for talent in ('arts', 'sports', 'none'):
+        cached.score(dict(ARTS, talent=talent))
+    assert cached.stats()['evictions'] == 1
+    assert cached.stats()['size'] == 2
+
+
+def test_warm_scores_every_questionnaire_combination():
+    inner = CountingMatcher(SCHOLARSHIPS)
+    cached = CachedMatcher(inner)
+    count = cached.warm()
+    assert count == inner.calls == cached.stats()['size'] == 288
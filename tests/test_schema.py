@@ -0,0 +1,99 @@
+"""apply_schema(): once per deployment, idempotent, and upgrades old databases."""
+import shutil
+import sqlite3
+import threading
+
+from catalog import SCHOLARSHIPS
+from schema import SCHEMA_PATH, apply_schema, schema_version
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def current_version():
+    with open(SCHEMA_PATH) as f:
+        return schema_version(f.read())
+
+
+def test_fresh_database_is_built_seeded_and_stamped(tmp_path):
+    path = str(tmp_path / 'app.db')
+    done = apply_schema(path)
+    assert done['seeded'] == len(SCHOLARSHIPS)
+    assert done['upgraded_users'] is False
+    assert user_version(path) == current_version()
+
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'users', 'scholarships', 'scholarship_criteria', 'scholarship_tags', 'jobs'} <= tables
+    assert conn.execute('SELECT COUNT(*) FROM scholarships').fetchone()[0] == len(SCHOLARSHIPS)
+    conn.close()
+
+
+def test_second_apply_is_a_no_op(tmp_path):
+    path = str(tmp_path / 'app.db')
+    apply_schema(path)
+    assert apply_schema(path) is None
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM scholarships').fetchone()[0] == len(SCHOLARSHIPS)
+    conn.close()
+
+
+def test_changed_schema_is_applied_again_without_reseeding(tmp_path):
+    path = str(tmp_path / 'app.db')
+    apply_schema(path)
+    changed = tmp_path / 'schema.sql'
+    shutil.copy(SCHEMA_PATH, changed)
+    with open(changed, 'a') as f:
+        f.write('\nCREATE TABLE IF NOT EXISTS release_notes (id INTEGER PRIMARY KEY);\n')
+
+    done = apply_schema(path, str(changed))
+    assert done['seeded'] == 0
+    assert user_version(path) == schema_version(changed.read_text())
+    assert apply_schema(path, str(changed)) is None
+
+
+def test_concurrent_starters_apply_it_once(tmp_path):
+    path = str(tmp_path / 'app.db')
+    results = []
+    barrier = threading.Barrier(4)
+
+    def start():
+        barrier.wait()
+        results.append(apply_schema(path))
+
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(result is not None for result in results) == 1
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM scholarships').fetchone()[0] == len(SCHOLARSHIPS)
+    conn.close()
+
+
+def test_users_table_from_the_old_init_db_is_upgraded(tmp_path):
+    path = str(tmp_path / 'app.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+        "email TEXT UNIQUE NOT NULL, password TEXT NOT NULL, role TEXT)"
+    )
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('Ana', 'ana@example.com', 'pw', NULL)")
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('Ben', 'ben@example.com', 'pw', 'provider')")
+    conn.commit()
+    conn.close()
+
+    done = apply_schema(path)
+    assert done['upgraded_users'] is True
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT name, role, is_admin, created_at IS NOT NULL FROM users ORDER BY id").fetchall()
+    assert rows == [('Ana', 'student', 0, 1), ('Ben', 'provider', 0, 1)]
+    conn.close()
+
@@ -0,0 +1,37 @@
+"""Server-side sessions: every SQLite store call goes through run_blocking."""
+from flask import Flask, session
+
+from sessions import ServerSessionInterface, SQLiteStore
+
+
+def test_store_calls_go_through_run_blocking(connect):
+    calls = []
+
+    def run_blocking(fn, *args):
+        calls.append(fn.__name__)
+        return fn(*args)
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSessionInterface(SQLiteStore(connect), run_blocking=run_blocking)
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 1
+        return ''
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id'))
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return ''
+
+    client = app.test_client()
+    client.get('/login')
+    assert client.get('/whoami').text == '1'
+    client.get('/logout')
+    assert client.get('/whoami').text == 'None'
+    assert calls == ['set', 'get', 'get', 'delete']
@@ -0,0 +1,117 @@
+"""Login throttling: token buckets and the 429 response."""
+import multiprocessing
+
+import pytest
+from flask import Flask
+
+from kvstore import LocalRedis
+from throttle import FileBuckets, LoginThrottle, MemoryBuckets, SharedBuckets, parse_limit, refill
+
+BUCKETS = {
+    'memory': lambda tmp_path: MemoryBuckets(),
+    'shared': lambda tmp_path: SharedBuckets(LocalRedis()),
+    'file': lambda tmp_path: FileBuckets(str(tmp_path / 'throttle.buckets')),
+}
+
+
+def make_app(buckets, ip_limit=(3, 60), email_limit=(2, 60)):
+    app = Flask(__name__)
+
+    @app.route('/login', methods=['GET', 'POST'])
+    def login():
+        return 'ok'
+
+    @app.route('/other', methods=['POST'])
+    def other():
+        return 'ok'
+
+    throttle = LoginThrottle(app, buckets, ip_limit=ip_limit, email_limit=email_limit)
+    return app, throttle
+
+
+def login(client, email, ip='10.0.0.1'):
+    return client.post('/login', data={'email': email, 'password': 'x'}, environ_base={'REMOTE_ADDR': ip})
+
+
+def test_parse_limit():
+    assert parse_limit('10/300') == (10, 300.0)
+    assert parse_limit('5') == (5, 60.0)
+    assert parse_limit('0') is None
+    assert parse_limit('') is None
+    with pytest.raises(ValueError):
+        parse_limit('-1/60')
+
+
+def test_refill_is_continuous():
+    assert refill(0.0, 0.0, capacity=10, rate=1.0, now=5.0) == (4.0, 0.0)
+    assert refill(20.0, 0.0, capacity=10, rate=1.0, now=1.0) == (9.0, 0.0)  # capped at the burst
+    tokens, wait = refill(0.5, 0.0, capacity=10, rate=0.5, now=0.0)
+    assert (tokens, wait) == (0.5, 1.0)
+
+
+@pytest.mark.parametrize('buckets', sorted(BUCKETS))
+def test_email_bucket_empties_across_ips(buckets, tmp_path):
+    app, throttle = make_app(BUCKETS[buckets](tmp_path))
+    client = app.test_client()
+    assert login(client, 'A@example.com ', ip='10.0.0.1').status_code == 200
+    assert login(client, 'a@example.com', ip='10.0.0.2').status_code == 200
+    rejected = login(client, 'a@example.com', ip='10.0.0.3')
+    assert rejected.status_code == 429
+    assert int(rejected.headers['Retry-After']) >= 1
+    assert rejected.mimetype == 'text/plain'
+    assert throttle.stats()['throttled_email'] == 1
+    # Another account from the same address is unaffected
+    assert login(client, 'b@example.com', ip='10.0.0.3').status_code == 200
+
+
+def test_ip_bucket_empties_across_emails():
+    app, throttle = make_app(MemoryBuckets())
+    client = app.test_client()
+    for n in range(3):
+        assert login(client, f'user{n}@example.com').status_code == 200
+    assert login(client, 'user9@example.com').status_code == 429
+    assert login(client, 'user9@example.com', ip='10.0.0.9').status_code == 200
+    assert throttle.stats()['throttled_ip'] == 1
+
+
+def test_only_posts_to_guarded_endpoints_are_counted():
+    app, throttle = make_app(MemoryBuckets(), ip_limit=(1, 60), email_limit=None)
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get('/login').status_code == 200
+        assert client.post('/other').status_code == 200
+    assert throttle.stats()['checked'] == 0
+
+
+def test_memory_buckets_evict_least_recently_used():
+    buckets = MemoryBuckets(maxsize=2)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, 1, 0.001)
+    assert buckets.stats()['evictions'] == 1
+    assert buckets.take('a', 1, 0.001) == 0  # forgotten, so a fresh bucket
+    assert buckets.take('c', 1, 0.001) > 0
+
+
+def take_all(buckets, results):
+    results.put(sum(buckets.take('ip:10.0.0.1', 10, 0.001) == 0 for _ in range(10)))
+
+
+def test_file_buckets_are_shared_by_forked_workers(tmp_path):
+    buckets = FileBuckets(str(tmp_path / 'throttle.buckets'))
+    buckets.take('ip:10.0.0.1', 10, 0.001)  # opened before the fork, as under GUNICORN_PRELOAD
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=take_all, args=(buckets, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sum(results.get() for _ in workers) == 9  # one burst of 10 between all of them
+
+
+def test_file_buckets_reuse_the_stalest_slot(tmp_path):
+    buckets = FileBuckets(str(tmp_path / 'throttle.buckets'), slots=2, probe=2)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, 1, 0.001)
+    assert buckets.stats()['evictions'] == 1
+    assert buckets.take('c', 1, 0.001) > 0  # still there
@@ -0,0 +1,81 @@
+"""Accounts: bulk import counters and admin access."""
+import sqlite3
+
+import pytest
+
+from schema import apply_schema
+from users_cli import import_users
+
+ROSTER = [
+    (2, {'name': 'Ana', 'email': 'ana@example.com', 'password': 'pw'}),
+    (3, {'name': 'Ben', 'email': 'ben@example.com', 'password': 'pw', 'role': 'provider'}),
+    (4, {'name': 'Ana Cruz', 'email': 'ana@example.com', 'password': 'pw'}),
+    (5, {'name': 'No Email', 'password': 'pw'}),
+    (6, None),
+]
+
+
+def names(conn):
+    return [row[0] for row in conn.execute("SELECT name FROM users ORDER BY id")]
+
+
+@pytest.mark.parametrize('on_conflict, first, second, final', [
+    ('skip', (2, 0, 1), (0, 0, 3), ['Ana', 'Ben']),
+    ('update', (2, 1, 0), (0, 3, 0), ['Ana Cruz', 'Ben']),
+])
+def test_import_counts_inserted_updated_and_skipped(connect, on_conflict, first, second, final):
+    conn = connect()
+    for expected in (first, second):
+        stats, rejects = import_users(conn, ROSTER, batch_size=2, on_conflict=on_conflict)
+        assert (stats['inserted'], stats['updated'], stats['skipped']) == expected
+        assert (stats['read'], stats['rejected']) == (5, 2)
+        assert [line for line, _ in rejects] == [5, 6]
+    assert names(conn) == final
+    conn.close()
+
+
+def test_admin_pages_need_the_flag_on_the_account(flask_app, client):
+    from db import DATABASE
+
+    runner = flask_app.test_cli_runner()
+    client.post('/signup', data={'name': 'Ops', 'email': 'ops@example.com', 'password': 'pw'})
+    assert client.get('/cache-stats').status_code == 404
+    assert client.get('/admin/profiles').status_code == 404
+
+    assert runner.invoke(args=['users', 'admin', 'ops@example.com']).exit_code == 0
+    assert client.get('/cache-stats').status_code == 200
+    assert client.get('/admin/profiles').status_code == 200
+
+    assert runner.invoke(args=['users', 'admin', '--revoke', 'ops@example.com']).exit_code == 0
+    assert client.get('/cache-stats').status_code == 404
+
+    missing = runner.invoke(args=['users', 'admin', 'nobody@example.com'])
+    assert missing.exit_code != 0
+    conn = sqlite3.connect(DATABASE)
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE is_admin").fetchone()[0] == 0
+    conn.close()
+
+
+def test_signup_cannot_grant_admin(client):
+    client.post('/signup', data={'name': 'Eve', 'email': 'eve@example.com', 'password': 'pw', 'is_admin': '1'})
+    assert client.get('/cache-stats').status_code == 404
+
+
+def test_admin_flag_is_added_to_existing_users_tables(tmp_path):
+    path = str(tmp_path / 'app.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+        "email TEXT UNIQUE NOT NULL, password TEXT NOT NULL, "
+        "role TEXT NOT NULL DEFAULT 'student' CHECK (role IN ('student', 'provider')), "
+        "created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('Ana', 'ana@example.com', 'pw')")
+    conn.commit()
+    conn.close()
+
+    done = apply_schema(path)
+    assert (done['upgraded_users'], done['added_admin_flag']) == (False, True)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT is_admin FROM users").fetchall() == [(0,)]
+    conn.close()
@@ -0,0 +1,247 @@
+"""Throttling of sign-in and sign-up attempts.
+
+Every POST to the guarded endpoints takes a token from two buckets: one for
+the client's IP address and one for the email address in the form. Buckets
+refill continuously (a limit of "10/300" allows a burst of 10 and then one
+attempt every 30 seconds), so there are no window edges to game. An empty
+bucket answers 429 with Retry-After straight from a before_request hook,
+before the session, the users table or the password hasher are touched.
+
+Buckets are shared by every worker on the machine through a memory-mapped
+file (FileBuckets, the default) or by every worker pointed at a Redis
+server (SharedBuckets). MemoryBuckets keeps them in one process, which
+only limits correctly with a single worker: N workers would each allow
+the full limit.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+# Atomic read-refill-take-write, so workers sharing a Redis server cannot race
+TAKE_SCRIPT = """
+local capacity, rate, now, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens, stamp = capacity, now
+local raw = redis.call('GET', KEYS[1])
+if raw then
+    local sep = string.find(raw, ':', 1, true)
+    tokens, stamp = tonumber(string.sub(raw, 1, sep - 1)), tonumber(string.sub(raw, sep + 1))
+end
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('SET', KEYS[1], tokens .. ':' .. now, 'EX', ttl)
+return tostring(wait)
+"""
+
+
+def parse_limit(spec):
+    """'10/300' -> (10, 300.0): a burst of 10, refilled over 300 seconds. None if empty or 0."""
+    if not spec or spec.strip() in ('0', 'off'):
+        return None
+    count, _, seconds = spec.partition('/')
+    count, seconds = int(count), float(seconds or 60)
+    if count <= 0 or seconds <= 0:
+        raise ValueError(f'invalid rate limit {spec!r}; expected e.g. 10/300')
+    return count, seconds
+
+
+def refill(tokens, stamp, capacity, rate, now):
+    """Take one token from a bucket; returns (tokens left, seconds to wait or 0)."""
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Token buckets in this process; the least recently used are evicted past ``maxsize``."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp = self.buckets.pop(key, (capacity, now))
+            tokens, wait = refill(tokens, stamp, capacity, rate, now)
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.maxsize:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        return wait
+
+    def stats(self):
+        with self.lock:
+            return {'buckets': len(self.buckets), 'maxsize': self.maxsize, 'evictions': self.evictions}
+
+
+class FileBuckets:
+    """Token buckets in a memory-mapped file shared by every process on the machine.
+
+    The file is a fixed table of ``slots`` records (key hash, tokens,
+    timestamp). A key lives in the first of ``probe`` slots from its hash
+    that holds it; a new key takes the stalest of them, so the file never
+    grows and clients not seen for a while are forgotten first. Each take
+    holds an flock on the file, so workers cannot race, and it never
+    touches the database.
+    """
+
+    RECORD = struct.Struct('<Qdd')
+
+    def __init__(self, path, slots=100000, probe=8):
+        self.path = path
+        self.slots = slots
+        self.probe = probe
+        self.size = slots * self.RECORD.size
+        self.lock = threading.Lock()
+        self.pid = None
+        self.fd = None
+        self.map = None
+        self.evictions = 0
+
+    def _open(self):
+        # Per process: a forked worker shares its parent's open file, and
+        # with it the parent's flock, so it must open its own
+        if self.pid == os.getpid():
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self.fd, self.map, self.pid = fd, mmap.mmap(fd, self.size), os.getpid()
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        # Never 0, which marks an empty slot
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+        first = digest % self.slots
+        with self.lock:
+            self._open()
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                victim, victim_stamp, victim_owner, found = None, math.inf, 0, None
+                for n in range(self.probe):
+                    offset = (first + n) % self.slots * self.RECORD.size
+                    owner, tokens, stamp = self.RECORD.unpack_from(self.map, offset)
+                    if owner == digest:
+                        found = offset
+                        break
+                    if stamp < victim_stamp:
+                        victim, victim_stamp, victim_owner = offset, stamp, owner
+                if found is None:
+                    offset, tokens, stamp = victim, capacity, now
+                    if victim_owner:
+                        self.evictions += 1
+                tokens, wait = refill(tokens, stamp, capacity, rate, now)
+                self.RECORD.pack_into(self.map, offset, digest, tokens, now)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return wait
+
+    def stats(self):
+        return {'slots': self.slots, 'evictions': self.evictions}
+
+
+class SharedBuckets:
+    """Token buckets in a ``redis.Redis`` server (or the kvstore.LocalRedis stand-in).
+
+    A bucket expires once it would have refilled, so the store only holds
+    clients seen recently. With a real server the update runs as one Lua
+    script; clients without scripting are updated under a process lock.
+    """
+
+    def __init__(self, client, prefix='throttle:'):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(TAKE_SCRIPT) if hasattr(client, 'register_script') else None
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        key = self.prefix + key
+        now = time.time()
+        ttl = math.ceil(capacity / rate) + 1
+        if self.script is not None:
+            raw = self.script(keys=[key], args=[capacity, rate, now, ttl])
+            return float(raw.decode() if isinstance(raw, bytes) else raw)
+        with self.lock:
+            raw = self.client.get(key)
+            if raw is None:
+                tokens, stamp = capacity, now
+            else:
+                tokens, stamp = (float(part) for part in (raw.decode() if isinstance(raw, bytes) else raw).split(':'))
+            tokens, wait = refill(tokens, stamp, capacity, rate, now)
+            self.client.set(key, f'{tokens}:{now}', ex=ttl)
+        return wait
+
+    def stats(self):
+        return {}
+
+
+class LoginThrottle:
+    """Rejects attempts on ``endpoints`` once an IP or email runs out of tokens.
+
+    ``ip_limit`` and ``email_limit`` are (burst, seconds) pairs or None.
+    Register it before any before_request hook that reads the database.
+    """
+
+    def __init__(self, app, buckets, ip_limit=(30, 300), email_limit=(10, 300), endpoints=('login', 'signup')):
+        self.buckets = buckets
+        self.rules = [
+            (kind, limit[0], limit[0] / limit[1])
+            for kind, limit in (('ip', ip_limit), ('email', email_limit)) if limit
+        ]
+        self.endpoints = frozenset(endpoints)
+        self.lock = threading.Lock()
+        self.counters = {'checked': 0, 'throttled_ip': 0, 'throttled_email': 0}
+        if self.rules:
+            app.before_request(self.check)
+
+    def check(self):
+        if request.method != 'POST' or request.endpoint not in self.endpoints:
+            return None
+        values = {
+            'ip': request.remote_addr or 'unknown',
+            'email': (request.form.get('email') or '').strip().lower()
+        }
+        for kind, capacity, rate in self.rules:
+            if not values[kind]:
+                continue
+            wait = self.buckets.take(f'{kind}:{values[kind]}', capacity, rate)
+            if wait:
+                with self.lock:
+                    self.counters['checked'] += 1
+                    self.counters[f'throttled_{kind}'] += 1
+                return self.reject(wait)
+        with self.lock:
+            self.counters['checked'] += 1
+        return None
+
+    def reject(self, wait):
+        # Deliberately not a flash + redirect: that would load and save the session
+        seconds = max(1, math.ceil(wait))
+        response = Response(
+            f'Too many attempts. Please wait {seconds} seconds and try again.\n',
+            status=429, mimetype='text/plain'
+        )
+        response.headers['Retry-After'] = str(seconds)
+        return response
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(counters, **self.buckets.stats())
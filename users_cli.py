@@ -0,0 +1,243 @@
+"""Bulk user import/export commands.
+
+    flask --app app users import roster.csv [--on-conflict skip|update]
+    flask --app app users export users.jsonl
+    flask --app app users hash-benchmark
+    flask --app app users admin EMAIL [--revoke]
+"""
+import csv
+import json
+import os
+import sys
+import time
+
+import click
+from flask.cli import AppGroup
+
+users_cli = AppGroup('users', help='Bulk import and export of user accounts.')
+
+ROLES = ('student', 'provider')
+EXPORT_COLUMNS = ('id', 'name', 'email', 'role', 'created_at')
+
+INSERT_SQL = {
+    'skip': (
+        "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(email) DO NOTHING"
+    ),
+    'update': (
+        "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(email) DO UPDATE SET name = excluded.name, role = excluded.role"
+    )
+}
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_roster(stream, fmt):
+    """Yield (line_number, row dict or None) without loading the whole file."""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def validate(row):
+    """Return (name, email, password, role) or an error message."""
+    if row is None:
+        return 'unparseable row'
+    name = str(row.get('name') or '').strip()
+    email = str(row.get('email') or '').strip()
+    password = str(row.get('password') or '')
+    role = str(row.get('role') or 'student').strip().lower()
+    if not name:
+        return 'missing name'
+    if '@' not in email:
+        return 'missing or invalid email'
+    if not password:
+        return 'missing password'
+    if role not in ROLES:
+        return f'unknown role {role!r}'
+    return name, email, password, role
+
+
+def import_users(conn, rows, batch_size=1000, on_conflict='skip', hash_passwords=None):
+    """Insert rows in batched transactions; returns counters (read, inserted,
+    updated, skipped, rejected) and the rejected rows.
+
+    ``hash_passwords`` takes a list of plaintext passwords and returns their
+    hashes, so a whole batch can be hashed in parallel.
+    """
+    sql = INSERT_SQL[on_conflict]
+    conflicted = 'updated' if on_conflict == 'update' else 'skipped'
+    stats = {'read': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'rejected': 0}
+    rejects = []
+    batch = []
+
+    def flush():
+        if hash_passwords is not None:
+            hashes = hash_passwords([row[2] for row in batch])
+            batch[:] = [(name, email, h, role) for (name, email, _, role), h in zip(batch, hashes)]
+        emails = list({row[1] for row in batch})
+        with conn:
+            # Checked under the write lock, so the split matches what the upsert does
+            conn.execute('BEGIN IMMEDIATE')
+            taken = set()
+            for start in range(0, len(emails), 500):
+                chunk = emails[start:start + 500]
+                taken.update(row[0] for row in conn.execute(
+                    f"SELECT email FROM users WHERE email IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+            conn.executemany(sql, batch)
+        # A repeated email within the batch conflicts with its first row
+        for row in batch:
+            if row[1] in taken:
+                stats[conflicted] += 1
+            else:
+                stats['inserted'] += 1
+                taken.add(row[1])
+        batch.clear()
+
+    for line_number, row in rows:
+        stats['read'] += 1
+        result = validate(row)
+        if isinstance(result, str):
+            stats['rejected'] += 1
+            rejects.append((line_number, result))
+            continue
+        batch.append(result)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats, rejects
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction.')
+@click.option('--on-conflict', type=click.Choice(['skip', 'update']), default='skip', show_default=True,
+              help='What to do when the email is already registered.')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+              help='Write rejected rows (line, reason) to this CSV file.')
+@click.option('--iterations', type=int,
+              help='PBKDF2 cost for imported passwords; lower is faster and is '
+                   'upgraded to the configured cost on first login.')
+def import_command(path, fmt, batch_size, on_conflict, rejects_path, iterations):
+    """Stream a CSV or JSONL roster (name, email, password[, role]) into users."""
+    from app import get_db_connection, hasher
+
+    method = f'pbkdf2:sha256:{iterations}' if iterations else None
+    conn = get_db_connection()
+    started = time.perf_counter()
+    with open(path, newline='', encoding='utf-8') as stream:
+        stats, rejects = import_users(
+            conn, read_roster(stream, detect_format(path, fmt)), batch_size, on_conflict,
+            hash_passwords=lambda passwords: hasher.hash_many(passwords, method)
+        )
+    elapsed = time.perf_counter() - started
+
+    if rejects_path:
+        with open(rejects_path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(['line', 'reason'])
+            writer.writerows(rejects)
+    else:
+        for line_number, reason in rejects[:20]:
+            click.echo(f'  line {line_number}: {reason}', err=True)
+        if len(rejects) > 20:
+            click.echo(f'  ... {len(rejects) - 20} more (use --rejects to save them all)', err=True)
+
+    click.echo(
+        f"Read {stats['read']} rows: {stats['inserted']} inserted, {stats['updated']} updated, "
+        f"{stats['skipped']} skipped (email taken), {stats['rejected']} rejected "
+        f"in {elapsed:.2f}s ({stats['read'] / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+
+
+@users_cli.command('export')
+@click.argument('path', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+def export_command(path, fmt, batch_size):
+    """Stream users (without passwords) to PATH, or stdout with '-'."""
+    from app import get_db_connection
+
+    conn = get_db_connection()
+    present = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+    columns = [c for c in EXPORT_COLUMNS if c in present]
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM users ORDER BY id")
+
+    fmt = detect_format(path, fmt)
+    out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+    count = 0
+    try:
+        writer = csv.writer(out) if fmt == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if writer:
+                    writer.writerow(tuple(row))
+                else:
+                    out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+            count += len(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if path != '-':
+        click.echo(f'Exported {count} users to {os.path.abspath(path)}')
+
+
+@users_cli.command('hash-benchmark')
+@click.option('--costs', default='100000,300000,600000', show_default=True,
+              help='Comma-separated PBKDF2 iteration counts to time.')
+@click.option('--rounds', default=20, show_default=True, help='Verifications per thread per cost.')
+def hash_benchmark_command(costs, rounds):
+    """Report logins/sec per core at each password hashing cost."""
+    from credentials import benchmark
+
+    click.echo(f"{'iterations':>10}  {'ms/login':>9}  {'logins/s/core':>13}  {'logins/s total':>14}")
+    for row in benchmark([int(c) for c in costs.split(',')], rounds):
+        click.echo(
+            f"{row['iterations']:>10}  {row['ms_per_login']:>9.1f}  "
+            f"{row['logins_per_sec_per_core']:>13.1f}  {row['logins_per_sec_all_cores']:>14.1f}"
+            f"  ({row['threads']} threads)"
+        )
+
+
+@users_cli.command('admin')
+@click.argument('email')
+@click.option('--revoke', is_flag=True, help='Take admin access away instead.')
+def admin_command(email, revoke):
+    """Grant an existing account access to /cache-stats and /admin/*."""
+    from app import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        with conn:
+            updated = conn.execute(
+                "UPDATE users SET is_admin = ? WHERE email = ?", (0 if revoke else 1, email.strip())
+            ).rowcount
+    finally:
+        conn.close()
+    if not updated:
+        raise click.ClickException(f'no account with email {email}')
+    click.echo(f"{'Revoked' if revoke else 'Granted'} admin access for {email}")
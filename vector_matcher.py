@@ -0,0 +1,156 @@
+"""Vectorized scholarship scoring with NumPy.
+
+The catalog is encoded once as a sparse scholarship x keyword matrix per
+criterion key. An answer is turned into a weighted hit column per
+scholarship, and a batch of student profiles becomes a one-hot matrix over
+the distinct answers, so scoring thousands of profiles is one matrix
+product.
+"""
+import numpy as np
+from scipy import sparse
+
+from matcher import NEED_BONUS_ANSWER, AVERAGE_BONUS_ANSWERS, build_result
+
+# Upper bound on memoized (key, answer) hit columns; free-text answers are unbounded
+HIT_CACHE_SIZE = 4096
+
+
+class VectorMatcher:
+    """Scores every scholarship at once with sparse matrix products."""
+
+    def __init__(self, scholarships):
+        self.reload(scholarships)
+
+    def reload(self, scholarships):
+        """Re-encode the catalog (call whenever it changes)."""
+        scholarships = list(scholarships)
+        n = len(scholarships)
+        vocab = {}
+        cells = {}
+        weights = {}
+        need_bonus = np.zeros(n, dtype=np.float32)
+        average_bonus = np.zeros(n, dtype=np.float32)
+
+        for sid, s in enumerate(scholarships):
+            for key, keywords in s["criteria"].items():
+                columns = vocab.setdefault(key, {})
+                rows, cols = cells.setdefault(key, ([], []))
+                for keyword in keywords:
+                    rows.append(sid)
+                    cols.append(columns.setdefault(keyword, len(columns)))
+                weights.setdefault(key, np.zeros(n, dtype=np.float32))[sid] = s["weight"].get(key, 1)
+
+            if "need" in s["criteria"].get("financial_need", []):
+                need_bonus[sid] = 1
+            if "average" in s["criteria"]:
+                average_bonus[sid] = 1
+
+        matrices = {}
+        for key, (rows, cols) in cells.items():
+            data = np.ones(len(rows), dtype=np.float32)
+            matrices[key] = sparse.csr_matrix((data, (rows, cols)), shape=(n, len(vocab[key])))
+
+        # Swap everything in at once so concurrent readers never see a half-built encoding
+        self.state = {
+            "scholarships": scholarships,
+            "vocab": {key: list(columns) for key, columns in vocab.items()},
+            "matrices": matrices,
+            "weights": weights,
+            "need_bonus": need_bonus,
+            "average_bonus": average_bonus,
+            "hits": {}
+        }
+
+    def _hits(self, state, key, value):
+        """Boolean vector of scholarships whose ``key`` criterion matches ``value``."""
+        cache = state["hits"]
+        hit = cache.get((key, value))
+        if hit is None:
+            keywords = state["vocab"].get(key, [])
+            x = np.fromiter(
+                (keyword in value or value in keyword for keyword in keywords),
+                dtype=np.float32, count=len(keywords)
+            )
+            if x.any():
+                hit = (state["matrices"][key] @ x) > 0
+            else:
+                hit = np.zeros(len(state["scholarships"]), dtype=bool)
+            if len(cache) >= HIT_CACHE_SIZE:
+                cache.clear()
+            cache[(key, value)] = hit
+        return hit
+
+    def score_matrix(self, profiles, state=None):
+        """Return a (scholarships x profiles) array of scores."""
+        state = state or self.state
+        n = len(state["scholarships"])
+
+        # One column per distinct non-empty answer, plus the two bonus rules
+        columns = [state["need_bonus"], state["average_bonus"]]
+        column_of = {}
+        rows, cols = [], []
+        for p, answers in enumerate(profiles):
+            if answers.get('financial_need') == NEED_BONUS_ANSWER:
+                rows.append(0)
+                cols.append(p)
+            if answers.get('average') in AVERAGE_BONUS_ANSWERS:
+                rows.append(1)
+                cols.append(p)
+            for key, value in answers.items():
+                if not value or key not in state["weights"]:
+                    continue
+                c = column_of.get((key, value))
+                if c is None:
+                    c = column_of[(key, value)] = len(columns)
+                    columns.append(state["weights"][key] * self._hits(state, key, value))
+                rows.append(c)
+                cols.append(p)
+
+        if not n:
+            return np.zeros((0, len(profiles)))
+        weighted = np.column_stack(columns)
+        onehot = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(columns), len(profiles))
+        )
+        return np.asarray(weighted @ onehot)
+
+    def score_batch(self, profiles, top=None, chunk_size=64):
+        """Score many answer sets, returning one ranked result list per profile.
+
+        Profiles are scored ``chunk_size`` at a time to bound the size of the
+        score matrix; ``top`` keeps only the best matches per profile.
+        """
+        state = self.state
+        profiles = list(profiles)
+        all_results = []
+        for start in range(0, len(profiles), chunk_size):
+            chunk = profiles[start:start + chunk_size]
+            scores = self.score_matrix(chunk, state)
+            for p, answers in enumerate(chunk):
+                all_results.append(self._rank(state, answers, scores[:, p], top))
+        return all_results
+
+    def score(self, answers, limit=None):
+        """Score answers against the catalog, best matches first."""
+        return self.score_batch([answers], top=limit)[0]
+
+    def _rank(self, state, answers, column, top):
+        candidates = np.flatnonzero(column > 0)
+        # Highest score first, catalog order among equal scores (like list.sort())
+        keys = candidates - column[candidates].astype(np.int64) * len(column)
+        if top is not None and top < len(keys):
+            best = np.argpartition(keys, top)[:top]
+            order = candidates[best[np.argsort(keys[best])]]
+        else:
+            order = candidates[np.argsort(keys)]
+
+        answered = [
+            (key, self._hits(state, key, value))
+            for key, value in answers.items()
+            if value and key in state["weights"]
+        ]
+        results = []
+        for sid in order.tolist():
+            matched = [key for key, hit in answered if hit[sid]]
+            results.append(build_result(state["scholarships"][sid], int(column[sid]), matched))
+        return results